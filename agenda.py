@@ -0,0 +1,207 @@
+"""
+Agenda da lista: linha do tempo semanal pré-calculada.
+
+A partir dos horários declarados (fecha/reabre/reset/embarque de manhã e de
+tarde + fechamento de fim de semana) calcula, UMA vez, o estado de cada
+minuto da semana e agrupa em segmentos. Consultar "fase atual e próxima
+transição" vira um acesso a array (O(1)), e o TTL do cache da presença
+passa a acompanhar a fase, vencendo exatamente em cada transição.
+
+Regras (as mesmas de sempre):
+- SEG a QUI: fecha nas janelas fecha_manha-reabre_manha e fecha_tarde-reabre_tarde
+- SEX: fecha às fecha_tarde e só reabre DOM às reabre_tarde
+- SÁB: fechado o dia todo
+- DOM: abre a partir de reabre_tarde
+- conferência: dentro das janelas de fechamento (qualquer dia)
+- a lista é zerada todo dia em reset_manha e reset_tarde
+"""
+from array import array
+from datetime import datetime, time, timedelta
+from typing import NamedTuple
+
+MIN_DIA = 24 * 60
+MIN_SEMANA = 7 * MIN_DIA
+
+FASE_ABERTA = "ABERTA"
+FASE_REABERTURA = "REABERTURA"   # primeiros minutos após reabrir (corrida de inscrições)
+FASE_CONFERENCIA = "CONFERENCIA"
+FASE_FECHADA = "FECHADA"
+
+# TTL (s) do cache da presença em cada fase
+TTLS_PADRAO = {
+    FASE_ABERTA: 8,
+    FASE_REABERTURA: 2,
+    FASE_CONFERENCIA: 20,
+    FASE_FECHADA: 300,
+}
+PICO_MIN_PADRAO = 15
+
+
+class Segmento(NamedTuple):
+    inicio: int          # minuto da semana (SEG 00:00 = 0)
+    fim: int             # minuto da próxima transição (pode passar de MIN_SEMANA)
+    fase: str
+    aberto: bool
+    conferencia: bool
+    ciclo_dia: int       # dia (a partir da SEG desta semana) do embarque do ciclo
+    ciclo_hora: str      # "HH:MM" do embarque
+    reset_no_inicio: bool
+    ultimo_reset: int    # minuto do último reset até o início (pode ser negativo)
+
+
+class Situacao(NamedTuple):
+    fase: str
+    aberto: bool
+    conferencia: bool
+    inicio: datetime
+    proxima_transicao: datetime
+    ciclo_hora: str
+    ciclo_data: str      # dd/mm/aaaa
+    ultimo_reset: datetime
+
+
+def _min(t: time) -> int:
+    return t.hour * 60 + t.minute
+
+
+def _estado_minuto(wd: int, t: time, h: dict):
+    """(aberto, conferencia, ciclo_dia, ciclo_hora) de um minuto, pelas regras originais."""
+    fm, rm = h["fecha_manha"], h["reabre_manha"]
+    ft, rt = h["fecha_tarde"], h["reabre_tarde"]
+
+    if wd == 5:  # Sábado
+        aberto = False
+    elif wd == 6:  # Domingo
+        aberto = t >= rt
+    elif wd == 4:  # Sexta
+        aberto = not (t >= ft or fm <= t < rm)
+    else:  # Segunda a Quinta
+        aberto = not ((fm <= t < rm) or (ft <= t < rt))
+
+    conferencia = (fm <= t < rm) or (ft <= t < rt)
+
+    emb_manha = h["embarque_manha"].strftime("%H:%M")
+    emb_tarde = h["embarque_tarde"].strftime("%H:%M")
+    em_fechamento_fds = (wd == 4 and t >= ft) or (wd == 5) or (wd == 6 and t < rt)
+    if em_fechamento_fds:
+        ciclo = (wd + (7 - wd) % 7, emb_manha)  # próxima segunda
+    elif t >= rt:
+        ciclo = (wd + 1, emb_manha)
+    elif t < rm:
+        ciclo = (wd, emb_manha)
+    else:
+        ciclo = (wd, emb_tarde)
+    return aberto, conferencia, ciclo[0], ciclo[1]
+
+
+class Agenda:
+    def __init__(self, horarios: dict, ttls: dict = None, pico_min: int = PICO_MIN_PADRAO):
+        self.horarios = dict(horarios)
+        self.ttls = dict(TTLS_PADRAO)
+        self.ttls.update(ttls or {})
+        self.pico_min = int(pico_min)
+        self._montar()
+
+    # ---------- pré-cálculo ----------
+    def _montar(self):
+        h = self.horarios
+        resets = sorted({_min(h["reset_manha"]), _min(h["reset_tarde"])})
+        minutos_reset = {d * MIN_DIA + r for d in range(14) for r in resets}
+
+        # duas semanas: os segmentos que cruzam o fim da semana ganham o fim certo
+        estados = []
+        for m in range(2 * MIN_SEMANA):
+            d, r = divmod(m % MIN_SEMANA, MIN_DIA)
+            ab, conf, cdia, chora = _estado_minuto(d, time(r // 60, r % 60), h)
+            estados.append([ab, conf, cdia + 7 * (m // MIN_SEMANA), chora, False])
+
+        # corrida de reabertura: pico_min minutos após cada fechado -> aberto
+        for m in range(1, len(estados)):
+            if estados[m][0] and not estados[m - 1][0]:
+                for k in range(m, min(m + self.pico_min, len(estados))):
+                    if not estados[k][0]:
+                        break
+                    estados[k][4] = True
+        # (a semana anterior ao minuto 0 é igual à atual)
+        for k in range(MIN_SEMANA, MIN_SEMANA + self.pico_min):
+            if estados[k][4] and estados[k][0]:
+                estados[k - MIN_SEMANA][4] = True
+
+        def fase(e):
+            if e[0]:
+                return FASE_REABERTURA if e[4] else FASE_ABERTA
+            return FASE_CONFERENCIA if e[1] else FASE_FECHADA
+
+        segmentos = []
+        indice = array("H", [0]) * MIN_SEMANA
+        ultimo_reset = resets[-1] - MIN_DIA
+        inicio = 0
+        for m in range(1, 2 * MIN_SEMANA + 1):
+            quebra = (
+                m == 2 * MIN_SEMANA
+                or m in minutos_reset
+                or fase(estados[m]) != fase(estados[inicio])
+                or estados[m][:4] != estados[inicio][:4]
+            )
+            if not quebra:
+                continue
+            if inicio < MIN_SEMANA:
+                e = estados[inicio]
+                if inicio in minutos_reset:
+                    ultimo_reset = inicio
+                segmentos.append(Segmento(
+                    inicio, m, fase(e), e[0], e[1], e[2], e[3], inicio in minutos_reset, ultimo_reset,
+                ))
+                for k in range(inicio, min(m, MIN_SEMANA)):
+                    indice[k] = len(segmentos) - 1
+            inicio = m
+            if inicio >= MIN_SEMANA:
+                break
+
+        self.segmentos = tuple(segmentos)
+        self._indice = indice
+
+    # ---------- consultas (O(1)) ----------
+    def _localizar(self, agora: datetime):
+        m = agora.weekday() * MIN_DIA + agora.hour * 60 + agora.minute
+        seg = self.segmentos[self._indice[m]]
+        base = (agora - timedelta(days=agora.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+        return seg, base
+
+    def consultar(self, agora: datetime) -> Situacao:
+        seg, base = self._localizar(agora)
+        return Situacao(
+            fase=seg.fase,
+            aberto=seg.aberto,
+            conferencia=seg.conferencia,
+            inicio=base + timedelta(minutes=seg.inicio),
+            proxima_transicao=base + timedelta(minutes=seg.fim),
+            ciclo_hora=seg.ciclo_hora,
+            ciclo_data=(base + timedelta(days=seg.ciclo_dia)).strftime("%d/%m/%Y"),
+            ultimo_reset=base + timedelta(minutes=seg.ultimo_reset),
+        )
+
+    def ultimo_reset(self, agora: datetime) -> datetime:
+        seg, base = self._localizar(agora)
+        return base + timedelta(minutes=seg.ultimo_reset)
+
+    def proximo_reset(self, agora: datetime) -> datetime:
+        """Próximo horário de zeragem depois de agora (abre o ciclo seguinte)."""
+        seg, base = self._localizar(agora)
+        i = self._indice[agora.weekday() * MIN_DIA + agora.hour * 60 + agora.minute]
+        n = len(self.segmentos)
+        for k in range(i + 1, i + n + 1):
+            s = self.segmentos[k % n]
+            if s.reset_no_inicio:
+                return base + timedelta(minutes=s.inicio + (MIN_SEMANA if k >= n else 0))
+        return base + timedelta(minutes=seg.fim)
+
+    def ttl(self, agora: datetime) -> float:
+        """TTL da fase, limitado ao tempo que falta para a próxima transição."""
+        seg, base = self._localizar(agora)
+        falta = (base + timedelta(minutes=seg.fim) - agora).total_seconds()
+        return max(0.5, min(float(self.ttls[seg.fase]), falta))
+
+    def transicoes(self):
+        """[(minuto_da_semana, fase, reset)] — linha do tempo da semana."""
+        return [(s.inicio, s.fase, s.reset_no_inicio) for s in self.segmentos]
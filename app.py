@@ -2,14 +2,47 @@ import streamlit as st
 import gspread
 from gspread.exceptions import APIError
 from google.oauth2.service_account import Credentials
-import pandas as pd
 from datetime import datetime, time, timedelta
 import pytz
 from fpdf import FPDF
 import urllib.parse
+import os
 import time as time_module
 import random
+import uuid
 import re
+import math
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import NamedTuple
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from cota import COTA_ESCRITA, COTA_LEITURA, CotaRota, chamar_com_cota
+from embarque import EMBARQUE_HEADERS, EMBARQUE_REFRESH_S, ChecklistEmbarque
+from exclusoes import ExclusoesPresenca
+from presenca import (
+    VAGAS_PADRAO, LISTA_VAZIA, CABECALHO_PRESENCA, montar_lista, render_tabela_html, texto_whatsapp,
+    diff_ranking, juntar_mudancas, MUDANCA_PROMOVIDO, MUDANCA_EXCEDENTE,
+    FMT_CICLO, nome_particao, ciclo_da_particao, particoes_vencidas,
+    SnapshotPresenca, SNAPSHOT_VAZIO, congelar_grade,
+)
+from agenda import Agenda, TTLS_PADRAO, PICO_MIN_PADRAO, FASE_ABERTA, FASE_REABERTURA
+from usuarios import (
+    COLS_CHAVE, COLS_ADMIN, COLS_LOGIN, COLUNAS_LINHA_USUARIO, COLUNAS_VAZIAS, GRADUACOES, ORIGENS,
+    intervalos_projecao, montar_colunas, registro_da_linha, celulas_da_linha, letra_coluna,
+    COL_EMAIL_KEY, COL_TEL_KEY, COLS_CHAVES_CANONICAS, chave_email, com_chaves,
+    linha_no_cabecalho, chaves_para_migrar,
+)
+from cache_disco import CacheDisco
+from cache_compartilhado import CamadaCompartilhada
+from diario import DiarioPresenca, EV_CONFIRMAR
+from transporte import TransporteSheets
+from config_rota import RegistroConfig, ConfigRota, REGISTRO, CHAVES_AGENDA, CHAVES_REFRESH
+from perfil import (
+    PerfilExecucao, FASE_AUTH, FASE_SNAPSHOT, FASE_STATUS, FASE_RANKING,
+    FASE_HTML, FASE_PDF, FASE_WHATSAPP, FASE_ADMIN_LISTA,
+)
 
 # ==========================================================
 # CONFIGURAÇÃO DE ACESSO
@@ -22,9 +55,91 @@ scope = [
 SPREADSHEET_NAME = "ListaPresenca"
 WS_USUARIOS = "Usuarios"
 WS_CONFIG = "Config"
+WS_EMBARQUE = "Embarque"
 
 FUSO_BR = pytz.timezone("America/Sao_Paulo")
 
+
+# ==========================================================
+# ROTAS (uma instância atende várias rotas)
+# ==========================================================
+# Cada rota tem sua própria planilha (com as abas de presença, Usuarios e
+# Config), número de vagas, horários e cota de leituras/escritas por minuto.
+# Sem [rotas] no secrets, roda só a rota original (Nova Iguaçu).
+#
+#   [rotas.nova_iguacu]
+#   nome = "Rota Nova Iguaçu"
+#   planilha = "ListaPresenca"
+#   vagas = 38
+#   cota_leituras_min = 300      # ou cota_por_minuto = N (vale para as duas)
+#   cota_escritas_min = 300
+#   [rotas.nova_iguacu.horarios]
+#   fecha_tarde = "17:00"
+ROTA_PADRAO = "nova_iguacu"
+
+HORARIOS_PADRAO = {
+    "fecha_manha": "05:00", "reabre_manha": "07:00", "reset_manha": "06:50", "embarque_manha": "06:30",
+    "fecha_tarde": "17:00", "reabre_tarde": "19:00", "reset_tarde": "18:50", "embarque_tarde": "18:30",
+    # fim de semana: fecha SEX no fecha_tarde e só reabre DOM no reabre_tarde
+}
+
+# Orçamento de chamadas à API por rota (cota.py). A cota do Sheets é por
+# projeto e separada para leitura e escrita (300/min cada): sem valor no
+# secrets, cada rota fica com a sua fração, para uma rota movimentada não
+# consumir o que as outras precisam.
+COTA_LEITURAS_PROJETO_MIN = 300
+COTA_ESCRITAS_PROJETO_MIN = 300
+
+
+class Rota(NamedTuple):
+    id: str
+    nome: str
+    planilha: str
+    vagas: int
+    horarios: dict
+    cota_leituras_min: int
+    cota_escritas_min: int
+
+
+def _hhmm(s: str) -> time:
+    h, m = str(s).strip().split(":")
+    return time(int(h), int(m))
+
+
+def _montar_rota(rota_id: str, cfg, n_rotas: int = 1) -> Rota:
+    cfg = dict(cfg or {})
+    horarios = {k: _hhmm(v) for k, v in HORARIOS_PADRAO.items()}
+    for k, v in dict(cfg.get("horarios", {}) or {}).items():
+        if k in horarios:
+            horarios[k] = _hhmm(v)
+    return Rota(
+        id=rota_id,
+        nome=str(cfg.get("nome") or "Rota Nova Iguaçu"),
+        planilha=str(cfg.get("planilha") or SPREADSHEET_NAME),
+        vagas=int(cfg.get("vagas") or VAGAS_PADRAO),
+        horarios=horarios,
+        cota_leituras_min=int(cfg.get("cota_leituras_min") or cfg.get("cota_por_minuto")
+                              or max(1, COTA_LEITURAS_PROJETO_MIN // max(1, n_rotas))),
+        cota_escritas_min=int(cfg.get("cota_escritas_min") or cfg.get("cota_por_minuto")
+                              or max(1, COTA_ESCRITAS_PROJETO_MIN // max(1, n_rotas))),
+    )
+
+
+@st.cache_resource
+def carregar_rotas():
+    try:
+        cfg_rotas = dict(st.secrets.get("rotas", {}) or {})
+    except Exception:
+        cfg_rotas = {}
+    if not cfg_rotas:
+        cfg_rotas = {ROTA_PADRAO: {}}
+    return {rid: _montar_rota(rid, cfg, len(cfg_rotas)) for rid, cfg in cfg_rotas.items()}
+
+
+def obter_rota(rota_id: str) -> Rota:
+    rotas = carregar_rotas()
+    return rotas.get(rota_id) or next(iter(rotas.values()))
+
 # ==========================================================
 # GIF NO FINAL DA PÁGINA (alteração solicitada)
 # ==========================================================
@@ -64,32 +179,170 @@ def tel_is_valid_11(s: str) -> bool:
     return len(tel_only_digits(s)) == 11
 
 
+# ==========================================================
+# COTA POR ROTA (token buckets por planilha, ver cota.py)
+# ==========================================================
+class CotaRotaCompartilhada(CotaRota):
+    """Mesma interface, mas os baldes ficam na camada compartilhada (todas as réplicas)."""
+
+    def __init__(self, leituras_min: int, escritas_min: int, camada: CamadaCompartilhada, rota_id: str):
+        super().__init__(leituras_min, escritas_min)
+        self.camada = camada
+        self.rota_id = rota_id
+
+    def _tomar_token(self, tipo: str) -> float:
+        return self.camada.tomar_token(f"{self.rota_id}:{tipo}", self.por_minuto[tipo])
+
+    def penalizar(self, tipo: str, segundos: float):
+        self.camada.penalizar(f"{self.rota_id}:{tipo}", self.por_minuto[tipo], segundos)
+
+
+# ==========================================================
+# CAMADA COMPARTILHADA ENTRE RÉPLICAS (opcional)
+# ==========================================================
+# ROTA_CACHE_COMPARTILHADO=/volume/comum/rota.db liga a camada SQLite de
+# cache_compartilhado.py: snapshots, carimbos de versão, cota por rota e voo
+# único passam a valer para todas as réplicas. Sem a variável, tudo fica
+# como antes (só no processo).
+@st.cache_resource
+def camada_compartilhada():
+    caminho = os.environ.get("ROTA_CACHE_COMPARTILHADO", "").strip()
+    return CamadaCompartilhada(caminho) if caminho else None
+
+
+def versao_dados(rota_id: str, conjunto: str) -> int:
+    """Carimbo de versão do conjunto (entra na chave do cache_data); 0 sem a camada."""
+    camada = camada_compartilhada()
+    return camada.versao(f"{rota_id}:{conjunto}") if camada is not None else 0
+
+
+def publicar_escrita(rota_id: str, conjunto: str):
+    """Uma escrita nesta réplica invalida os snapshots do conjunto em todas."""
+    camada = camada_compartilhada()
+    if camada is not None:
+        camada.invalidar(f"{rota_id}:{conjunto}")
+
+
+@st.cache_resource
+def cotas_por_rota():
+    """{rota_id: CotaRota} + {spreadsheet_id: rota_id} (compartilhado entre sessões)."""
+    return {"cotas": {}, "planilhas": {}, "lock": threading.Lock()}
+
+
+def registrar_planilha_rota(spreadsheet_id: str, rota: Rota):
+    reg = cotas_por_rota()
+    with reg["lock"]:
+        reg["planilhas"][spreadsheet_id] = rota.id
+        if rota.id not in reg["cotas"]:
+            camada = camada_compartilhada()
+            reg["cotas"][rota.id] = (
+                CotaRotaCompartilhada(rota.cota_leituras_min, rota.cota_escritas_min, camada, rota.id)
+                if camada is not None else CotaRota(rota.cota_leituras_min, rota.cota_escritas_min)
+            )
+
+
+def _cota_da_chamada(func):
+    """Descobre a rota pela planilha do objeto gspread (Worksheet/Spreadsheet)."""
+    dono = getattr(func, "__self__", None)
+    sid = getattr(dono, "spreadsheet_id", None) or getattr(dono, "id", None)
+    if not sid:
+        return None
+    reg = cotas_por_rota()
+    rota_id = reg["planilhas"].get(sid)
+    return reg["cotas"].get(rota_id) if rota_id else None
+
+
 # ==========================================================
 # WRAPPER COM RETRY / BACKOFF PARA 429
 # ==========================================================
 def gs_call(func, *args, **kwargs):
-    max_tries = 6
-    base = 0.6
-    for attempt in range(max_tries):
+    """Chamada ao gspread com o token da rota da planilha e retry para 429/5xx."""
+    return chamar_com_cota(_cota_da_chamada(func), func, *args, **kwargs)
+
+
+# ==========================================================
+# LEITURA ÚNICA EM VOO (colapsa leituras concorrentes)
+# ==========================================================
+# Quando um cache expira ou é limpo (ex.: logo após uma confirmação), todas
+# as sessões que rodam naquele instante iriam à planilha. Com o voo único,
+# só a primeira lê; as demais esperam o mesmo Future e recebem o resultado
+# (ou o mesmo erro). A chave é o conjunto de dados, não a entrada do cache:
+# ex. a mesma projeção de Usuarios pedida por telas diferentes divide o voo.
+# Entre réplicas, o mesmo papel é da camada compartilhada (ler_planilha).
+class VooUnico:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.em_voo = {}          # chave -> Future
+        self.leituras = {}        # chave -> leituras reais
+        self.colapsadas = {}      # chave -> chamadas que pegaram carona
+
+    def executar(self, chave, func, timeout: float = 60.0):
+        with self.lock:
+            fut = self.em_voo.get(chave)
+            dono = fut is None
+            if dono:
+                fut = self.em_voo[chave] = Future()
+                self.leituras[chave] = self.leituras.get(chave, 0) + 1
+            else:
+                self.colapsadas[chave] = self.colapsadas.get(chave, 0) + 1
+        if not dono:
+            return fut.result(timeout=timeout)
         try:
-            return func(*args, **kwargs)
-        except APIError as e:
-            msg = str(e)
-            is_429 = ("429" in msg) or ("Quota exceeded" in msg) or ("RESOURCE_EXHAUSTED" in msg)
-            is_5xx = any(code in msg for code in ["500", "502", "503", "504"])
-            if is_429 or is_5xx:
-                sleep_s = (base * (2 ** attempt)) + random.uniform(0.0, 0.35)
-                time_module.sleep(min(sleep_s, 6.0))
-                continue
-            raise
-    raise APIError("Google Sheets: muitas requisições (429). Tente novamente em instantes.")
+            fut.set_result(func())
+        except BaseException as e:
+            fut.set_exception(e)
+        finally:
+            with self.lock:
+                self.em_voo.pop(chave, None)
+        return fut.result()
+
+    def estatisticas(self) -> dict:
+        with self.lock:
+            return {
+                chave: {"leituras": n, "colapsadas": self.colapsadas.get(chave, 0)}
+                for chave, n in self.leituras.items()
+            }
+
+
+@st.cache_resource
+def voo_unico():
+    return VooUnico()
+
+
+def ler_planilha(dataset: str, rota_id: str, func, *args, idade_max: float = 0.0, **kwargs):
+    """
+    gs_call com voo único por (dataset, rota). Com a camada compartilhada e
+    idade_max > 0, aceita o snapshot de outra réplica com até idade_max
+    segundos (na versão atual do conjunto) e publica o que ler.
+    """
+    def ler():
+        return gs_call(func, *args, **kwargs)
+
+    camada = camada_compartilhada()
+    if camada is not None and idade_max > 0:
+        conjunto = dataset.split(":", 1)[0]
+        ler_direto = ler
+
+        def ler():
+            return camada.ler_compartilhado(f"{rota_id}:{dataset}", ler_direto, idade_max,
+                                            chave_versao=f"{rota_id}:{conjunto}")
+    return voo_unico().executar((dataset, rota_id), ler)
 
 
 # ==========================================================
 # CONEXÕES (CACHE_RESOURCE)
 # ==========================================================
+def usar_emulador() -> bool:
+    """ROTA_SHEETS_EMULADOR=1 troca o Google Sheets pelo emulador local (sheets_emulador.py)."""
+    return os.environ.get("ROTA_SHEETS_EMULADOR", "").strip().lower() in ("1", "true", "sim")
+
+
 @st.cache_resource
 def conectar_gsheets():
+    if usar_emulador():
+        import sheets_emulador
+        return sheets_emulador.cliente_do_ambiente()
+
     info = dict(st.secrets["gcp_service_account"])
 
     # O Streamlit Secrets às vezes guarda a chave com "\\n" literal
@@ -98,41 +351,219 @@ def conectar_gsheets():
         info["private_key"] = pk.replace("\\n", "\n")
 
     creds = Credentials.from_service_account_info(info, scopes=scope)
-    return gspread.authorize(creds)
+    transporte = transporte_sheets(creds)
+    client = gspread.Client(auth=creds, session=transporte.sessao)
+    client.http_client.set_timeout(transporte.timeout)
+    client.transporte = transporte      # estatísticas no painel do ADM
+    return client
+
 
 @st.cache_resource
-def abrir_documento():
-    client = conectar_gsheets()
-    return gs_call(client.open, SPREADSHEET_NAME)
+def transporte_sheets(_creds):
+    """
+    Sessão HTTP única do processo (transporte.py): pool keep-alive, timeouts,
+    gzip e token renovado em segundo plano. Ajustável em [transporte] nos
+    secrets: pool_maxsize, timeout_conexao, timeout_leitura, gzip.
+    """
+    try:
+        cfg = dict(st.secrets.get("transporte", {}) or {})
+    except Exception:
+        cfg = {}
+    return TransporteSheets(_creds, **{k: cfg[k] for k in ("pool_maxsize", "timeout_conexao",
+                                                           "timeout_leitura", "gzip") if k in cfg})
 
+# Cliente autorizado único; documentos/abas em pool por rota (cache por rota_id)
 @st.cache_resource
-def ws_usuarios():
-    doc = abrir_documento()
-    return gs_call(doc.worksheet, WS_USUARIOS)
+def abrir_documento(rota_id: str):
+    rota = obter_rota(rota_id)
+    client = conectar_gsheets()
+    doc = gs_call(client.open, rota.planilha)
+    registrar_planilha_rota(doc.id, rota)
+    return doc
 
 @st.cache_resource
-def ws_presenca():
-    doc = abrir_documento()
-    return doc.sheet1
+def ws_usuarios(rota_id: str):
+    doc = abrir_documento(rota_id)
+    return gs_call(doc.worksheet, WS_USUARIOS)
 
 @st.cache_resource
-def ws_config():
-    doc = abrir_documento()
+def ws_config(rota_id: str):
+    doc = abrir_documento(rota_id)
     try:
         return gs_call(doc.worksheet, WS_CONFIG)
     except Exception:
-        sheet_c = gs_call(doc.add_worksheet, title=WS_CONFIG, rows="10", cols="5")
+        sheet_c = gs_call(doc.add_worksheet, title=WS_CONFIG, rows="60", cols="5")
         gs_call(sheet_c.update, "A1:A2", [["LIMITE"], ["100"]])
         return sheet_c
 
+class AbaSobDemanda:
+    """Abre a aba só quando algum método é usado (não trava a primeira tela)."""
+
+    def __init__(self, abrir, rota_id: str):
+        self._abrir = abrir
+        self._rota_id = rota_id
+
+    def __getattr__(self, nome):
+        return getattr(self._abrir(self._rota_id), nome)
+
+
+@st.cache_resource
+def ws_embarque(rota_id: str):
+    doc = abrir_documento(rota_id)
+    try:
+        return gs_call(doc.worksheet, WS_EMBARQUE)
+    except Exception:
+        sheet_e = gs_call(doc.add_worksheet, title=WS_EMBARQUE, rows="120", cols="5")
+        gs_call(sheet_e.update, "A1", [EMBARQUE_HEADERS])
+        return sheet_e
+
+
+# ==========================================================
+# PRESENÇA: UMA ABA POR CICLO
+# ==========================================================
+# Cada ciclo (de uma zeragem à seguinte) tem a sua aba, Presenca_AAAAMMDD_HHMM,
+# já com cabeçalho e linhas pré-alocadas. O id do ciclo vem da agenda (o
+# mesmo em todas as réplicas), então a zeragem só troca a aba usada: nada é
+# apagado nem redimensionado na virada, e toda leitura/escrita fica restrita
+# ao ciclo atual. Ao abrir um ciclo, a aba do próximo é criada em segundo
+# plano e as de ciclos antigos além de reter_ciclos (Config) saem num único
+# batch_update (deleteSheet); o histórico de eventos continua no diário.
+# A aba antiga (sheet1) não é mais escrita: se a aba do ciclo atual ainda
+# não existir, ela é criada com as linhas do ciclo que estiverem na antiga.
+LINHAS_PARTICAO = 200
+
+
+def aba_ja_existe(e: APIError) -> bool:
+    """addSheet recusado porque a aba já existe (criada por outra réplica)."""
+    return "already exists" in str(e)
+
+
+class ParticoesPresenca:
+    def __init__(self, rota_id: str):
+        self.rota_id = rota_id
+        self.lock = threading.Lock()
+        self.abas = {}            # ciclo -> Worksheet
+        self.preparados = set()   # ciclos em que a próxima aba / poda já foram disparadas
+        self.criadas = 0
+        self.podadas = 0
+        self.ultimo_erro = None
+
+    def aba(self, ciclo: str, migrar: bool = False):
+        with self.lock:
+            ws = self.abas.get(ciclo)
+        if ws is None:
+            ws = voo_unico().executar((f"particao:{ciclo}", self.rota_id),
+                                      lambda: self._abrir_ou_criar(ciclo, migrar))
+            with self.lock:
+                self.abas[ciclo] = ws
+                # guarda só o ciclo atual e o próximo
+                for c in sorted(self.abas)[:-2]:
+                    del self.abas[c]
+        return ws
+
+    def _abrir_ou_criar(self, ciclo: str, migrar: bool, titulos: dict = None):
+        doc = abrir_documento(self.rota_id)
+        if titulos is None:
+            titulos = {w.title: w for w in gs_call(doc.worksheets)}
+        titulo = nome_particao(ciclo)
+        if titulo in titulos:
+            return titulos[titulo]
+        linhas = [list(CABECALHO_PRESENCA)]
+        if migrar:
+            linhas += self._linhas_legado(doc, ciclo)
+        try:
+            ws = gs_call(doc.add_worksheet, title=titulo, rows=len(linhas) + LINHAS_PARTICAO,
+                         cols=len(CABECALHO_PRESENCA))
+        except APIError as e:
+            if not aba_ja_existe(e):
+                raise
+            return gs_call(doc.worksheet, titulo)     # outra réplica criou antes
+        gs_call(ws.update, values=linhas, range_name="A1")
+        with self.lock:
+            self.criadas += 1
+        return ws
+
+    def _linhas_legado(self, doc, ciclo: str) -> list:
+        """Linhas do ciclo ainda gravadas na aba antiga (sheet1, se ela não for partição nem outra aba do app)."""
+        legado = doc.sheet1
+        if ciclo_da_particao(legado.title) is not None or legado.title in (WS_USUARIOS, WS_CONFIG, WS_EMBARQUE):
+            return []
+        marco = FUSO_BR.localize(datetime.strptime(ciclo, FMT_CICLO))
+        out = []
+        for r in (filtrar_linhas_presenca(gs_call(legado.get_all_values)) or [])[1:]:
+            dt = _parse_dt(r[0])
+            if dt is not None and dt >= marco:
+                out.append(r)
+        return out
+
+    def preparar(self, ciclo: str, proximo: str, reter: int):
+        """Uma vez por ciclo e processo: cria a aba do próximo ciclo e poda as vencidas."""
+        with self.lock:
+            if ciclo in self.preparados:
+                return
+            self.preparados.add(ciclo)
+        t = threading.Thread(target=self._preparar, args=(ciclo, proximo, reter), daemon=True)
+        add_script_run_ctx(t, get_script_run_ctx())
+        t.start()
+
+    def _preparar(self, ciclo: str, proximo: str, reter: int):
+        try:
+            doc = abrir_documento(self.rota_id)
+            titulos = {w.title: w for w in gs_call(doc.worksheets)}
+            ws = self._abrir_ou_criar(proximo, False, titulos)
+            with self.lock:
+                self.abas[proximo] = ws
+            vencidas = particoes_vencidas(titulos, ciclo, reter)
+            if vencidas:
+                gs_call(doc.batch_update, {"requests": [{"deleteSheet": {"sheetId": titulos[t].id}}
+                                                        for t in vencidas]})
+                with self.lock:
+                    self.podadas += len(vencidas)
+            self.ultimo_erro = None
+        except Exception as e:
+            # outra réplica pode ter podado as mesmas abas: tenta no próximo ciclo
+            self.ultimo_erro = f"{type(e).__name__}: {e}"
+
+
+@st.cache_resource
+def particoes_presenca(rota_id: str):
+    return ParticoesPresenca(rota_id)
+
+
+def ws_presenca(rota_id: str, ciclo: str = None):
+    """Aba de presença do ciclo (padrão: o atual)."""
+    rota = obter_rota(rota_id)
+    agora = _br_now()
+    atual = id_ciclo(agora, rota)
+    particoes = particoes_presenca(rota_id)
+    ws = particoes.aba(ciclo or atual, migrar=(ciclo or atual) == atual)
+    particoes.preparar(atual, agenda_da_rota(rota).proximo_reset(agora).strftime(FMT_CICLO),
+                       config_rota(rota_id).get("reter_ciclos", 14))
+    return ws
+
 
 # ==========================================================
 # SENHA TEMPORÁRIA (1 acesso) - RECUPERAÇÃO SEGURA
 # ==========================================================
 TEMP_HEADERS = ["TEMP_SENHA", "TEMP_EXPIRA", "TEMP_USADA"]
 
+def _deslocamento_relogio() -> timedelta:
+    """
+    Só para o harness de carga (benchmarks/carga_abertura.py), que injeta
+    [teste] relogio_deslocamento_s no st.secrets para simular a reabertura
+    das 19:00. Sem a chave (produção), o relógio é o real.
+    """
+    try:
+        teste = dict(st.secrets.get("teste", {}) or {})
+        return timedelta(seconds=float(teste.get("relogio_deslocamento_s", 0) or 0))
+    except Exception:
+        return timedelta(0)
+
+
+_RELOGIO_DESLOCAMENTO = _deslocamento_relogio()
+
 def _br_now():
-    return datetime.now(FUSO_BR)
+    return datetime.now(FUSO_BR) + _RELOGIO_DESLOCAMENTO
 
 def _fmt_dt(dt: datetime) -> str:
     return dt.strftime("%d/%m/%Y %H:%M:%S")
@@ -178,75 +609,619 @@ def ensure_temp_cols(sheet_u):
 
     return {h: new_headers.index(h) + 1 for h in TEMP_HEADERS}
 
-def find_user_row_by_email_tel(sheet_u, email: str, tel_digits: str):
-    email = str(email or "").strip().lower()
-    tel_digits = tel_only_digits(tel_digits)
+def find_user_row_by_email_tel(rota_id: str, email: str, tel_digits: str):
+    """
+    Localiza o usuário no índice de login em cache (já com Senha, STATUS e
+    TEMP_*), sem chamada à API. Só quando ele não está no índice, relê a
+    projeção uma vez (releitura_usuario). Retorna (nº da linha, dict) ou
+    (None, None).
+    """
+    achado = _no_indice(usuarios_login(rota_id), email, tel_digits)
+    if achado[0] is not None:
+        return achado
+    return releitura_usuario(rota_id, email, tel_digits)
+
 
-    rows = gs_call(sheet_u.get_all_values)
-    if not rows or len(rows) < 2:
-        return None, None
+def _no_indice(indice, email: str, tel_digits: str):
+    i = indice.indice_por_email_tel(email, tel_digits)
+    return (i + 2, indice.registro(i)) if i is not None else (None, None)
 
-    headers = [str(h).strip() for h in rows[0]]
-    if "Email" in headers:
-        i_email = headers.index("Email")
-    elif "EMAIL" in headers:
-        i_email = headers.index("EMAIL")
-    else:
-        return None, None
 
-    if "TELEFONE" not in headers:
+# ==========================================================
+# LEITURAS (CACHE_DATA)
+# ==========================================================
+# Todas as leituras recebem rota_id: cada rota tem sua própria entrada de
+# cache, e .clear(rota_id) invalida só a rota que mudou.
+@st.cache_data(ttl=120)
+def buscar_cabecalho_usuarios(rota_id: str):
+    try:
+        sheet_u = ws_usuarios(rota_id)
+        return [str(h).strip() for h in ler_planilha("usuarios_cab", rota_id, sheet_u.row_values, 1, idade_max=60.0)]
+    except Exception:
+        return []
+
+
+def ler_colunas_usuarios(rota_id: str, nomes: tuple, idade_max: float = 0.0, versao: int = 0):
+    """Projeção: um batch_get só com as colunas pedidas (sem cache)."""
+    intervalos = intervalos_projecao(buscar_cabecalho_usuarios(rota_id), nomes)
+    if not intervalos:
+        return COLUNAS_VAZIAS
+    sheet_u = ws_usuarios(rota_id)
+    respostas = ler_planilha("usuarios:" + ",".join(intervalos), rota_id,
+                             sheet_u.batch_get, list(intervalos.values()), idade_max=idade_max)
+    return montar_colunas(list(intervalos), respostas, versao)
+
+
+# Os índices de usuários e a grade de presença ficam em cache_resource, não
+# cache_data: cache_data devolve uma cópia despicklada a cada chamada (uma
+# por sessão e rerun). Como os objetos são imutáveis (tuplas), todas as
+# sessões recebem o mesmo, por referência.
+@st.cache_resource(ttl=30)
+def buscar_usuarios_cadastrados(rota_id: str, versao: int = 0):
+    """Uso geral (Login/Cadastro/Recuperar): só Email e TELEFONE."""
+    try:
+        cols = ler_colunas_usuarios(rota_id, COLS_CHAVE, idade_max=15.0, versao=versao)
+        if cols.total:
+            # no disco vai só a contagem (limite de cadastros), nunca e-mail/telefone
+            cache_disco(rota_id).guardar("usuarios_total", cols.total)
+        return cols
+    except Exception:
+        return COLUNAS_VAZIAS
+
+@st.cache_resource(ttl=30)
+def buscar_usuarios_login(rota_id: str, versao: int = 0):
+    """
+    Login/recuperação: COLS_LOGIN. Fica só na memória do processo: nunca vai
+    para o cache em disco nem para a camada compartilhada (tem Senha).
+    """
+    try:
+        return ler_colunas_usuarios(rota_id, COLS_LOGIN, versao=versao)
+    except Exception:
+        return COLUNAS_VAZIAS
+
+@st.cache_resource(ttl=3)
+def buscar_usuarios_admin(rota_id: str, versao: int = 0):
+    """Uso específico do ADM: mais fresco (Nome, Graduação, Email, TELEFONE, STATUS)."""
+    try:
+        return ler_colunas_usuarios(rota_id, COLS_ADMIN, idade_max=1.5, versao=versao)
+    except Exception:
+        return COLUNAS_VAZIAS
+
+
+def usuarios_publico(rota_id: str):
+    return remendos_usuarios(rota_id).aplicar(buscar_usuarios_cadastrados(rota_id, versao_dados(rota_id, "usuarios")))
+
+
+def usuarios_login(rota_id: str):
+    return remendos_usuarios(rota_id).aplicar(buscar_usuarios_login(rota_id, versao_dados(rota_id, "usuarios")))
+
+
+def usuarios_admin(rota_id: str):
+    return remendos_usuarios(rota_id).aplicar(buscar_usuarios_admin(rota_id, versao_dados(rota_id, "usuarios")))
+
+
+def invalidar_usuarios(rota_id: str, so_admin: bool = False):
+    """Releitura completa: limpa os caches desta réplica e avisa as outras."""
+    versao = versao_dados(rota_id, "usuarios")
+    buscar_usuarios_admin.clear(rota_id, versao)
+    if so_admin:
+        return
+    buscar_usuarios_cadastrados.clear(rota_id, versao)
+    buscar_usuarios_login.clear(rota_id, versao)
+    remendos_usuarios(rota_id).limpar()
+    publicar_escrita(rota_id, "usuarios")
+
+
+# ==========================================================
+# REMENDOS SOBRE O ÍNDICE (releitura na falta e escritas locais)
+# ==========================================================
+# Quem foi cadastrado/aprovado há instantes (em outra réplica ou à mão na
+# planilha) ainda não está no índice em cache (TTL 30 s). Em vez de limpar
+# o cache de todos, a falta vira UMA releitura da projeção de login (voo
+# único entre as sessões). A linha achada entra como remendo sobre o
+# índice compartilhado até a próxima leitura completa; e-mail não
+# encontrado fica num cache negativo curto, para tentativas repetidas com
+# dados errados não irem à planilha.
+#
+# As escritas deste app na aba (cadastro, importação, liberar/bloquear,
+# senha temporária, atualização de cadastro) seguem o mesmo caminho: viram
+# remendos na hora (quem escreveu já vê o resultado no próximo rerun, assim
+# como as outras sessões desta réplica) e, RECONCILIAR_APOS_S depois, uma
+# leitura só das linhas escritas confere a planilha. Só se ela divergir o
+# índice é relido por inteiro.
+REMENDO_TTL_S = 35.0
+NEGATIVO_TTL_S = 30.0
+NEGATIVO_MAX = 512
+RECONCILIAR_APOS_S = 2.0
+
+
+class RemendosUsuarios:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.linhas = {}          # email_key -> (índice 0-based, campos, monotonic)
+        self.negativos = {}       # email_key -> (versão dos dados, expira em monotonic)
+        self.buscas = 0
+        self.negativos_evitados = 0
+        self.escritas = 0         # linhas escritas aplicadas direto no índice
+        self.divergencias = 0     # conferências que acharam a planilha diferente
+        self.geracao = 0          # muda a cada remendo novo/vencido
+        self._aplicados = {}      # id(índice base) -> (base, geração, índice remendado)
+
+    def aplicar(self, cols):
+        """Índice com os remendos; o mesmo objeto enquanto base e remendos não mudam."""
+        agora = time_module.monotonic()
+        with self.lock:
+            vivos = {k: v for k, v in self.linhas.items() if agora - v[2] < REMENDO_TTL_S}
+            if len(vivos) != len(self.linhas):
+                self.linhas = vivos
+                self.geracao += 1
+            if not self.linhas:
+                self._aplicados.clear()
+                return cols
+            base, geracao, pronto = self._aplicados.get(id(cols), (None, -1, None))
+            if base is cols and geracao == self.geracao:
+                return pronto
+            remendos, geracao = list(self.linhas.items()), self.geracao
+        pronto = cols
+        for k, (i, campos, _t) in remendos:
+            if i < cols.total and cols.email_keys[i] != k:
+                continue          # linhas deslocadas: o índice lido é mais novo que o remendo
+            pronto = pronto.com_campos(i, campos)
+        with self.lock:
+            if len(self._aplicados) >= 4:     # público e login, com folga para a versão anterior
+                self._aplicados.clear()
+            self._aplicados[id(cols)] = (cols, geracao, pronto)
+        return pronto
+
+    def remendar(self, linha: int, campos: dict):
+        """Campos da linha (1-based) sobre o índice; soma aos de um remendo anterior da mesma linha."""
+        k = chave_email(campos.get("Email"))
+        with self.lock:
+            anterior = self.linhas.get(k)
+            if anterior is not None and anterior[0] == linha - 2:
+                campos = {**anterior[1], **campos}
+            self.linhas[k] = (linha - 2, dict(campos), time_module.monotonic())
+            self.negativos.pop(k, None)
+            self.geracao += 1
+
+    def negativo(self, email_key: str, versao: int) -> bool:
+        with self.lock:
+            neg = self.negativos.get(email_key)
+            if neg is not None and neg[0] == versao and neg[1] > time_module.monotonic():
+                self.negativos_evitados += 1
+                return True
+            return False
+
+    def marcar_negativo(self, email_key: str, versao: int):
+        with self.lock:
+            if len(self.negativos) >= NEGATIVO_MAX:
+                agora = time_module.monotonic()
+                self.negativos = {k: v for k, v in self.negativos.items() if v[1] > agora}
+                if len(self.negativos) >= NEGATIVO_MAX:
+                    self.negativos.pop(next(iter(self.negativos)))
+            self.negativos[email_key] = (versao, time_module.monotonic() + NEGATIVO_TTL_S)
+
+    def limpar(self):
+        """Escrita nesta réplica: o próximo índice já vem completo."""
+        with self.lock:
+            self.linhas.clear()
+            self.negativos.clear()
+            self.geracao += 1
+            self._aplicados.clear()
+
+
+@st.cache_resource
+def remendos_usuarios(rota_id: str):
+    return RemendosUsuarios()
+
+
+def linha_anexada(resposta, padrao: int) -> int:
+    """Primeira linha escrita por append_row(s), pela resposta da API (updatedRange)."""
+    try:
+        m = re.search(r"![A-Z]+(\d+)", resposta["updates"]["updatedRange"])
+        return int(m.group(1))
+    except (KeyError, TypeError, AttributeError):
+        return padrao
+
+
+def escrita_usuarios(rota_id: str, escritas):
+    """
+    Depois de gravar na aba Usuarios: escritas = [(linha 1-based, {coluna:
+    valor})]. Aplica no índice desta réplica, avisa as outras e confere a
+    planilha em segundo plano.
+    """
+    escritas = [(int(linha), dict(campos)) for linha, campos in escritas]
+    if not escritas:
+        return
+    rem = remendos_usuarios(rota_id)
+    for linha, campos in escritas:
+        rem.remendar(linha, campos)
+    with rem.lock:
+        rem.escritas += len(escritas)
+    publicar_escrita(rota_id, "usuarios")
+    t = threading.Thread(target=_conferir_escritas, args=(rota_id, escritas), daemon=True)
+    add_script_run_ctx(t, get_script_run_ctx())
+    t.start()
+
+
+def _conferir_escritas(rota_id: str, escritas):
+    time_module.sleep(RECONCILIAR_APOS_S)
+    rem = remendos_usuarios(rota_id)
+    try:
+        cab = buscar_cabecalho_usuarios(rota_id)
+        ini = min(linha for linha, _ in escritas)
+        fim = max(linha for linha, _ in escritas)
+        vals = gs_call(ws_usuarios(rota_id).get, f"A{ini}:{letra_coluna(len(cab))}{fim}")
+        for linha, campos in escritas:
+            # compara com o remendo atual da linha (uma escrita posterior pode ter mudado os campos)
+            with rem.lock:
+                atual = rem.linhas.get(chave_email(campos.get("Email")))
+            if atual is None or atual[0] != linha - 2:
+                continue
+            r = registro_da_linha(cab, vals[linha - ini] if linha - ini < len(vals) else [])
+            if any(str(r.get(n, "")).strip() != str(v).strip() for n, v in atual[1].items() if n in cab):
+                raise ValueError(f"linha {linha} diverge da planilha")
+        return
+    except Exception:
+        pass
+    with rem.lock:
+        rem.divergencias += 1
+    invalidar_usuarios(rota_id)
+
+
+def releitura_usuario(rota_id: str, email: str, tel_digits: str):
+    """
+    Usuário fora do índice de login: UMA leitura da projeção COLS_LOGIN, ao
+    vivo e em voo único. Achado, entra como remendo (os próximos logins saem
+    do cache); senão, fica no cache negativo até a próxima versão dos dados.
+    """
+    email_key = str(email or "").strip().lower()
+    remendos = remendos_usuarios(rota_id)
+    versao = versao_dados(rota_id, "usuarios")
+    if not email_key or remendos.negativo(email_key, versao):
+        return None, None
+    with remendos.lock:
+        remendos.buscas += 1
+    linha, u = _no_indice(ler_colunas_usuarios(rota_id, COLS_LOGIN), email, tel_digits)
+    if linha is None:
+        remendos.marcar_negativo(email_key, versao)
         return None, None
-    i_tel = headers.index("TELEFONE")
+    remendos.remendar(linha, u)
+    return linha, u
+
 
-    for idx in range(1, len(rows)):
-        r = rows[idx] + [""] * (len(headers) - len(rows[idx]))
-        em = str(r[i_email]).strip().lower()
-        te = tel_only_digits(r[i_tel])
-        if em == email and te == tel_digits:
-            d = {headers[j]: (r[j] if j < len(r) else "") for j in range(len(headers))}
-            return idx + 1, d
-    return None, None
+def garantir_colunas_temp(rota_id: str, sheet_u):
+    """ensure_temp_cols só quando o cabeçalho em cache ainda não tem as TEMP_*."""
+    cab = buscar_cabecalho_usuarios(rota_id)
+    if cab and all(h in cab for h in TEMP_HEADERS):
+        return
+    ensure_temp_cols(sheet_u)
+    buscar_cabecalho_usuarios.clear(rota_id)
+    publicar_escrita(rota_id, "usuarios_cab")
 
 
 # ==========================================================
-# LEITURAS (CACHE_DATA)
+# CHAVES CANÔNICAS (EMAIL_KEY / TEL_KEY)
 # ==========================================================
-@st.cache_data(ttl=30)
-def buscar_usuarios_cadastrados():
-    """Uso geral (Login/Cadastro/Recuperar)."""
+# Uma vez por processo (e quando o ADM atualiza a lista): garante as colunas
+# no cabeçalho e acerta as chaves de todas as linhas com UMA leitura
+# (batch_get de Email, TELEFONE e das chaves) e, se algo mudar, UMA escrita
+# (batch_update das duas colunas inteiras). Cobre as linhas anteriores às
+# colunas e as editadas à mão na planilha.
+#
+# Só o sucesso fica em cache: uma falha (cota, rede, cabeçalho ainda vazio)
+# é tentada de novo na próxima execução, no máximo a cada
+# MIGRAR_CHAVES_ESPERA_S, até a migração passar.
+MIGRAR_CHAVES_ESPERA_S = 60.0
+
+
+@st.cache_resource
+def migrar_chaves_usuarios(rota_id: str):
+    """Nº de linhas acertadas. Falha sobe como exceção (e não é guardada)."""
+    sheet_u = ws_usuarios(rota_id)
+    cab = buscar_cabecalho_usuarios(rota_id)
+    if not cab:
+        raise RuntimeError("Cabeçalho da aba Usuarios indisponível.")
+    faltando = [c for c in COLS_CHAVES_CANONICAS if c not in cab]
+    if faltando:
+        cab = cab + faltando
+        gs_call(sheet_u.update, values=[cab], range_name="A1")
+        buscar_cabecalho_usuarios.clear(rota_id)
+        publicar_escrita(rota_id, "usuarios_cab")
+    intervalos = intervalos_projecao(cab, ("Email", "TELEFONE") + COLS_CHAVES_CANONICAS)
+    cols = montar_colunas(list(intervalos), gs_call(sheet_u.batch_get, list(intervalos.values())))
+    email_keys, tel_keys, mudam = chaves_para_migrar(cols)
+    if mudam:
+        gs_call(sheet_u.batch_update, [
+            {"range": f"{intervalos[c]}{cols.total + 1}", "values": [[k] for k in chaves]}
+            for c, chaves in ((COL_EMAIL_KEY, email_keys), (COL_TEL_KEY, tel_keys))
+        ])
+        invalidar_usuarios(rota_id)
+    return mudam
+
+
+@st.cache_resource
+def falhas_migracao_chaves():
+    return {}   # rota_id -> monotonic da última falha
+
+
+def chaves_migradas(rota_id: str):
+    """Linhas acertadas pela migração; None enquanto ela não passar."""
+    falhas = falhas_migracao_chaves()
+    ultima = falhas.get(rota_id)
+    if ultima is not None and time_module.monotonic() - ultima < MIGRAR_CHAVES_ESPERA_S:
+        return None
     try:
-        sheet_u = ws_usuarios()
-        return gs_call(sheet_u.get_all_records)
+        acertadas = migrar_chaves_usuarios(rota_id)
     except Exception:
-        return []
+        falhas[rota_id] = time_module.monotonic()
+        return None
+    falhas.pop(rota_id, None)
+    return acertadas
+
+
+# ==========================================================
+# CACHE QUENTE EM DISCO (partida a frio)
+# ==========================================================
+# Cada leitura ao vivo bem-sucedida regrava o último snapshot da rota em
+# disco (cache_disco.py). Na primeira execução do processo, servir_aquecido
+# devolve esse snapshot na hora e dispara a leitura real numa thread; as
+# execuções seguintes usam a leitura real (cache_data) normalmente.
+CACHE_DISCO_DIR = os.environ.get("ROTA_CACHE_DIR", ".cache_rota")
 
-@st.cache_data(ttl=3)
-def buscar_usuarios_admin():
-    """Uso específico do ADM: mais fresco."""
+# conjuntos servidos do disco nesta execução (o script roda de novo a cada rerun)
+DADOS_AQUECIDOS = set()
+
+
+@st.cache_resource
+def cache_disco(rota_id: str):
+    return CacheDisco(os.path.join(CACHE_DISCO_DIR, f"{rota_id}.json.gz"), rota_id)
+
+
+def _revalidar(disco: CacheDisco, conjunto: str, ler_ao_vivo):
     try:
-        sheet_u = ws_usuarios()
-        return gs_call(sheet_u.get_all_records)
+        ler_ao_vivo()
     except Exception:
-        return []
+        pass
+    finally:
+        disco.fim_revalidacao(conjunto)
+
+
+def servir_aquecido(rota_id: str, conjunto: str, ler_ao_vivo, decodificar=None, valido_desde: float = 0.0):
+    disco = cache_disco(rota_id)
+    salvo = disco.obter(conjunto, valido_desde)
+    if salvo is None:
+        return ler_ao_vivo()
+    if disco.iniciar_revalidacao(conjunto):
+        t = threading.Thread(target=_revalidar, args=(disco, conjunto, ler_ao_vivo), daemon=True)
+        add_script_run_ctx(t, get_script_run_ctx())
+        t.start()
+    DADOS_AQUECIDOS.add(conjunto)
+    return decodificar(salvo) if decodificar else salvo
 
+
+# ==========================================================
+# CONFIG DA ROTA (uma leitura, registro tipado em config_rota.py)
+# ==========================================================
 @st.cache_data(ttl=120)
-def buscar_limite_dinamico():
+def buscar_config(rota_id: str):
+    """
+    Aba Config numa leitura só (A2:D, até o fim da aba): LIMITE em A2 e pares CHAVE | VALOR
+    em C:D, ex.: fecha_tarde | 17:00, ttl_fechada | 300, vagas | 40.
+    Devolve o texto cru ({chave: valor}); None se a leitura falhar.
+    """
     try:
-        sheet_c = ws_config()
-        val = gs_call(sheet_c.acell, "A2").value
-        return int(val)
+        sheet_c = ws_config(rota_id)
+        rows = ler_planilha("config", rota_id, sheet_c.get, "A2:D", idade_max=60.0)
+        bruto = {}
+        if rows and rows[0] and str(rows[0][0]).strip():
+            bruto["limite"] = str(rows[0][0]).strip()
+        for r in rows:
+            if len(r) >= 4 and str(r[2]).strip():
+                bruto[str(r[2]).strip().lower()] = str(r[3]).strip()
+        cache_disco(rota_id).guardar("config", bruto)
+        return bruto
     except Exception:
-        return 100
+        return None
+
+
+@st.cache_resource
+def registro_config(rota_id: str):
+    return RegistroConfig()
 
-@st.cache_data(ttl=6)
-def buscar_presenca_atualizada():
+
+def config_rota(rota_id: str) -> ConfigRota:
+    """Config tipada e versionada (a versão só sobe quando algum valor muda)."""
+    return registro_config(rota_id).atualizar(servir_aquecido(rota_id, "config", lambda: buscar_config(rota_id)))
+
+
+def vagas_da_rota(rota: Rota) -> int:
+    return config_rota(rota.id).get("vagas", rota.vagas)
+
+
+# ==========================================================
+# AGENDA (fase da lista e TTL adaptativo do cache da presença)
+# ==========================================================
+@st.cache_resource(max_entries=16)
+def _montar_agenda(horarios_itens: tuple, ttls_itens: tuple, pico_min: int):
+    return Agenda(dict(horarios_itens), dict(ttls_itens), pico_min)
+
+
+def agenda_da_rota(rota: Rota) -> Agenda:
+    """
+    Horários da rota (secrets) com sobrescritas da aba Config. A linha do
+    tempo só é recalculada quando uma das CHAVES_AGENDA muda.
+    """
+    cfg = dict(config_rota(rota.id).assinatura(CHAVES_AGENDA))
+    horarios = {k: cfg.get(k) or v for k, v in rota.horarios.items()}
+    ttls = {fase: cfg.get(f"ttl_{fase.lower()}") or ttl for fase, ttl in TTLS_PADRAO.items()}
+    pico_min = cfg.get("pico_min", PICO_MIN_PADRAO)
+    return _montar_agenda(tuple(sorted(horarios.items())), tuple(sorted(ttls.items())), pico_min)
+
+
+# ==========================================================
+# REFRESH ADAPTATIVO DA PRESENÇA (carga observada x cota)
+# ==========================================================
+# O intervalo entre leituras da aba de presença se ajusta à taxa de
+# inscrições observada (linhas novas/s entre snapshots) e ao número de
+# sessões ativas, sempre entre REFRESH_MIN_S e REFRESH_MAX_S (sobrescrevíveis
+# na Config: refresh_min_s / refresh_max_s) e sem passar de metade da cota
+# de leitura da rota. Lista fechada/conferência seguem o TTL da fase.
+# Com o diário em dia no ciclo, a lista exibida sai dele e a aba só é lida
+# para reconciliar, no máximo a cada RECONCILIAR_S (ou refresh_max_s, se
+# maior); escritas de outras réplicas continuam forçando leitura pela versão.
+REFRESH_MIN_S = 2.0
+REFRESH_MAX_S = 30.0
+REFRESH_TAU_S = 60.0          # meia-vida (aprox.) da média móvel da taxa
+SESSAO_ATIVA_S = 120.0
+RECONCILIAR_S = 30.0
+
+
+class RefreshPresenca:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.chave = 0
+        self.t_chave = 0.0
+        self.segmento = None
+        self.taxa = 0.0           # inscrições/s (média móvel exponencial)
+        self.n_linhas = None
+        self.t_linhas = 0.0
+        self.sessoes = {}         # session id -> último rerun (monotonic)
+        self.leituras = 0
+        self.buscas = 0
+        self.intervalo = REFRESH_MIN_S
+        self.pelo_diario = False  # leituras no ritmo da reconciliação (diário em dia)
+
+    def registrar_sessao(self, sid: str):
+        agora = time_module.monotonic()
+        with self.lock:
+            self.sessoes[sid] = agora
+            if len(self.sessoes) > 500:
+                self.sessoes = {k: v for k, v in self.sessoes.items() if agora - v < SESSAO_ATIVA_S}
+
+    def sessoes_ativas(self) -> int:
+        agora = time_module.monotonic()
+        with self.lock:
+            return sum(1 for v in self.sessoes.values() if agora - v < SESSAO_ATIVA_S)
+
+    def observar_busca(self, n_linhas: int):
+        """Chamado a cada leitura real: atualiza a taxa de inscrições."""
+        agora = time_module.monotonic()
+        with self.lock:
+            self.buscas += 1
+            if self.n_linhas is not None and agora > self.t_linhas:
+                dt = agora - self.t_linhas
+                amostra = max(0, n_linhas - self.n_linhas) / dt
+                peso = math.exp(-dt / REFRESH_TAU_S)
+                self.taxa = self.taxa * peso + amostra * (1.0 - peso)
+            self.n_linhas, self.t_linhas = n_linhas, agora
+
+    def invalidar(self):
+        with self.lock:
+            self.chave += 1
+            self.t_chave = time_module.monotonic()
+
+    def calcular_intervalo(self, fase: str, ttl_fase: float, limites: tuple, leituras_min: int) -> float:
+        ref_min, ref_max = limites
+        # não gastar mais que metade da cota de leitura da rota com a presença
+        piso = max(ref_min, 60.0 / max(1.0, leituras_min * 0.5))
+        if fase not in (FASE_ABERTA, FASE_REABERTURA):
+            return max(piso, ttl_fase)
+
+        with self.lock:
+            taxa = self.taxa
+        sessoes = self.sessoes_ativas()
+        # ~1 inscrição nova por atualização; mais gente olhando -> mais fresco
+        alvo = (1.0 / taxa) if taxa > 1e-6 else ref_max
+        alvo *= min(2.0, max(0.5, 10.0 / max(1, sessoes)))
+        if fase == FASE_REABERTURA:
+            alvo = min(alvo, ttl_fase)
+        return min(max(alvo, piso), max(ref_max, piso))
+
+    def chave_atual(self, agenda: Agenda, agora: datetime, limites: tuple, leituras_min: int,
+                    pelo_diario: bool = False) -> int:
+        """Troca a chave (=> nova leitura) quando o intervalo vence ou a fase muda."""
+        situacao = agenda.consultar(agora)
+        intervalo = self.calcular_intervalo(situacao.fase, agenda.ttl(agora), limites, leituras_min)
+        if pelo_diario:
+            intervalo = max(intervalo, RECONCILIAR_S, limites[1])
+        t = time_module.monotonic()
+        with self.lock:
+            self.leituras += 1
+            self.intervalo = intervalo
+            self.pelo_diario = pelo_diario
+            if self.segmento != situacao.inicio or t - self.t_chave >= intervalo:
+                self.segmento = situacao.inicio
+                self.chave += 1
+                self.t_chave = t
+            return self.chave
+
+    def taxa_acerto(self) -> float:
+        with self.lock:
+            return 0.0 if not self.leituras else max(0.0, 1.0 - self.buscas / self.leituras)
+
+
+@st.cache_resource
+def refresh_presenca(rota_id: str):
+    return RefreshPresenca()
+
+
+def limites_refresh(rota_id: str) -> tuple:
+    cfg = dict(config_rota(rota_id).assinatura(CHAVES_REFRESH))
+    ref_min = cfg.get("refresh_min_s") or REFRESH_MIN_S
+    ref_max = cfg.get("refresh_max_s") or REFRESH_MAX_S
+    return ref_min, max(ref_min, ref_max)
+
+
+def invalidar_presenca(rota_id: str):
+    refresh_presenca(rota_id).invalidar()
+    publicar_escrita(rota_id, "presenca")
+
+
+def presenca_para_disco(dados):
+    """Só o que a tela pública mostra: a coluna EMAIL (6ª) vai vazia para o disco."""
+    if not dados:
+        return dados
+    return [dados[0]] + [list(r[:5]) + [""] * (len(r) - 5) for r in dados[1:]]
+
+
+def snapshot_presenca(versao: tuple, dados) -> SnapshotPresenca:
+    """Filtra e congela a grade uma vez só, na leitura (não a cada rerun)."""
+    return SnapshotPresenca(versao, congelar_grade(filtrar_linhas_presenca(dados)))
+
+
+@st.cache_resource(ttl=600, max_entries=64)
+def _buscar_presenca(rota_id: str, ciclo: str, chave: int, versao: int = 0):
     try:
-        sheet_p = ws_presenca()
-        return gs_call(sheet_p.get_all_values)
+        sheet_p = ws_presenca(rota_id, ciclo)
+        # de outra réplica, só se for mais novo que meio intervalo de refresh
+        idade_max = refresh_presenca(rota_id).intervalo / 2.0
+        lido_desde = time_module.time() - (idade_max if camada_compartilhada() is not None else 0.0)
+        dados = ler_planilha(f"presenca:{ciclo}", rota_id, sheet_p.get_all_values, idade_max=idade_max)
+        refresh_presenca(rota_id).observar_busca(len(dados))
+        cache_disco(rota_id).guardar("presenca", presenca_para_disco(dados))
+        snap = snapshot_presenca(("planilha", ciclo, chave, versao, time_module.monotonic_ns()), dados)
+        reconciliar_diario(rota_id, snap.grade, lido_desde)
+        return snap
     except Exception:
         return None
 
 
+def buscar_presenca_atualizada(rota_id: str):
+    rota = obter_rota(rota_id)
+    agenda = agenda_da_rota(rota)
+    agora = _br_now()
+    chave = refresh_presenca(rota_id).chave_atual(agenda, agora, limites_refresh(rota_id), rota.cota_leituras_min,
+                                                  pelo_diario=diario_presenca(rota_id).sincronizado(id_ciclo(agora, rota)))
+    # do disco, só se for do ciclo atual
+    versao = versao_dados(rota_id, "presenca")
+    ciclo = agenda.ultimo_reset(agora).strftime(FMT_CICLO)
+    snap = servir_aquecido(rota_id, "presenca", lambda: _buscar_presenca(rota_id, ciclo, chave, versao),
+                           lambda dados: snapshot_presenca(("disco", ciclo), dados),
+                           valido_desde=agenda.ultimo_reset(agora).timestamp())
+    return snap or SNAPSHOT_VAZIO
+
+
 # ==========================================================
 # FILTRO PARA NÃO EXIBIR LINHAS “LIXO” (evita final estranho)
 # ==========================================================
@@ -280,150 +1255,279 @@ def filtrar_linhas_presenca(dados_p):
     return [header] + body_ok
 
 
-def verificar_status_e_limpar(sheet_p, dados_p):
-    agora = datetime.now(FUSO_BR)
-    hora_atual, dia_semana = agora.time(), agora.weekday()
+def marco_reset(agora: datetime, rota: Rota) -> datetime:
+    """Último horário de zeragem da lista (reset da manhã/tarde) até agora."""
+    return agenda_da_rota(rota).ultimo_reset(agora)
 
-    if hora_atual >= time(18, 50):
-        marco = agora.replace(hour=18, minute=50, second=0, microsecond=0)
-    elif hora_atual >= time(6, 50):
-        marco = agora.replace(hour=6, minute=50, second=0, microsecond=0)
-    else:
-        marco = (agora - timedelta(days=1)).replace(hour=18, minute=50, second=0, microsecond=0)
 
-    if dados_p and len(dados_p) > 1:
+def id_ciclo(agora: datetime, rota: Rota) -> str:
+    """Identificador do ciclo da lista (muda a cada zeragem)."""
+    return marco_reset(agora, rota).strftime(FMT_CICLO)
+
+
+def verificar_status(rota: Rota):
+    """
+    A zeragem não mexe na planilha (cada ciclo tem a sua aba): só registra
+    a virada no diário, uma vez por ciclo.
+    """
+    agora = _br_now()
+    situacao = agenda_da_rota(rota).consultar(agora)
+    try:
+        diario_presenca(rota.id).reset(situacao.ultimo_reset.strftime(FMT_CICLO))
+    except OSError:
+        pass
+
+    # Regras de abertura/fechamento/conferência: ver agenda.py
+    return situacao.aberto, situacao.conferencia
+
+
+# ==========================================================
+# DIÁRIO DE PRESENÇA (eventos, reconstrução e auditoria)
+# ==========================================================
+# Cada confirmação/exclusão/zeragem feita pelo app vira um evento no
+# diário da rota (diario.py). Cada leitura ao vivo da aba é reconciliada
+# com ele (a aba é a fonte da verdade; o que mudou por fora entra como
+# evento de origem "planilha"). Depois da primeira reconciliação do ciclo,
+# a lista exibida é refeita do diário: uma escrita deste app aparece na
+# hora, sem baixar a aba de novo, e a aba passa a ser lida só no ritmo da
+# reconciliação (RECONCILIAR_S).
+DIARIO_DIR = os.environ.get("ROTA_DIARIO_DIR", "diario_presenca")
+
+
+@st.cache_resource
+def diario_presenca(rota_id: str):
+    return DiarioPresenca(os.path.join(DIARIO_DIR, f"{rota_id}.jsonl"), rota_id)
+
+
+def reconciliar_diario(rota_id: str, grade, lido_desde: float):
+    """Grade já filtrada; só as linhas do ciclo atual entram."""
+    rota = obter_rota(rota_id)
+    marco = marco_reset(_br_now(), rota)
+    linhas = []
+    for r in grade[1:]:
         try:
-            ultima_str = dados_p[-1][0]
-            ultima_dt = FUSO_BR.localize(datetime.strptime(ultima_str, "%d/%m/%Y %H:%M:%S"))
-            if ultima_dt < marco:
-                gs_call(sheet_p.resize, rows=1)
-                gs_call(sheet_p.resize, rows=100)
-                st.session_state["_force_refresh_presenca"] = True
-                st.rerun()
-        except Exception:
+            if FUSO_BR.localize(datetime.strptime(str(r[0]).strip(), "%d/%m/%Y %H:%M:%S")) < marco:
+                continue
+        except ValueError:
             pass
+        linhas.append(r)
+    try:
+        diario_presenca(rota_id).reconciliar(marco.strftime(FMT_CICLO), linhas, lido_desde)
+    except OSError:
+        pass
 
-    # Regras de abertura/fechamento:
-    # - SEG a QUI: fecha apenas nas janelas 05:00-07:00 e 17:00-19:00
-    # - SEX: fecha às 17:00 e só reabre DOM às 19:00 (portanto SEX após 17:00 fica fechado)
-    # - SÁB: fechado o dia todo
-    # - DOM: abre a partir de 19:00
-    if dia_semana == 5:  # Sábado
-        is_aberto = False
-    elif dia_semana == 6:  # Domingo
-        is_aberto = (hora_atual >= time(19, 0))
-    elif dia_semana == 4:  # Sexta
-        if hora_atual >= time(17, 0):
-            is_aberto = False
-        elif time(5, 0) <= hora_atual < time(7, 0):
-            is_aberto = False
-        else:
-            is_aberto = True
-    else:  # Segunda a Quinta
-        if (time(5, 0) <= hora_atual < time(7, 0)) or (time(17, 0) <= hora_atual < time(19, 0)):
-            is_aberto = False
-        else:
-            is_aberto = True
 
-    janela_conferencia = (time(5, 0) < hora_atual < time(7, 0)) or (time(17, 0) < hora_atual < time(19, 0))
-    return is_aberto, janela_conferencia
+@st.cache_resource(max_entries=4)
+def _snapshot_do_diario(rota_id: str, ciclo: str, offset: int, cabecalho: tuple, _linhas: tuple):
+    return SnapshotPresenca(("diario", ciclo, offset), (cabecalho,) + _linhas)
+
+
+def presenca_do_diario(rota_id: str, snap: SnapshotPresenca) -> SnapshotPresenca:
+    """Cabeçalho + linhas do ciclo reaplicadas do diário (ou o snapshot, se ainda não reconciliado)."""
+    ciclo = id_ciclo(_br_now(), obter_rota(rota_id))
+    diario = diario_presenca(rota_id)
+    if not diario.sincronizado(ciclo):
+        return snap
+    offset, linhas = diario.retrato(ciclo)
+    cabecalho = snap.grade[0] if snap.grade else CABECALHO_PRESENCA
+    return _snapshot_do_diario(rota_id, ciclo, offset, tuple(cabecalho), linhas)
+
+
+def presenca_escrita_local(rota_id: str):
+    """
+    Depois de uma escrita deste app na aba de presença: com o diário em dia,
+    a lista já reflete a escrita e basta avisar as outras réplicas; sem ele,
+    força a próxima leitura como antes.
+    """
+    if diario_presenca(rota_id).sincronizado(id_ciclo(_br_now(), obter_rota(rota_id))):
+        publicar_escrita(rota_id, "presenca")
+    else:
+        invalidar_presenca(rota_id)
 
 
 # ==========================================================
 # CICLO (exibição abaixo do título)
 # ==========================================================
-def obter_ciclo_atual():
-    agora = datetime.now(FUSO_BR)
-    t = agora.time()
-    wd = agora.weekday()
-
-    em_fechamento_fds = (wd == 4 and t >= time(17, 0)) or (wd == 5) or (wd == 6 and t < time(19, 0))
-    if em_fechamento_fds:
-        # Próximo ciclo: 06:30 da próxima segunda-feira
-        dias_para_seg = (7 - wd) % 7  # sex->3, sáb->2, dom->1
-        alvo_dt = (agora + timedelta(days=dias_para_seg)).date()
-        alvo_h = "06:30"
-    else:
-        if t >= time(19, 0):
-            alvo_dt = (agora + timedelta(days=1)).date()
-            alvo_h = "06:30"
-        elif t < time(7, 0):
-            alvo_dt = agora.date()
-            alvo_h = "06:30"
-        else:
-            alvo_dt = agora.date()
-            alvo_h = "18:30"
+def obter_ciclo_atual(rota: Rota):
+    situacao = agenda_da_rota(rota).consultar(_br_now())
+    return situacao.ciclo_hora, situacao.ciclo_data
+
 
-    alvo_dt_str = alvo_dt.strftime("%d/%m/%Y")
-    return alvo_h, alvo_dt_str
+# ==========================================================
+# LISTA ORDENADA (parse único por snapshot, compartilhado)
+# ==========================================================
+@st.cache_resource(max_entries=8)
+def montar_lista_presenca(versao: tuple, vagas: int, _snap: SnapshotPresenca):
+    """
+    Um parse + ordenação por versão de snapshot; as sessões que recebem o
+    mesmo snapshot reutilizam o mesmo objeto. A chave é só a versão: a
+    grade não é percorrida para gerar o hash a cada rerun.
+    """
+    return montar_lista(_snap.grade, vagas)
 
 
-def aplicar_ordenacao(df):
-    if "EMAIL" not in df.columns:
-        df["EMAIL"] = "N/A"
+# ==========================================================
+# MUDANÇAS DE POSIÇÃO (avisos de promoção/excedente)
+# ==========================================================
+# Cada lista montada que difere da anterior gera UM diff por rota
+# (diff_ranking, linear), guardado com um número de sequência. A sessão
+# guarda a sequência que já viu e compõe só os diffs posteriores para o
+# próprio e-mail: o aviso "Exc-03 -> Nº 37" sai sem reordenar nada.
+HISTORICO_RANKING_MAX = 32
+
+
+class HistoricoRanking:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ciclo = ""
+        self.ultima = None
+        self.seq = 0
+        self.diffs = deque(maxlen=HISTORICO_RANKING_MAX)   # (seq, {email_key: MudancaPosicao})
+
+    def observar(self, ciclo: str, lista) -> int:
+        """Registra a lista (se mudou) e devolve a sequência atual."""
+        with self.lock:
+            if ciclo != self.ciclo:
+                self.ciclo, self.ultima = ciclo, None
+                self.diffs.clear()
+            if self.ultima is None or lista is self.ultima or lista.ranking == self.ultima.ranking:
+                self.ultima = self.ultima or lista
+                return self.seq
+            self.seq += 1
+            self.diffs.append((self.seq, diff_ranking(self.ultima, lista)))
+            self.ultima = lista
+            return self.seq
+
+    def mudanca_desde(self, seq_visto: int, email_key: str):
+        """Mudança líquida do e-mail desde seq_visto (None se não mudou ou o histórico não cobre)."""
+        with self.lock:
+            if not self.diffs or self.diffs[0][0] > seq_visto + 1:
+                return None
+            acumulada = None
+            for seq, mudancas in self.diffs:
+                m = mudancas.get(email_key) if seq > seq_visto else None
+                if m is not None:
+                    acumulada = m if acumulada is None else juntar_mudancas(acumulada, m)
+            return acumulada
+
+
+@st.cache_resource
+def historico_ranking(rota_id: str):
+    return HistoricoRanking()
 
-    # Garantia: coluna QG_RMCF_OUTROS deve existir na planilha de presença
-    if "QG_RMCF_OUTROS" not in df.columns and "ORIGEM" in df.columns:
-        df["QG_RMCF_OUTROS"] = df["ORIGEM"]
-    if "QG_RMCF_OUTROS" not in df.columns:
-        df["QG_RMCF_OUTROS"] = ""
 
-    # Prioridades
-    p_orig = {"QG": 1, "RMCF": 2, "OUTROS": 3}
+def _rotulo_tela(rotulo: str) -> str:
+    return rotulo if rotulo.startswith("Exc-") else f"Nº {rotulo}"
 
-    # Ordem solicitada (grupo "normal")
-    p_grad_normal = {
-        "TCEL": 1, "MAJ": 2, "CAP": 3, "1º TEN": 4, "2º TEN": 5, "SUBTEN": 6,
-        "1º SGT": 7, "2º SGT": 8, "3º SGT": 9, "CB": 10, "SD": 11
-    }
 
-    # Grupo FC: primeiro FC COM (grupo 1), depois FC TER (grupo 2)
-    def grupo_fc(grad):
-        g = str(grad or "").strip().upper()
-        if g == "FC COM":
-            return 1
-        if g == "FC TER":
-            return 2
-        return 0
+# ==========================================================
+# CONFIRMAÇÃO DE PRESENÇA IDEMPOTENTE (single-flight por e-mail)
+# ==========================================================
+# Duplo toque no botão ou duas abas do mesmo militar não podem gerar dois
+# append_row (o "ja" vem de um snapshot que pode ter até alguns segundos).
+# Antes de escrever: e-mail já confirmado neste ciclo -> devolve na hora;
+# confirmação do mesmo e-mail em andamento -> devolve "pendente" na hora.
+# A linha pode sumir da aba por fora (ADM, outra instância, edição à mão):
+# se o snapshot atual não tem o e-mail e a confirmação foi escrita (ou vista
+# pela primeira vez) há mais de CONFIRMACAO_RECENTE_S, ela é descartada e o
+# militar pode confirmar de novo.
+CONFIRMACAO_RECENTE_S = 10.0
+CONF_NOVA = "NOVA"
+CONF_JA_CONFIRMADA = "JA_CONFIRMADA"
+CONF_PENDENTE = "PENDENTE"
+
+
+class ConfirmacoesPresenca:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.em_andamento = set()   # email_key
+        self.confirmados = {}       # email_key -> (data_hora, monotonic da escrita ou 1ª vez visto), ciclo atual
+        self.ciclo = ""
+        self.descartadas = 0        # confirmações que sumiram da aba por fora
+
+    def _trocar_ciclo(self, ciclo: str):
+        if ciclo != self.ciclo:
+            self.ciclo = ciclo
+            self.confirmados = {}
+
+    def confirmar(self, ciclo: str, email: str, escrever, na_lista: bool = False):
+        """
+        Executa escrever(data_hora) no máximo uma vez por e-mail e ciclo.
+        na_lista: o e-mail está no snapshot atual da presença.
+        Retorna (CONF_*, data_hora).
+        """
+        email_key = str(email or "").strip().lower()
+        with self.lock:
+            self._trocar_ciclo(ciclo)
+            conf = self.confirmados.get(email_key)
+            if conf is not None and not na_lista and time_module.monotonic() - conf[1] > CONFIRMACAO_RECENTE_S:
+                del self.confirmados[email_key]
+                self.descartadas += 1
+                conf = None
+            if conf is not None:
+                return CONF_JA_CONFIRMADA, conf[0]
+            if email_key in self.em_andamento:
+                return CONF_PENDENTE, None
+            self.em_andamento.add(email_key)
 
-    df["grupo_fc"] = df["GRADUAÇÃO"].apply(grupo_fc)
+        try:
+            data_hora = _fmt_dt(_br_now())
+            escrever(data_hora)
+            with self.lock:
+                if ciclo == self.ciclo:
+                    self.confirmados[email_key] = (data_hora, time_module.monotonic())
+            return CONF_NOVA, data_hora
+        finally:
+            with self.lock:
+                self.em_andamento.discard(email_key)
+
+    def marcar_confirmado(self, ciclo: str, email: str, data_hora: str = ""):
+        """Registra confirmação vista no snapshot (ex.: feita em outra instância)."""
+        email_key = str(email or "").strip().lower()
+        with self.lock:
+            self._trocar_ciclo(ciclo)
+            self.confirmados.setdefault(email_key, (data_hora, time_module.monotonic()))
+
+    def esquecer(self, ciclo: str, email: str):
+        """Após excluir a presença, libera o e-mail para confirmar de novo."""
+        with self.lock:
+            self._trocar_ciclo(ciclo)
+            self.confirmados.pop(str(email or "").strip().lower(), None)
 
-    # Origem sempre: QG -> RMCF -> OUTROS (dentro de cada grupo)
-    df["p_o"] = df["QG_RMCF_OUTROS"].map(p_orig).fillna(99)
 
-    # Para o grupo normal, aplica ordem de graduação; para FC, deixa 0 (desempate por dt)
-    def p_grad(row):
-        if int(row.get("grupo_fc", 0)) == 0:
-            return p_grad_normal.get(str(row.get("GRADUAÇÃO", "")).strip().upper(), 999)
-        return 0
+@st.cache_resource
+def exclusoes_presenca(rota_id: str):
+    return ExclusoesPresenca(gs_call)
 
-    df["p_g"] = df.apply(p_grad, axis=1)
 
-    # Desempate por quem entrou primeiro
-    df["dt"] = pd.to_datetime(df["DATA_HORA"], dayfirst=True, errors="coerce")
+@st.cache_resource
+def confirmacoes_presenca(rota_id: str):
+    return ConfirmacoesPresenca()
 
-    # Ordenação final conforme regra
-    df = df.sort_values(by=["grupo_fc", "p_o", "p_g", "dt"]).reset_index(drop=True)
 
-    df.insert(0, "Nº", [str(i + 1) if i < 38 else f"Exc-{i - 37:02d}" for i in range(len(df))])
+# ==========================================================
+# CONFERÊNCIA: CHECKLIST DE EMBARQUE COMPARTILHADO (embarque.py)
+# ==========================================================
+@st.cache_resource
+def perfil_rota(rota_id: str):
+    """Chave do ADM: perfila todas as sessões da rota (além de quem usa ?perf=1)."""
+    return {"ativo": False}
 
-    df_v = df.copy()
-    for i, r in df_v.iterrows():
-        if "Exc-" in str(r["Nº"]):
-            for c in df_v.columns:
-                df_v.at[i, c] = f"<span style='color:#d32f2f; font-weight:bold;'>{r[c]}</span>"
 
-    return df.drop(columns=["grupo_fc", "p_o", "p_g", "dt"]), df_v.drop(columns=["grupo_fc", "p_o", "p_g", "dt"])
+@st.cache_resource
+def checklist_embarque(rota_id: str):
+    return ChecklistEmbarque(gs_call)
 
 
 # ==========================================================
 # PDF “mais apresentado” (AGORA COM ORIGEM À DIREITA)
 # ==========================================================
 class PDFRelatorio(FPDF):
-    def __init__(self, titulo="LISTA DE PRESENÇA", sub=None):
+    def __init__(self, titulo="LISTA DE PRESENÇA", sub=None, rodape="Rota Nova Iguaçu"):
         super().__init__(orientation="P", unit="mm", format="A4")
         self.titulo = titulo
         self.sub = sub or ""
+        self.rodape = rodape
         self.set_auto_page_break(auto=True, margin=12)
         self.alias_nb_pages()
 
@@ -444,14 +1548,14 @@ class PDFRelatorio(FPDF):
         self.set_y(-12)
         self.set_font("Arial", "", 8)
         self.set_text_color(90, 90, 90)
-        self.cell(0, 6, f"Página {self.page_no()}/{{nb}} - Rota Nova Iguaçu", align="C")
+        self.cell(0, 6, f"Página {self.page_no()}/{{nb}} - {self.rodape}", align="C")
 
 
-def gerar_pdf_apresentado(df_o: pd.DataFrame, resumo: dict) -> bytes:
-    agora = datetime.now(FUSO_BR).strftime("%d/%m/%Y %H:%M:%S")
+def gerar_pdf_apresentado(lista, resumo: dict, rota: Rota) -> bytes:
+    agora = _fmt_dt(_br_now())
     sub = f"Emitido em: {agora}"
 
-    pdf = PDFRelatorio(titulo="ROTA NOVA IGUAÇU - LISTA DE PRESENÇA", sub=sub)
+    pdf = PDFRelatorio(titulo=f"{rota.nome.upper()} - LISTA DE PRESENÇA", sub=sub, rodape=rota.nome)
     pdf.add_page()
 
     # Bloco resumo
@@ -461,7 +1565,7 @@ def gerar_pdf_apresentado(df_o: pd.DataFrame, resumo: dict) -> bytes:
 
     pdf.set_font("Arial", "", 9)
     insc = resumo.get("inscritos", 0)
-    vagas = resumo.get("vagas", 38)
+    vagas = resumo.get("vagas", rota.vagas)
     exc = max(0, insc - vagas)
     sobra = max(0, vagas - insc)
 
@@ -483,8 +1587,8 @@ def gerar_pdf_apresentado(df_o: pd.DataFrame, resumo: dict) -> bytes:
     pdf.set_text_color(0, 0, 0)
     pdf.set_font("Arial", "", 8)
 
-    for idx, (_, r) in enumerate(df_o.iterrows()):
-        is_exc = "Exc-" in str(r.get("Nº", ""))
+    for idx, (rotulo, r) in enumerate(lista.ranking):
+        is_exc = rotulo.startswith("Exc-")
         if is_exc:
             pdf.set_fill_color(255, 235, 238)
         else:
@@ -493,19 +1597,17 @@ def gerar_pdf_apresentado(df_o: pd.DataFrame, resumo: dict) -> bytes:
             else:
                 pdf.set_fill_color(255, 255, 255)
 
-        origem = str(r.get("QG_RMCF_OUTROS", "") or r.get("ORIGEM", "") or "").strip()
-
-        pdf.cell(col_w[0], 6, str(r.get("Nº", "")), border=0, fill=True)
-        pdf.cell(col_w[1], 6, str(r.get("GRADUAÇÃO", "")), border=0, fill=True)
-        pdf.cell(col_w[2], 6, str(r.get("NOME", ""))[:42], border=0, fill=True)
-        pdf.cell(col_w[3], 6, str(r.get("LOTAÇÃO", ""))[:34], border=0, fill=True)
-        pdf.cell(col_w[4], 6, origem[:10], border=0, align="C", fill=True)
+        pdf.cell(col_w[0], 6, rotulo, border=0, fill=True)
+        pdf.cell(col_w[1], 6, r.graduacao, border=0, fill=True)
+        pdf.cell(col_w[2], 6, r.nome[:42], border=0, fill=True)
+        pdf.cell(col_w[3], 6, r.lotacao[:34], border=0, fill=True)
+        pdf.cell(col_w[4], 6, r.origem[:10], border=0, align="C", fill=True)
         pdf.ln()
 
     pdf.ln(4)
     pdf.set_font("Arial", "I", 8)
     pdf.set_text_color(80, 80, 80)
-    pdf.multi_cell(0, 5, "Observação: os itens marcados como 'Exc-xx' representam excedentes além do limite de 38 vagas.")
+    pdf.multi_cell(0, 5, f"Observação: os itens marcados como 'Exc-xx' representam excedentes além do limite de {vagas} vagas.")
     pdf.set_text_color(0, 0, 0)
 
     return pdf.output(dest="S").encode("latin-1")
@@ -514,7 +1616,13 @@ def gerar_pdf_apresentado(df_o: pd.DataFrame, resumo: dict) -> bytes:
 # ==========================================================
 # INTERFACE
 # ==========================================================
-st.set_page_config(page_title="Rota Nova Iguaçu", layout="centered")
+# Rota da sessão: ?rota=<id> (sem parâmetro, a primeira rota configurada)
+_rotas = carregar_rotas()
+_rota_qs = st.query_params.get("rota", "")
+ROTA = _rotas.get(_rota_qs) or obter_rota(st.session_state.get("rota_id", ""))
+ROTA_ID = ROTA.id
+
+st.set_page_config(page_title=ROTA.nome, layout="centered")
 st.markdown('<script src="https://telegram.org/js/telegram-web-app.js"></script>', unsafe_allow_html=True)
 
 st.markdown("""
@@ -537,12 +1645,27 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-st.markdown('<div class="titulo-container"><div class="titulo-responsivo">🚌 ROTA NOVA IGUAÇU 🚌</div></div>', unsafe_allow_html=True)
+st.markdown(f'<div class="titulo-container"><div class="titulo-responsivo">🚌 {ROTA.nome.upper()} 🚌</div></div>', unsafe_allow_html=True)
 
 # Exibe o ciclo logo abaixo do título
-ciclo_h, ciclo_d = obter_ciclo_atual()
+ciclo_h, ciclo_d = obter_ciclo_atual(ROTA)
 st.markdown(f"<div class='subtitulo-ciclo'>Ciclo atual: <b>EMBARQUE {ciclo_h}h</b> do dia <b>{ciclo_d}</b></div>", unsafe_allow_html=True)
 
+# Usuários são por rota: trocar de rota encerra a sessão anterior
+if st.session_state.get("rota_id") not in (None, ROTA_ID):
+    for key in list(st.session_state.keys()):
+        del st.session_state[key]
+st.session_state.rota_id = ROTA_ID
+
+# Sessão ativa (alimenta o refresh adaptativo da presença)
+if "_sid" not in st.session_state:
+    st.session_state._sid = uuid.uuid4().hex
+refresh_presenca(ROTA_ID).registrar_sessao(st.session_state._sid)
+
+# Perfil por execução: ?perf=1 (só esta sessão) ou chave no painel ADM (rota toda)
+_perf_qs = st.query_params.get("perf", "") == "1"
+PERF = PerfilExecucao(_perf_qs or perfil_rota(ROTA_ID)["ativo"], ROTA_ID)
+
 if "usuario_logado" not in st.session_state:
     st.session_state.usuario_logado = None
 if "is_admin" not in st.session_state:
@@ -574,21 +1697,36 @@ if "_confirmar_exclusao_presenca" not in st.session_state:
     st.session_state._confirmar_exclusao_presenca = False
 
 try:
-    # Leitura leve pro público
-    records_u_public = buscar_usuarios_cadastrados()
-    limite_max = buscar_limite_dinamico()
-    sheet_u_escrita = ws_usuarios()
+    with PERF.fase(FASE_AUTH):
+        # Leitura leve pro público (na partida a frio, do cache em disco)
+        total_usuarios = servir_aquecido(ROTA_ID, "usuarios_total", lambda: usuarios_publico(ROTA_ID).total)
+        limite_max = config_rota(ROTA_ID).get("limite")
+        sheet_u_escrita = AbaSobDemanda(ws_usuarios, ROTA_ID)
+
+        # Garante colunas TEMP_* para recuperação segura
+        if "usuarios_total" not in DADOS_AQUECIDOS:
+            try:
+                garantir_colunas_temp(ROTA_ID, sheet_u_escrita)
+            except Exception:
+                pass
+            chaves_migradas(ROTA_ID)
 
-    # Garante colunas TEMP_* para recuperação segura
-    try:
-        ensure_temp_cols(sheet_u_escrita)
-    except Exception:
-        pass
+    if DADOS_AQUECIDOS:
+        st.caption("⏳ Mostrando os dados salvos do último acesso; atualizando em segundo plano.")
 
     # =========================================
     # LOGIN / CADASTRO / INSTRUÇÕES / RECUPERAR / ADM
     # =========================================
     if st.session_state.usuario_logado is None and not st.session_state.is_admin:
+        PERF.tela = "login"
+        if len(_rotas) > 1:
+            ids_rotas = list(_rotas.keys())
+            rota_sel = st.selectbox("Rota:", ids_rotas, index=ids_rotas.index(ROTA_ID),
+                                    format_func=lambda rid: _rotas[rid].nome)
+            if rota_sel != ROTA_ID:
+                st.query_params["rota"] = rota_sel
+                st.rerun()
+
         t1, t2, t3, t4, t5 = st.tabs(["Login", "Cadastro", "Instruções", "Recuperar", "ADM"])
 
         with t1:
@@ -630,13 +1768,11 @@ try:
                                 return ("TEMP", True)
                             return ("", False)
 
-                        u_a = next(
-                            (u for u in records_u_public
-                             if str(u.get("Email", "")).strip().lower() == l_e.strip().lower()
-                             and tel_only_digits(u.get("TELEFONE", "")) == tel_login_digits
-                             and _senha_confere(u, l_s)[1]),
-                            None
-                        )
+                        # Acha o usuário no índice de login em cache (releitura só se não estiver nele)
+                        u_a = None
+                        row_login, u_lin = find_user_row_by_email_tel(ROTA_ID, l_e, tel_login_digits)
+                        if u_lin and _senha_confere(u_lin, l_s)[1]:
+                            u_a = u_lin
 
                         if u_a:
                             status_user = str(u_a.get("STATUS", "")).strip().upper()
@@ -650,13 +1786,8 @@ try:
                                 # (tudo pode mudar, EXCETO email)
                                 # ==========================================================
                                 if kind == "TEMP":
-                                    try:
-                                        row_idx, _d = find_user_row_by_email_tel(sheet_u_escrita, l_e, tel_login_digits)
-                                        st.session_state._force_profile_update = True
-                                        st.session_state._profile_update_row = row_idx
-                                    except Exception:
-                                        st.session_state._force_profile_update = True
-                                        st.session_state._profile_update_row = None
+                                    st.session_state._force_profile_update = True
+                                    st.session_state._profile_update_row = row_login
 
                                 st.rerun()
                             else:
@@ -665,7 +1796,7 @@ try:
                             st.error("Dados incorretos.")
 
         with t2:
-            if len(records_u_public) >= limite_max:
+            if total_usuarios >= limite_max:
                 st.warning(f"⚠️ Limite de {limite_max} usuários atingido.")
             else:
                 with st.form("form_novo_cadastro"):
@@ -676,10 +1807,9 @@ try:
                     fmt_tel_cad = tel_format_br(raw_tel_cad)
                     st.session_state._tel_cad_fmt = fmt_tel_cad
 
-                    n_g = st.selectbox("Graduação:", ["TCEL", "MAJ", "CAP", "1º TEN", "2º TEN", "SUBTEN", "1º SGT",
-                                                      "2º SGT", "3º SGT", "CB", "SD", "FC COM", "FC TER"])
+                    n_g = st.selectbox("Graduação:", list(GRADUACOES))
                     n_l = st.text_input("Lotação:")
-                    n_o = st.selectbox("Origem:", ["QG", "RMCF", "OUTROS"])
+                    n_o = st.selectbox("Origem:", list(ORIGENS))
                     n_p = st.text_input("Senha:", type="password")
 
                     cadastrou = st.form_submit_button("✍️ SALVAR CADASTRO 👈", use_container_width=True)
@@ -719,8 +1849,10 @@ try:
                             novo_email = norm_str(n_e).lower()
                             novo_tel_digits = tel_only_digits(fmt_tel_cad)
 
-                            email_existe = any(str(u.get("Email", "")).strip().lower() == novo_email for u in records_u_public)
-                            tel_existe = any(tel_only_digits(u.get("TELEFONE", "")) == novo_tel_digits for u in records_u_public)
+                            # as chaves nunca vêm do disco: leitura ao vivo (cache_data)
+                            records_u_public = usuarios_publico(ROTA_ID)
+                            email_existe = records_u_public.tem_email(novo_email)
+                            tel_existe = records_u_public.tem_telefone(novo_tel_digits)
 
                             if email_existe and tel_existe:
                                 st.error("E-mail e Telefone já cadastrados.")
@@ -729,7 +1861,7 @@ try:
                             elif tel_existe:
                                 st.error("Telefone já cadastrado.")
                             else:
-                                gs_call(sheet_u_escrita.append_row, [
+                                novo = [
                                     norm_str(n_n),
                                     norm_str(n_g),
                                     norm_str(n_l),
@@ -738,9 +1870,12 @@ try:
                                     norm_str(n_e),
                                     fmt_tel_cad,
                                     "PENDENTE"
-                                ])
-                                buscar_usuarios_cadastrados.clear()
-                                buscar_usuarios_admin.clear()
+                                ]
+                                campos_novo = com_chaves(dict(zip(COLUNAS_LINHA_USUARIO, novo)))
+                                resp = gs_call(sheet_u_escrita.append_row,
+                                               linha_no_cabecalho(buscar_cabecalho_usuarios(ROTA_ID), campos_novo))
+                                linha_nova = linha_anexada(resp, records_u_public.total + 2)
+                                escrita_usuarios(ROTA_ID, [(linha_nova, campos_novo)])
                                 st.success("Cadastro realizado! Aguardando aprovação do Administrador.")
                                 st.rerun()
 
@@ -783,20 +1918,22 @@ try:
                 else:
                     tel_rec_digits = tel_only_digits(fmt_tel_rec)
 
-                    row_idx, _ = find_user_row_by_email_tel(sheet_u_escrita, e_r, tel_rec_digits)
+                    row_idx, u_rec = find_user_row_by_email_tel(ROTA_ID, e_r, tel_rec_digits)
 
                     if row_idx:
                         senha_temp = gerar_senha_temp(10)
-                        expira_dt = _br_now() + timedelta(minutes=10)
+                        expira_dt = _br_now() + timedelta(minutes=config_rota(ROTA_ID).get("temp_senha_min"))
                         expira_str = _fmt_dt(expira_dt)
 
                         temp_cols = ensure_temp_cols(sheet_u_escrita)
                         gs_call(sheet_u_escrita.update_cell, row_idx, temp_cols["TEMP_SENHA"], senha_temp)
                         gs_call(sheet_u_escrita.update_cell, row_idx, temp_cols["TEMP_EXPIRA"], expira_str)
                         gs_call(sheet_u_escrita.update_cell, row_idx, temp_cols["TEMP_USADA"], "NAO")
-
-                        buscar_usuarios_cadastrados.clear()
-                        buscar_usuarios_admin.clear()
+                        # TEMP_* estão no índice de login: entra como remendo
+                        escrita_usuarios(ROTA_ID, [(row_idx, {
+                            "Email": u_rec.get("Email"), "TEMP_SENHA": senha_temp,
+                            "TEMP_EXPIRA": expira_str, "TEMP_USADA": "NAO",
+                        })])
 
                         st.success("✅ Senha temporária gerada com sucesso.")
                         st.info(f"🔑 **Senha temporária:** {senha_temp}\n\n⏳ Expira em: {expira_str}\n\n⚠️ Válida para **apenas 1 acesso**.")
@@ -821,7 +1958,9 @@ try:
     # PAINEL ADM
     # =========================================
     elif st.session_state.is_admin:
+        PERF.tela = "admin"
         st.header("🛡️ PAINEL ADMINISTRATIVO 🛡️")
+        st.caption(f"Rota: {ROTA.nome}")
 
         sair_btn = st.button("⬅️ SAIR DO PAINEL")
         if sair_btn:
@@ -830,26 +1969,116 @@ try:
             st.rerun()
 
         if st.session_state._adm_first_load:
-            buscar_usuarios_admin.clear()
+            invalidar_usuarios(ROTA_ID, so_admin=True)
             st.session_state._adm_first_load = False
 
-        records_u = buscar_usuarios_admin()
+        records_u = usuarios_admin(ROTA_ID)
 
         cA, cB = st.columns([1, 1])
         with cA:
             att_btn = st.button("🔄 Atualizar Usuários", use_container_width=True)
             if att_btn:
-                buscar_usuarios_admin.clear()
+                invalidar_usuarios(ROTA_ID, so_admin=True)
+                migrar_chaves_usuarios.clear(ROTA_ID)
+                falhas_migracao_chaves().pop(ROTA_ID, None)
                 st.rerun()
         with cB:
             st.caption("ADM lê mais fresco (TTL=3s).")
 
+        agenda_adm = agenda_da_rota(ROTA)
+        sit_adm = agenda_adm.consultar(_br_now())
+        refresh_adm = refresh_presenca(ROTA_ID)
+        st.caption(f"Fase da lista: {sit_adm.fase} | próxima transição: "
+                   f"{sit_adm.proxima_transicao.strftime('%d/%m %H:%M')}")
+        st.caption(f"Presença: lê a aba a cada {refresh_adm.intervalo:.1f}s"
+                   + (" (reconciliação; lista pelo diário)" if refresh_adm.pelo_diario else "") + " | "
+                   f"acerto do cache {refresh_adm.taxa_acerto():.0%} | "
+                   f"{refresh_adm.taxa * 60:.1f} inscrições/min | "
+                   f"{refresh_adm.sessoes_ativas()} sessões ativas | "
+                   f"{confirmacoes_presenca(ROTA_ID).descartadas} confirmações removidas por fora")
+        disco = cache_disco(ROTA_ID)
+        st.caption(f"Cache em disco: {disco.gravacoes} gravações | "
+                   f"{disco.evitadas} leituras iguais à salva (sem regravar)")
+        part_adm = particoes_presenca(ROTA_ID)
+        st.caption(f"Aba do ciclo: {nome_particao(id_ciclo(_br_now(), ROTA))} | "
+                   f"{part_adm.criadas} abas criadas | {part_adm.podadas} podadas"
+                   + (f" | último erro: {part_adm.ultimo_erro}" if part_adm.ultimo_erro else ""))
+
+        with st.expander("📊 Cota de requisições por rota"):
+            reg_cotas = cotas_por_rota()
+            for rid, cota in list(reg_cotas["cotas"].items()):
+                st.caption(f"{obter_rota(rid).nome}: {cota.chamadas} chamadas | "
+                           f"{cota.esperas} aguardaram cota | "
+                           f"limite {cota.por_minuto[COTA_LEITURA]}/min leitura, {cota.por_minuto[COTA_ESCRITA]}/min escrita")
+            for (dataset, rid), est in sorted(voo_unico().estatisticas().items()):
+                if rid == ROTA_ID:
+                    st.caption(f"Leitura '{dataset}': {est['leituras']} na planilha | "
+                               f"{est['colapsadas']} colapsadas (voo único)")
+            transporte = getattr(conectar_gsheets(), "transporte", None)
+            if transporte is not None:
+                for host, est in transporte.estatisticas().items():
+                    st.caption(f"HTTP {host}: {est['requisicoes']} requisições | {est['conexoes']} conexões abertas | "
+                               f"{est['reaproveitamento']:.0%} reaproveitadas")
+                st.caption(f"Token renovado em segundo plano {transporte.renovacoes}x"
+                           + (f" | última falha: {transporte.erro_renovacao}" if transporte.erro_renovacao else ""))
+            rem = remendos_usuarios(ROTA_ID)
+            st.caption(f"Escritas aplicadas direto no índice: {rem.escritas} linhas | "
+                       f"{rem.divergencias} divergências (releitura completa)")
+            st.caption(f"Login/recuperação fora do índice: {rem.buscas} releituras | "
+                       f"{rem.negativos_evitados} evitadas (cache negativo)")
+            acertadas = chaves_migradas(ROTA_ID)
+            st.caption("Chaves EMAIL_KEY/TEL_KEY: " + (
+                f"migração pendente (nova tentativa em até {MIGRAR_CHAVES_ESPERA_S:.0f}s)" if acertadas is None
+                else f"{acertadas} linhas acertadas nesta partida"))
+            camada = camada_compartilhada()
+            if camada is not None:
+                st.caption(f"Camada compartilhada ({camada.replica}): {camada.leituras} leituras publicadas | "
+                           f"{camada.aproveitadas} servidas por snapshot | {camada.caminho}")
+            perf_rota = perfil_rota(ROTA_ID)
+            perf_rota["ativo"] = st.checkbox(
+                "⏱️ Perfilar todas as execuções desta rota", value=perf_rota["ativo"], key="adm_perf_rota"
+            )
+
+        with st.expander("🧾 Diário de presença (auditoria)"):
+            diario = diario_presenca(ROTA_ID)
+            if diario.ultima_reconciliacao:
+                quando, mais, menos = diario.ultima_reconciliacao
+                st.caption(f"Última reconciliação com a planilha: "
+                           f"{datetime.fromtimestamp(quando, FUSO_BR).strftime('%H:%M:%S')} | "
+                           f"+{mais} / -{menos} divergências")
+            ciclo_aud = st.text_input("Ciclo (AAAAMMDD_HHMM):", value=id_ciclo(_br_now(), ROTA), key="adm_diario_ciclo")
+            email_aud = st.text_input("E-mail (opcional):", key="adm_diario_email").strip()
+            eventos = diario.eventos(ciclo_aud.strip() or None, email_aud or None)
+            st.caption(f"{len(eventos)} eventos, na ordem em que foram registrados")
+            st.dataframe([
+                {
+                    "registrado_em": datetime.fromtimestamp(ev.get("ts", 0), FUSO_BR).strftime("%d/%m %H:%M:%S.%f")[:-3],
+                    "evento": ev.get("tipo", ""),
+                    "email": ev.get("email", ""),
+                    "nome": (ev.get("linha") or [""] * 6)[3] if ev.get("tipo") == EV_CONFIRMAR else "",
+                    "data_hora_planilha": (ev.get("linha") or [""])[0] if ev.get("tipo") == EV_CONFIRMAR else "",
+                    "origem": ev.get("origem", ""),
+                }
+                for ev in eventos
+            ], hide_index=True, use_container_width=True)
+
         st.subheader("⚙️ Configurações Globais")
+        cfg_adm = config_rota(ROTA_ID)
+        st.caption(f"Config v{cfg_adm.versao} (aba Config: LIMITE em A2, CHAVE | VALOR em C:D)")
+        for chave, valor, motivo in cfg_adm.erros:
+            st.warning(f"Config '{chave}' = '{valor}' ignorada ({motivo}); usando o padrão.")
+        if cfg_adm.desconhecidas:
+            st.caption("Chaves desconhecidas na Config: " + ", ".join(cfg_adm.desconhecidas))
+        with st.expander("Chaves aceitas na Config"):
+            for chave, spec in REGISTRO.items():
+                st.caption(f"{chave} = {cfg_adm.get(chave, '(padrão da rota)')} — {spec.descricao}")
         novo_limite = st.number_input("Limite máximo de usuários:", value=int(limite_max))
         salvar_lim = st.button("💾 SALVAR NOVO LIMITE")
         if salvar_lim:
-            sheet_c = ws_config()
+            sheet_c = ws_config(ROTA_ID)
             gs_call(sheet_c.update, "A2", [[str(novo_limite)]])
+            buscar_config.clear(ROTA_ID)
+            publicar_escrita(ROTA_ID, "config")
             st.success("Limite atualizado!")
             st.rerun()
 
@@ -859,42 +2088,81 @@ try:
 
         ativar_all = st.button("✅ ATIVAR TODOS E DESLOGAR", use_container_width=True)
         if ativar_all:
-            if records_u:
+            if records_u.total:
                 start = 2
-                end = len(records_u) + 1
+                end = records_u.total + 1
                 rng = f"H{start}:H{end}"
-                gs_call(sheet_u_escrita.update, rng, [["ATIVO"]] * len(records_u))
-                buscar_usuarios_admin.clear()
-                buscar_usuarios_cadastrados.clear()
+                gs_call(sheet_u_escrita.update, rng, [["ATIVO"]] * records_u.total)
+                invalidar_usuarios(ROTA_ID)
                 st.session_state.clear()
                 st.rerun()
 
-        for i, user in enumerate(records_u):
-            if busca == "" or busca in str(user.get("Nome", "")).lower() or busca in str(user.get("Email", "")).lower():
-                status = str(user.get("STATUS", "")).upper()
-                with st.expander(f"{user.get('Graduação')} {user.get('Nome')} - {status}"):
-                    c1, c2, c3 = st.columns([2, 1, 1])
-                    c1.write(f"📧 {user.get('Email')} | 📱 {user.get('TELEFONE')}")
-                    is_ativo = (status == "ATIVO")
-
-                    new_val = c2.checkbox("Liberar", value=is_ativo, key=f"adm_chk_{i}")
-                    if new_val != is_ativo:
-                        gs_call(sheet_u_escrita.update_cell, i + 2, 8, "ATIVO" if new_val else "INATIVO")
-                        buscar_usuarios_admin.clear()
-                        buscar_usuarios_cadastrados.clear()
+        with st.expander("📥 Importar usuários (CSV/XLSX)"):
+            st.caption("Colunas: Nome, Graduação, Lotação, Senha, Origem (QG/RMCF/OUTROS), Email, TELEFONE.")
+            arq_imp = st.file_uploader("Arquivo:", type=["csv", "xlsx"], key="adm_import_arquivo")
+            aprovar_imp = st.checkbox("Já liberar (ATIVO) os importados", value=True, key="adm_import_aprovar")
+            if arq_imp is not None:
+                # pandas só é carregado quando o ADM usa a importação
+                from importacao import ler_arquivo, validar_importacao
+                try:
+                    df_imp = ler_arquivo(arq_imp.name, arq_imp.getvalue())
+                    novas, relatorio = validar_importacao(
+                        df_imp,
+                        set(records_u.email_keys),
+                        set(records_u.tel_keys),
+                        int(limite_max) - records_u.total,
+                        status="ATIVO" if aprovar_imp else "PENDENTE",
+                    )
+                except ImportError:
+                    st.error("Leitura de XLSX indisponível (instale o openpyxl) — envie em CSV.")
+                    novas, relatorio = [], None
+                except Exception as e:
+                    st.error(f"Não foi possível ler o arquivo: {e}")
+                    novas, relatorio = [], None
+                if relatorio is not None:
+                    recusadas = relatorio[relatorio["situacao"] != "OK"]
+                    st.caption(f"{len(novas)} linhas válidas | {len(recusadas)} recusadas")
+                    if len(recusadas):
+                        st.dataframe(recusadas, hide_index=True, use_container_width=True)
+                    st.download_button("📄 Relatório da importação (CSV)", relatorio.to_csv(index=False).encode("utf-8"),
+                                       "relatorio_importacao.csv", key="adm_import_relatorio")
+                    if novas and st.button(f"📥 IMPORTAR {len(novas)} USUÁRIOS", use_container_width=True,
+                                           key="adm_import_gravar"):
+                        campos_imp = [com_chaves(dict(zip(COLUNAS_LINHA_USUARIO, r))) for r in novas]
+                        cab_imp = buscar_cabecalho_usuarios(ROTA_ID)
+                        resp = gs_call(sheet_u_escrita.append_rows, [linha_no_cabecalho(cab_imp, c) for c in campos_imp])
+                        primeira = linha_anexada(resp, records_u.total + 2)
+                        escrita_usuarios(ROTA_ID, [(primeira + j, c) for j, c in enumerate(campos_imp)])
+                        st.success(f"{len(novas)} usuários importados.")
                         st.rerun()
 
-                    del_btn = c3.button("🗑️", key=f"del_{i}")
-                    if del_btn:
-                        gs_call(sheet_u_escrita.delete_rows, i + 2)
-                        buscar_usuarios_admin.clear()
-                        buscar_usuarios_cadastrados.clear()
-                        st.rerun()
+        with PERF.fase(FASE_ADMIN_LISTA):
+            for i, user in enumerate(records_u.registros()):
+                if busca == "" or busca in str(user.get("Nome", "")).lower() or busca in str(user.get("Email", "")).lower():
+                    status = str(user.get("STATUS", "")).upper()
+                    with st.expander(f"{user.get('Graduação')} {user.get('Nome')} - {status}"):
+                        c1, c2, c3 = st.columns([2, 1, 1])
+                        c1.write(f"📧 {user.get('Email')} | 📱 {user.get('TELEFONE')}")
+                        is_ativo = (status == "ATIVO")
+
+                        new_val = c2.checkbox("Liberar", value=is_ativo, key=f"adm_chk_{i}")
+                        if new_val != is_ativo:
+                            gs_call(sheet_u_escrita.update_cell, i + 2, 8, "ATIVO" if new_val else "INATIVO")
+                            escrita_usuarios(ROTA_ID, [(i + 2, {"Email": user.get("Email"),
+                                                                "STATUS": "ATIVO" if new_val else "INATIVO"})])
+                            st.rerun()
+
+                        del_btn = c3.button("🗑️", key=f"del_{i}")
+                        if del_btn:
+                            gs_call(sheet_u_escrita.delete_rows, i + 2)
+                            invalidar_usuarios(ROTA_ID)
+                            st.rerun()
 
     # =========================================
     # USUÁRIO LOGADO
     # =========================================
     else:
+        PERF.tela = "usuario"
         u = st.session_state.usuario_logado
 
         # ==========================================================
@@ -908,7 +2176,7 @@ try:
             row_idx = st.session_state.get("_profile_update_row")
             if row_idx is None:
                 try:
-                    row_idx, _ = find_user_row_by_email_tel(sheet_u_escrita, u.get("Email", ""), u.get("TELEFONE", ""))
+                    row_idx, _ = find_user_row_by_email_tel(ROTA_ID, u.get("Email", ""), u.get("TELEFONE", ""))
                 except Exception:
                     row_idx = None
 
@@ -919,8 +2187,8 @@ try:
             orig_atual = str(u.get("QG_RMCF_OUTROS", "") or u.get("ORIGEM", "") or "QG")
             tel_atual_fmt = tel_format_br(str(u.get("TELEFONE", "") or ""))
 
-            grads = ["TCEL", "MAJ", "CAP", "1º TEN", "2º TEN", "SUBTEN", "1º SGT", "2º SGT", "3º SGT", "CB", "SD", "FC COM", "FC TER"]
-            origs = ["QG", "RMCF", "OUTROS"]
+            grads = list(GRADUACOES)
+            origs = list(ORIGENS)
 
             try:
                 grad_idx = grads.index(str(grad_atual).strip()) if str(grad_atual).strip() in grads else grads.index("SD")
@@ -981,36 +2249,30 @@ try:
                             email_log = str(u.get("Email", "")).strip().lower()
 
                             # busca registros mais recentes para validar duplicidade
-                            records_check = buscar_usuarios_cadastrados()
-                            tel_colide = False
-                            for uu in records_check:
-                                em2 = str(uu.get("Email", "")).strip().lower()
-                                if em2 == email_log:
-                                    continue
-                                if tel_only_digits(uu.get("TELEFONE", "")) == tel_new_digits:
-                                    tel_colide = True
-                                    break
+                            records_check = usuarios_publico(ROTA_ID)
+                            tel_colide = records_check.tem_telefone(tel_new_digits, exceto_email=email_log)
 
                             if tel_colide:
                                 st.error("Este telefone já está cadastrado para outro usuário.")
                             else:
-                                # Atualiza colunas no layout do seu append_row:
-                                # 1 Nome | 2 Graduação | 3 Lotação | 4 Senha | 5 Origem | 6 Email | 7 Telefone | 8 STATUS
-                                gs_call(sheet_u_escrita.update_cell, row_idx, 1, norm_str(novo_nome))
-                                gs_call(sheet_u_escrita.update_cell, row_idx, 2, norm_str(novo_grad))
-                                gs_call(sheet_u_escrita.update_cell, row_idx, 3, norm_str(novo_lot))
-                                gs_call(sheet_u_escrita.update_cell, row_idx, 4, norm_str(nova1))
-                                gs_call(sheet_u_escrita.update_cell, row_idx, 5, norm_str(novo_orig))
-                                gs_call(sheet_u_escrita.update_cell, row_idx, 7, fmt_tel_up)
-
-                                # Finaliza token TEMP: marca como usado e limpa
-                                temp_cols = ensure_temp_cols(sheet_u_escrita)
-                                gs_call(sheet_u_escrita.update_cell, row_idx, temp_cols["TEMP_SENHA"], "")
-                                gs_call(sheet_u_escrita.update_cell, row_idx, temp_cols["TEMP_EXPIRA"], "")
-                                gs_call(sheet_u_escrita.update_cell, row_idx, temp_cols["TEMP_USADA"], "SIM")
-
-                                buscar_usuarios_cadastrados.clear()
-                                buscar_usuarios_admin.clear()
+                                # Cadastro + fim do token TEMP (usado e limpo) numa única
+                                # batch_update, com as colunas do cabeçalho em cache
+                                campos_up = {
+                                    "Nome": norm_str(novo_nome), "Graduação": norm_str(novo_grad),
+                                    "Lotação": norm_str(novo_lot), "Senha": norm_str(nova1),
+                                    "QG_RMCF_OUTROS": norm_str(novo_orig), "TELEFONE": fmt_tel_up,
+                                    "TEMP_SENHA": "", "TEMP_EXPIRA": "", "TEMP_USADA": "SIM",
+                                }
+                                garantir_colunas_temp(ROTA_ID, sheet_u_escrita)
+                                cab_u = buscar_cabecalho_usuarios(ROTA_ID)
+                                # EMAIL_KEY/TEL_KEY vão na mesma batch_update (se a aba
+                                # ainda não tem as colunas, a migração preenche depois)
+                                chaves_up = com_chaves({"Email": u.get("Email"), "TELEFONE": fmt_tel_up})
+                                campos_up.update({c: chaves_up[c] for c in COLS_CHAVES_CANONICAS if c in cab_u})
+                                gs_call(sheet_u_escrita.batch_update, celulas_da_linha(cab_u, row_idx, campos_up))
+
+                                # só depois da gravação: o índice desta réplica recebe a linha
+                                escrita_usuarios(ROTA_ID, [(row_idx, {**chaves_up, **campos_up})])
 
                                 # Atualiza sessão local
                                 st.session_state.usuario_logado["Nome"] = norm_str(novo_nome)
@@ -1044,29 +2306,55 @@ try:
         st.sidebar.markdown("---")
         st.sidebar.caption("Desenvolvido por: MAJ ANDRÉ AGUIAR - CAES®️")
 
-        sheet_p_escrita = ws_presenca()
+        sheet_p_escrita = ws_presenca(ROTA_ID)
 
         if st.session_state._force_refresh_presenca:
-            buscar_presenca_atualizada.clear()
+            invalidar_presenca(ROTA_ID)
             st.session_state._force_refresh_presenca = False
 
-        dados_p = buscar_presenca_atualizada()
-        dados_p_show = filtrar_linhas_presenca(dados_p)
+        with PERF.fase(FASE_SNAPSHOT):
+            snap_p = buscar_presenca_atualizada(ROTA_ID)
 
-        aberto, janela_conf = verificar_status_e_limpar(sheet_p_escrita, dados_p_show)
+        with PERF.fase(FASE_STATUS):
+            aberto, janela_conf = verificar_status(ROTA)
 
-        df_o, df_v = pd.DataFrame(), pd.DataFrame()
+        with PERF.fase(FASE_SNAPSHOT):
+            snap_p = presenca_do_diario(ROTA_ID, snap_p)
+
+        lista = LISTA_VAZIA._replace(vagas=vagas_da_rota(ROTA))
         ja, pos = False, 999
 
-        if dados_p_show and len(dados_p_show) > 1:
-            df_o, df_v = aplicar_ordenacao(pd.DataFrame(dados_p_show[1:], columns=dados_p_show[0]))
-            email_logado = str(u.get("Email")).strip().lower()
-            ja = any(email_logado == str(row.get("EMAIL", "")).strip().lower() for _, row in df_o.iterrows())
+        if snap_p.tem_linhas():
+            with PERF.fase(FASE_RANKING):
+                lista = montar_lista_presenca(snap_p.versao, vagas_da_rota(ROTA), snap_p)
+                pos_lista = lista.posicao(u.get("Email"))
+            ja = pos_lista is not None
             if ja:
-                pos = df_o.index[df_o["EMAIL"].str.lower() == email_logado].tolist()[0] + 1
+                pos = pos_lista
+                confirmacoes_presenca(ROTA_ID).marcar_confirmado(id_ciclo(_br_now(), ROTA), u.get("Email"))
+
+        # aviso de mudança de posição, a partir do diff já calculado para a rota
+        historico = historico_ranking(ROTA_ID)
+        seq_ranking = historico.observar(id_ciclo(_br_now(), ROTA), lista)
+        seq_visto = st.session_state.get("_ranking_seq")
+        if ja and seq_visto is not None and seq_visto < seq_ranking:
+            mudanca = historico.mudanca_desde(seq_visto, str(u.get("Email")).strip().lower())
+            if mudanca is not None:
+                st.session_state["_ranking_aviso"] = (seq_ranking, mudanca)
+        st.session_state["_ranking_seq"] = seq_ranking
 
         if ja:
             st.success(f"✅ Presença registrada: {pos}º")
+            aviso = st.session_state.get("_ranking_aviso")
+            if aviso and aviso[0] == seq_ranking:
+                m = aviso[1]
+                texto = f"Você passou de {_rotulo_tela(m.de)} para {_rotulo_tela(m.para)}."
+                if m.tipo == MUDANCA_PROMOVIDO:
+                    st.success(f"🎉 {texto} Agora você está dentro das vagas!")
+                elif m.tipo == MUDANCA_EXCEDENTE:
+                    st.warning(f"⚠️ {texto} Você está no excedente.")
+                else:
+                    st.info(f"↕️ {texto}")
 
             # ==========================================================
             # ALTERAÇÃO SOLICITADA: confirmação antes de excluir
@@ -1094,30 +2382,42 @@ try:
 
                 if sim_btn:
                     email_logado = str(u.get("Email")).strip().lower()
-                    if dados_p and len(dados_p) > 1:
-                        for idx, r in enumerate(dados_p):
-                            if len(r) >= 6 and str(r[5]).strip().lower() == email_logado:
-                                gs_call(sheet_p_escrita.delete_rows, idx + 1)
-                                break
+                    # o índice da linha vem da coluna EMAIL lida na hora (exclusoes.py)
+                    exclusoes_presenca(ROTA_ID).excluir(sheet_p_escrita, email_logado)
+                    ciclo_atual = id_ciclo(_br_now(), ROTA)
+                    diario_presenca(ROTA_ID).remover(ciclo_atual, email_logado)
 
+                    confirmacoes_presenca(ROTA_ID).esquecer(ciclo_atual, email_logado)
                     st.session_state._confirmar_exclusao_presenca = False
-                    buscar_presenca_atualizada.clear()
+                    presenca_escrita_local(ROTA_ID)
                     st.rerun()
 
         elif aberto:
             salvar_btn = st.button("🚀 CONFIRMAR MINHA PRESENÇA ✅", use_container_width=True)
             if salvar_btn:
-                agora = datetime.now(FUSO_BR).strftime("%d/%m/%Y %H:%M:%S")
-                gs_call(sheet_p_escrita.append_row, [
-                    agora,
-                    u.get("QG_RMCF_OUTROS") or "QG",
-                    u.get("Graduação"),
-                    u.get("Nome"),
-                    u.get("Lotação"),
-                    u.get("Email")
-                ])
-                buscar_presenca_atualizada.clear()
-                st.rerun()
+                ciclo_atual = id_ciclo(_br_now(), ROTA)
+
+                def _append_presenca(agora):
+                    linha = [
+                        agora,
+                        u.get("QG_RMCF_OUTROS") or "QG",
+                        u.get("Graduação"),
+                        u.get("Nome"),
+                        u.get("Lotação"),
+                        u.get("Email")
+                    ]
+                    gs_call(sheet_p_escrita.append_row, linha)
+                    diario_presenca(ROTA_ID).confirmar(ciclo_atual, linha)
+
+                resultado, _quando = confirmacoes_presenca(ROTA_ID).confirmar(
+                    ciclo_atual, u.get("Email"), _append_presenca, na_lista=ja
+                )
+                if resultado == CONF_PENDENTE:
+                    st.info("⏳ Sua confirmação já está sendo registrada...")
+                else:
+                    # NOVA ou JA_CONFIRMADA: o snapshot em cache está velho
+                    presenca_escrita_local(ROTA_ID)
+                    st.rerun()
         else:
             st.info("⌛ Lista fechada para novas inscrições.")
 
@@ -1126,7 +2426,7 @@ try:
             # ==========================================================
             up_btn_fechado = st.button("🔄 ATUALIZAR", use_container_width=True, key="up_btn_fechado")
             if up_btn_fechado:
-                buscar_presenca_atualizada.clear()
+                invalidar_presenca(ROTA_ID)
                 st.rerun()
 
         # CONFERÊNCIA
@@ -1137,21 +2437,42 @@ try:
             if painel_btn:
                 st.session_state.conf_ativa = not st.session_state.conf_ativa
 
-            if st.session_state.conf_ativa and (dados_p_show and len(dados_p_show) > 1):
-                for i, row in df_o.iterrows():
-                    label = f"{row.get('Nº','')} - {row.get('GRADUAÇÃO','')} {row.get('NOME','')} - {row.get('LOTAÇÃO','')}".strip()
-                    _ = st.checkbox(label if label else " ", key=f"chk_p_{i}")
-
-        if dados_p_show and len(dados_p_show) > 1:
-            insc = len(df_o)
-            rest = 38 - insc
-            st.subheader(f"Inscritos: {insc} | Vagas: 38 | {'Sobra' if rest >= 0 else 'Exc'}: {abs(rest)}")
+            if st.session_state.conf_ativa and snap_p.tem_linhas():
+                sheet_e = ws_embarque(ROTA_ID)
+                checklist = checklist_embarque(ROTA_ID)
+                ciclo_emb = id_ciclo(_br_now(), ROTA)
+                conferente = f"{u.get('Graduação')} {u.get('Nome')}"
+
+                def _ao_marcar(chave_widget, email_key):
+                    checklist.marcar(sheet_e, ciclo_emb, email_key, st.session_state[chave_widget], conferente,
+                                     _br_now())
+
+                # Recarrega sozinho para mostrar o progresso dos outros conferentes
+                @st.fragment(run_every=EMBARQUE_REFRESH_S)
+                def _lista_embarque():
+                    checklist.sincronizar(sheet_e, ciclo_emb)
+                    marcados = checklist.estado(ciclo_emb)
+                    st.caption(f"Embarcados: {sum(marcados.values())}/{lista.inscritos}")
+                    for i, (rotulo, row) in enumerate(lista.ranking):
+                        # a posição entra na chave: a aba pode ter o mesmo e-mail em duas linhas
+                        chave_widget = f"chk_p_{i}_{row.email_key}"
+                        st.session_state[chave_widget] = marcados.get(row.email_key, False)
+                        label = f"{rotulo} - {row.graduacao} {row.nome} - {row.lotacao}".strip()
+                        st.checkbox(label if label else " ", key=chave_widget,
+                                    on_change=_ao_marcar, args=(chave_widget, row.email_key))
+
+                _lista_embarque()
+
+        if snap_p.tem_linhas():
+            insc = lista.inscritos
+            rest = lista.vagas - insc
+            st.subheader(f"Inscritos: {insc} | Vagas: {lista.vagas} | {'Sobra' if rest >= 0 else 'Exc'}: {abs(rest)}")
 
             c_up1, c_up2 = st.columns([1, 1])
             with c_up1:
                 up_btn = st.button("🔄 ATUALIZAR", use_container_width=True, key="up_btn_tabela")
                 if up_btn:
-                    buscar_presenca_atualizada.clear()
+                    invalidar_presenca(ROTA_ID)
                     st.rerun()
             with c_up2:
                 st.caption("Atualiza sob demanda.")
@@ -1161,39 +2482,43 @@ try:
             # 1) Zebra (linhas alternadas) via CSS na classe 'presenca-zebra'
             # 2) Nome em negrito (coluna NOME) sem quebrar excedentes (span vermelho)
             # ==========================================================
-            df_v_show = df_v.copy()
-            if "NOME" in df_v_show.columns:
-                df_v_show["NOME"] = df_v_show["NOME"].apply(lambda x: f"<b>{x}</b>")
-
+            with PERF.fase(FASE_HTML):
+                tabela_html = render_tabela_html(lista, classes='presenca-zebra')
             st.write(
                 f"<div class='tabela-responsiva'>"
-                f"{df_v_show.drop(columns=['EMAIL']).to_html(index=False, justify='center', border=0, escape=False, classes='presenca-zebra')}"
+                f"{tabela_html}"
                 f"</div>",
                 unsafe_allow_html=True
             )
 
             c1, c2 = st.columns(2)
             with c1:
-                resumo = {"inscritos": insc, "vagas": 38}
-                pdf_bytes = gerar_pdf_apresentado(df_o, resumo)
+                resumo = {"inscritos": insc, "vagas": lista.vagas}
+                with PERF.fase(FASE_PDF):
+                    pdf_bytes = gerar_pdf_apresentado(lista, resumo, ROTA)
                 _ = st.download_button(
                     "📄 PDF (Relatório)",
                     pdf_bytes,
-                    "lista_rota_nova_iguacu.pdf",
+                    f"lista_{ROTA_ID}.pdf",
                     use_container_width=True
                 )
 
             with c2:
-                txt_w = "*🚌 LISTA DE PRESENÇA*\n\n"
-                for _, r in df_o.iterrows():
-                    txt_w += f"{r['Nº']}. {r['GRADUAÇÃO']} {r['NOME']} - {r['LOTAÇÃO']}\n"
+                with PERF.fase(FASE_WHATSAPP):
+                    txt_w = texto_whatsapp(lista)
+                    link_w = urllib.parse.quote(txt_w)
                 st.markdown(
-                    f'<a href="https://wa.me/?text={urllib.parse.quote(txt_w)}" target="_blank">'
+                    f'<a href="https://wa.me/?text={link_w}" target="_blank">'
                     f"<button style='width:100%; height:38px; background-color:#25D366; color:white; border:none; "
                     f"border-radius:4px; font-weight:bold;'>🟢 WHATSAPP</button></a>",
                     unsafe_allow_html=True
                 )
 
+    if PERF.ativo and (_perf_qs or st.session_state.is_admin):
+        with st.expander("⏱️ Perfil desta execução"):
+            for nome_fase, ms in PERF.resumo():
+                st.caption(f"{nome_fase}: {ms:.1f} ms")
+
     st.markdown('<div class="footer">Desenvolvido por: <b>MAJ ANDRÉ AGUIAR - CAES®️</b></div>', unsafe_allow_html=True)
 
     # ==========================================================
@@ -1211,5 +2536,8 @@ try:
 
 except Exception as e:
     st.error(f"⚠️ Erro: {e}")
+finally:
+    # também em st.rerun()/st.stop(): a execução interrompida entra no arquivo
+    PERF.gravar()
 
 
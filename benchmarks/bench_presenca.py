@@ -0,0 +1,156 @@
+"""
+Benchmark: caminho antigo (DataFrame) x modelo compacto (PresenceRow).
+
+Mede, por "rerun", o trabalho de montar a lista ordenada e gerar as saídas
+da tela (tabela HTML + texto do WhatsApp + localizar o usuário logado).
+
+    python benchmarks/bench_presenca.py [--linhas 60] [--reruns 300]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from presenca import montar_lista, render_tabela_html, texto_whatsapp  # noqa: E402
+
+CABECALHO = ["DATA_HORA", "QG_RMCF_OUTROS", "GRADUAÇÃO", "NOME", "LOTAÇÃO", "EMAIL"]
+GRADS = ["TCEL", "MAJ", "CAP", "1º TEN", "2º TEN", "SUBTEN", "1º SGT",
+         "2º SGT", "3º SGT", "CB", "SD", "FC COM", "FC TER"]
+ORIGENS = ["QG", "RMCF", "OUTROS"]
+
+
+def gerar_dados(n: int, seed: int = 7):
+    rnd = random.Random(seed)
+    t0 = datetime(2026, 10, 19, 19, 0, 0)
+    linhas = []
+    for i in range(n):
+        dt = t0 + timedelta(seconds=i * rnd.randint(1, 40))
+        linhas.append([
+            dt.strftime("%d/%m/%Y %H:%M:%S"),
+            rnd.choice(ORIGENS),
+            rnd.choice(GRADS),
+            f"MILITAR {i:03d}",
+            f"UNIDADE {rnd.randint(1, 30)}",
+            f"militar{i:03d}@exemplo.com",
+        ])
+    return [CABECALHO] + linhas
+
+
+# ----------------------------------------------------------
+# Caminho antigo (cópia fiel do aplicar_ordenacao + uso na tela)
+# ----------------------------------------------------------
+def aplicar_ordenacao_df(df):
+    p_orig = {"QG": 1, "RMCF": 2, "OUTROS": 3}
+    p_grad_normal = {
+        "TCEL": 1, "MAJ": 2, "CAP": 3, "1º TEN": 4, "2º TEN": 5, "SUBTEN": 6,
+        "1º SGT": 7, "2º SGT": 8, "3º SGT": 9, "CB": 10, "SD": 11
+    }
+
+    def grupo_fc(grad):
+        g = str(grad or "").strip().upper()
+        if g == "FC COM":
+            return 1
+        if g == "FC TER":
+            return 2
+        return 0
+
+    df["grupo_fc"] = df["GRADUAÇÃO"].apply(grupo_fc)
+    df["p_o"] = df["QG_RMCF_OUTROS"].map(p_orig).fillna(99)
+
+    def p_grad(row):
+        if int(row.get("grupo_fc", 0)) == 0:
+            return p_grad_normal.get(str(row.get("GRADUAÇÃO", "")).strip().upper(), 999)
+        return 0
+
+    df["p_g"] = df.apply(p_grad, axis=1)
+    df["dt"] = pd.to_datetime(df["DATA_HORA"], dayfirst=True, errors="coerce")
+    df = df.sort_values(by=["grupo_fc", "p_o", "p_g", "dt"]).reset_index(drop=True)
+    df.insert(0, "Nº", [str(i + 1) if i < 38 else f"Exc-{i - 37:02d}" for i in range(len(df))])
+
+    # pandas >= 3 não faz mais o upcast implícito das colunas auxiliares
+    # numéricas; astype(object) reproduz o comportamento do pandas 2.
+    df_v = df.astype(object)
+    for i, r in df_v.iterrows():
+        if "Exc-" in str(r["Nº"]):
+            for c in df_v.columns:
+                df_v.at[i, c] = f"<span style='color:#d32f2f; font-weight:bold;'>{r[c]}</span>"
+
+    return df.drop(columns=["grupo_fc", "p_o", "p_g", "dt"]), df_v.drop(columns=["grupo_fc", "p_o", "p_g", "dt"])
+
+
+def rerun_dataframe(dados, email):
+    df_o, df_v = aplicar_ordenacao_df(pd.DataFrame(dados[1:], columns=dados[0]))
+    ja = any(email == str(row.get("EMAIL", "")).strip().lower() for _, row in df_o.iterrows())
+    if ja:
+        _ = df_o.index[df_o["EMAIL"].str.lower() == email].tolist()[0] + 1
+    df_v_show = df_v.copy()
+    df_v_show["NOME"] = df_v_show["NOME"].apply(lambda x: f"<b>{x}</b>")
+    html = df_v_show.drop(columns=["EMAIL"]).to_html(index=False, justify="center", border=0, escape=False)
+    txt_w = ""
+    for _, r in df_o.iterrows():
+        txt_w += f"{r['Nº']}. {r['GRADUAÇÃO']} {r['NOME']} - {r['LOTAÇÃO']}\n"
+    return html, txt_w
+
+
+def rerun_compacto(dados, email, lista=None):
+    # Em produção o parse acontece uma vez por snapshot (cache_resource);
+    # com lista=None medimos também o parse, o pior caso.
+    lista = lista or montar_lista(dados)
+    _ = lista.posicao(email)
+    return render_tabela_html(lista), texto_whatsapp(lista)
+
+
+def medir(nome, fn, reruns):
+    fn()  # aquecimento
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    t0 = time.perf_counter()
+    for _ in range(reruns):
+        fn()
+    dt = time.perf_counter() - t0
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # alocações (blocos) de um único rerun
+    tracemalloc.start()
+    antes = tracemalloc.take_snapshot()
+    _r = fn()
+    depois = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocos = sum(s.count_diff for s in depois.compare_to(antes, "filename") if s.count_diff > 0)
+
+    print(f"{nome:<28} {dt / reruns * 1000:9.3f} ms/rerun   pico {pico / 1024:9.1f} KiB   blocos/rerun {blocos:7d}")
+    return dt / reruns
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--linhas", type=int, default=60)
+    ap.add_argument("--reruns", type=int, default=300)
+    args = ap.parse_args()
+
+    dados = gerar_dados(args.linhas)
+    email = dados[len(dados) // 2][5]
+
+    # sanidade: as duas implementações produzem a mesma ordem
+    df_o, _ = aplicar_ordenacao_df(pd.DataFrame(dados[1:], columns=dados[0]))
+    lista = montar_lista(dados)
+    assert list(df_o["EMAIL"]) == [r.email for _, r in lista.ranking], "ordem divergente"
+    assert list(df_o["Nº"]) == [n for n, _ in lista.ranking], "rótulos divergentes"
+
+    print(f"linhas={args.linhas} reruns={args.reruns}")
+    t_df = medir("DataFrame (antigo)", lambda: rerun_dataframe(dados, email), args.reruns)
+    t_pr = medir("PresenceRow (com parse)", lambda: rerun_compacto(dados, email), args.reruns)
+    t_sn = medir("PresenceRow (snapshot)", lambda: rerun_compacto(dados, email, lista), args.reruns)
+    print(f"ganho: {t_df / t_pr:.1f}x (com parse)  {t_df / t_sn:.1f}x (snapshot em cache)")
+
+
+if __name__ == "__main__":
+    main()
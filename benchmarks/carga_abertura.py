@@ -0,0 +1,347 @@
+"""
+Carga ponta a ponta: corrida da reabertura da lista (19:00) com N sessões.
+
+Roda o app.py de verdade (streamlit.testing AppTest, sem navegador) contra
+o emulador do Sheets (sheets_emulador.py), com o relógio do app deslocado
+para logo depois da reabertura. Cada sessão faz, em fases sincronizadas:
+
+    abrir -> login -> confirmar -> atualizar -> excluir
+
+e dentro de cada fase as sessões chegam espalhadas em --janela segundos.
+Relata p50/p95 do tempo de execução do script por ação, chamadas à API por
+ação e erros 429 — para comparar antes/depois de uma mudança.
+
+    python benchmarks/carga_abertura.py [--sessoes 60] [--janela 10] [--latencia-ms 150]
+
+O relógio do app é deslocado pelo st.secrets ([teste] relogio_deslocamento_s),
+nunca por variável de ambiente. Para rodar várias sessões ao mesmo tempo, o
+harness remenda partes internas do AppTest; elas mudam entre versões do
+Streamlit, então a versão é conferida antes (STREAMLIT_TESTADO).
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import pytz  # noqa: E402
+
+from presenca import FMT_CICLO, ciclo_da_particao  # noqa: E402
+
+STREAMLIT_TESTADO = ("1.66",)   # versões (major.minor) em que os remendos do AppTest foram conferidos
+FUSO_BR = pytz.timezone("America/Sao_Paulo")
+APP = os.path.join(RAIZ, "app.py")
+ACOES = ("abrir", "login", "confirmar", "atualizar", "excluir")
+GRADS = ["MAJ", "CAP", "1º TEN", "SUBTEN", "1º SGT", "3º SGT", "CB", "SD"]
+
+
+def deslocamento_para(hora: str, atraso_s: float) -> float:
+    """Segundos até a próxima segunda-feira às `hora` (+ atraso), no fuso do app."""
+    h, m = (int(x) for x in hora.split(":"))
+    agora = datetime.now(FUSO_BR)
+    alvo = (agora + timedelta(days=(7 - agora.weekday()) % 7 or 7)).replace(
+        hour=h, minute=m, second=0, microsecond=0
+    )
+    return (alvo - agora).total_seconds() + atraso_s
+
+
+def gerar_usuarios(n: int, rnd: random.Random):
+    usuarios = []
+    for i in range(n):
+        usuarios.append([
+            f"MILITAR {i:03d}", rnd.choice(GRADS), f"UNIDADE {rnd.randint(1, 30)}", f"senha{i}",
+            rnd.choice(["QG", "RMCF", "OUTROS"]), f"militar{i:03d}@exemplo.com",
+            f"(21) 9{i:04d}.{i:04d}", "ATIVO",
+        ])
+    return usuarios
+
+
+def percentil(valores, p: float) -> float:
+    if not valores:
+        return 0.0
+    v = sorted(valores)
+    k = (len(v) - 1) * p
+    i = int(k)
+    return v[i] if i + 1 >= len(v) else v[i] + (v[i + 1] - v[i]) * (k - i)
+
+
+def conferir_streamlit(forcar: bool = False):
+    """Falha com mensagem clara se o Streamlit instalado não é o conferido ou não tem os internals usados."""
+    import importlib
+
+    import streamlit
+
+    versao = ".".join(streamlit.__version__.split(".")[:2])
+    if versao not in STREAMLIT_TESTADO and not forcar:
+        raise SystemExit(
+            f"carga_abertura: Streamlit {streamlit.__version__} não conferido (testado: "
+            f"{', '.join(STREAMLIT_TESTADO)}). Os remendos do AppTest usam partes internas; "
+            f"instale streamlit=={STREAMLIT_TESTADO[-1]}.* ou rode com --forcar-streamlit."
+        )
+    internos = {
+        "streamlit.components.v2.component_manager": ("BidiComponentManager",),
+        "streamlit.runtime": ("Runtime",),
+        "streamlit.runtime.caching.storage.dummy_cache_storage": ("MemoryCacheStorageManager",),
+        "streamlit.runtime.dataframe_source_manager": ("DataframeSourceManager",),
+        "streamlit.runtime.media_file_manager": ("MediaFileManager",),
+        "streamlit.runtime.memory_media_file_storage": ("MemoryMediaFileStorage",),
+        "streamlit.runtime.scriptrunner.script_cache": ("ScriptCache",),
+        "streamlit.runtime.secrets": ("Secrets",),
+        "streamlit.testing.v1.app_test": ("patch_config_options",),
+        "streamlit.testing.v1.util": ("build_mock_config_get_option",),
+    }
+    faltando = []
+    for modulo, nomes in internos.items():
+        try:
+            m = importlib.import_module(modulo)
+        except ImportError:
+            faltando.append(modulo)
+            continue
+        faltando += [f"{modulo}.{n}" for n in nomes if not hasattr(m, n)]
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    if not hasattr(ScriptCache, "get_bytecode"):
+        faltando.append("ScriptCache.get_bytecode")
+    if faltando:
+        raise SystemExit(f"carga_abertura: Streamlit {streamlit.__version__} não tem os internals usados "
+                         f"pelo harness: {', '.join(faltando)}")
+
+
+def preparar_apptest_concorrente(secrets: dict = None):
+    """
+    AppTest foi feito para uma sessão por vez: cada run() instala um Runtime
+    falso global (e o remove no fim) e troca config.get_option. Com várias
+    sessões em threads, fixamos um único Runtime falso e aplicamos a troca
+    de config (e de st.secrets) uma vez só, para que uma sessão não
+    desmonte a outra.
+    """
+    from contextlib import nullcontext
+    from unittest.mock import MagicMock
+
+    from streamlit import config
+    from streamlit.components.v2.component_manager import BidiComponentManager
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test
+    from streamlit.testing.v1.util import build_mock_config_get_option
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    bidi = BidiComponentManager()
+    bidi.discover_and_register_components(start_file_watching=False)
+    runtime.bidi_component_registry = bidi
+    Runtime.instance = classmethod(lambda cls: runtime)
+    Runtime.exists = classmethod(lambda cls: True)
+
+    config.get_option = build_mock_config_get_option({"global.appTest": True})
+    if secrets is not None:
+        import streamlit as st
+        from streamlit.runtime.secrets import Secrets
+        st.secrets = Secrets()
+        st.secrets._secrets = secrets
+    app_test.patch_config_options = lambda _overrides: nullcontext()
+
+    # cada run() cria seu ScriptCache; compilar o app em paralelo esbarra num
+    # bug do ast.parse do CPython 3.11 -> compila uma vez, sob trava
+    original = ScriptCache.get_bytecode
+    trava, compilados = threading.Lock(), {}
+
+    def get_bytecode(self, script_path):
+        with trava:
+            if script_path not in compilados:
+                compilados[script_path] = original(self, script_path)
+            return compilados[script_path]
+
+    ScriptCache.get_bytecode = get_bytecode
+
+
+class Sessao:
+    def __init__(self, i: int, usuario, timeout: float):
+        from streamlit.testing.v1 import AppTest
+        self.i = i
+        self.u = usuario
+        self.at = AppTest.from_file(APP, default_timeout=timeout)
+        self.tempos = {}
+        self.falhas = []
+
+    def _botao(self, trecho: str = None, key: str = None):
+        for b in self.at.button:
+            if (key and b.key == key) or (trecho and trecho in b.label):
+                return b
+        return None
+
+    def _medir(self, acao: str, fn):
+        t = time.perf_counter()
+        try:
+            ok = fn()
+        except Exception as e:  # a ação falhou: registra e segue com as outras sessões
+            ok = False
+            self.falhas.append(f"{acao}: {type(e).__name__}: {e}")
+        self.tempos[acao] = time.perf_counter() - t
+        if ok is False and not any(f.startswith(acao) for f in self.falhas):
+            erros = [e.value for e in self.at.error]
+            self.falhas.append(f"{acao}: {erros or 'estado inesperado'}")
+
+    def _sem_erro(self) -> bool:
+        """Nenhuma exceção nem st.error (ex.: falha na planilha) nesta execução."""
+        return not self.at.exception and not self.at.error
+
+    def _mensagem(self, elementos, trecho: str) -> bool:
+        return any(trecho in e.value for e in elementos)
+
+    def abrir(self):
+        self.at.run()
+        return self._sem_erro()
+
+    def login(self):
+        self.at.text_input[0].input(self.u[5])
+        self.at.text_input[1].input(self.u[6])
+        self.at.text_input[2].input(self.u[3])
+        self._botao("ENTRAR").click().run()
+        return self._sem_erro() and self.at.session_state["usuario_logado"] is not None
+
+    def confirmar(self):
+        b = self._botao("CONFIRMAR")
+        if b is None:
+            return False
+        b.click().run()
+        # o st.info da barra lateral (nome do usuário) aparece sempre: só
+        # contam o sucesso ou o aviso de confirmação pendente
+        return self._sem_erro() and (self._mensagem(self.at.success, "Presença registrada")
+                                     or self._mensagem(self.at.info, "já está sendo registrada"))
+
+    def atualizar(self):
+        b = self._botao(key="up_btn_tabela") or self._botao(key="up_btn_fechado")
+        if b is None:
+            return False
+        b.click().run()
+        return self._sem_erro()
+
+    def excluir(self):
+        b = self._botao(key="btn_excluir_presenca")
+        if b is None:
+            return False
+        b.click().run()
+        sim = self._botao(key="btn_confirmar_exclusao_sim")
+        if sim is None:
+            return False
+        sim.click().run()
+        return self._sem_erro() and self._botao("CONFIRMAR") is not None
+
+
+def linhas_presenca(cli, deslocamento_s: float) -> int:
+    """
+    Linhas de dados na aba do ciclo em curso no relógio do app (a aba do
+    próximo ciclo já pode ter sido criada, vazia).
+    """
+    agora = (datetime.now(FUSO_BR) + timedelta(seconds=deslocamento_s)).strftime(FMT_CICLO)
+    abas = [w for w in cli.open("ListaPresenca").worksheets() if (ciclo_da_particao(w.title) or "~") <= agora]
+    return len(max(abas, key=lambda w: w.title).get_all_values()) - 1 if abas else 0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessoes", type=int, default=60)
+    ap.add_argument("--janela", type=float, default=10.0, help="chegadas espalhadas em N segundos por fase")
+    ap.add_argument("--hora", default="19:00", help="reabertura simulada (HH:MM)")
+    ap.add_argument("--atraso", type=float, default=5.0, help="segundos após a reabertura")
+    ap.add_argument("--latencia-ms", type=float, default=150.0)
+    ap.add_argument("--leituras-min", type=int, default=300, help="cota de leitura do emulador (0 = sem cota)")
+    ap.add_argument("--escritas-min", type=int, default=300, help="cota de escrita do emulador (0 = sem cota)")
+    ap.add_argument("--cota-rota", type=int, default=0,
+                    help="cota_por_minuto da rota no app, leitura e escrita (0 = padrão do app.py)")
+    ap.add_argument("--taxa-5xx", type=float, default=0.0)
+    ap.add_argument("--timeout", type=float, default=120.0)
+    ap.add_argument("--semente", type=int, default=7)
+    ap.add_argument("--forcar-streamlit", action="store_true",
+                    help="roda mesmo com uma versão do Streamlit não conferida")
+    args = ap.parse_args()
+    conferir_streamlit(args.forcar_streamlit)
+
+    # o app lê estas variáveis a cada execução do script
+    os.environ["ROTA_SHEETS_EMULADOR"] = "1"
+    os.environ["ROTA_EMULADOR_LATENCIA_MS"] = str(args.latencia_ms)
+    os.environ["ROTA_EMULADOR_LEITURAS_MIN"] = str(args.leituras_min)
+    os.environ["ROTA_EMULADOR_ESCRITAS_MIN"] = str(args.escritas_min)
+    os.environ["ROTA_EMULADOR_TAXA_5XX"] = str(args.taxa_5xx)
+    os.environ["ROTA_EMULADOR_SEMENTE"] = str(args.semente)
+    os.environ["ROTA_CACHE_DIR"] = tempfile.mkdtemp(prefix="carga_rota_")
+    os.environ["ROTA_DIARIO_DIR"] = os.path.join(os.environ["ROTA_CACHE_DIR"], "diario")
+
+    import sheets_emulador as se
+
+    # relógio do app logo depois da reabertura (lido por _br_now)
+    deslocamento_s = deslocamento_para(args.hora, args.atraso)
+    secrets = {"teste": {"relogio_deslocamento_s": deslocamento_s}}
+    if args.cota_rota:
+        secrets["rotas"] = {"nova_iguacu": {"cota_por_minuto": args.cota_rota}}
+    preparar_apptest_concorrente(secrets)
+    rnd = random.Random(args.semente)
+    cli = se.cliente_do_ambiente()
+    usuarios = gerar_usuarios(args.sessoes, rnd)
+    doc = se.semear_rota(cli, "ListaPresenca", usuarios=usuarios)
+    # planilha em regime: as colunas TEMP_* já existem (não medimos a migração)
+    doc.worksheet("Usuarios").update("I1:K1", [["TEMP_SENHA", "TEMP_EXPIRA", "TEMP_USADA"]])
+    cli.zerar_estatisticas()
+
+    sessoes = [Sessao(i, u, args.timeout) for i, u in enumerate(usuarios)]
+    por_acao = {}
+    confirmadas = [0]
+
+    print(f"sessões={args.sessoes} janela={args.janela}s latência={args.latencia_ms}ms "
+          f"cota leitura/escrita={args.leituras_min}/{args.escritas_min} por min "
+          f"cota da rota={args.cota_rota or 'padrão'}")
+    print(f"{'ação':<10} {'p50 ms':>9} {'p95 ms':>9} {'máx ms':>9} {'API/ação':>9} "
+          f"{'leit.':>6} {'escr.':>6} {'429':>5} {'falhas':>7}")
+
+    for acao in ACOES:
+        antes = cli.estatisticas()
+        atrasos = sorted(rnd.uniform(0, args.janela) for _ in sessoes)
+        t0 = time.perf_counter()
+
+        def rodar(s, atraso):
+            time.sleep(max(0.0, t0 + atraso - time.perf_counter()))
+            s._medir(acao, getattr(s, acao))
+
+        threads = [threading.Thread(target=rodar, args=(s, a)) for s, a in zip(sessoes, atrasos)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        depois = cli.estatisticas()
+        tempos = [s.tempos[acao] * 1000 for s in sessoes if acao in s.tempos]
+        falhas = sum(1 for s in sessoes if any(f.startswith(acao) for f in s.falhas))
+        chamadas = depois["total"] - antes["total"]
+        por_acao[acao] = tempos
+        print(f"{acao:<10} {percentil(tempos, .5):9.0f} {percentil(tempos, .95):9.0f} {max(tempos, default=0):9.0f} "
+              f"{chamadas / max(1, len(sessoes)):9.2f} {depois['leituras'] - antes['leituras']:6d} "
+              f"{depois['escritas'] - antes['escritas']:6d} {depois['erros_429'] - antes['erros_429']:5d} {falhas:7d}")
+        if acao == "confirmar":
+            confirmadas[0] = linhas_presenca(cli, deslocamento_s)
+
+    est = cli.estatisticas()
+    print(f"\ntotal: {est['total']} chamadas ({est['leituras']} leituras, {est['escritas']} escritas), "
+          f"429={est['erros_429']} 5xx={est['erros_5xx']}")
+    print("por método:", dict(sorted(est["chamadas"].items(), key=lambda kv: -kv[1])))
+
+    print(f"confirmações gravadas na planilha: {confirmadas[0]} de {len(sessoes)}")
+    print(f"linhas de presença restantes: {linhas_presenca(cli, deslocamento_s)} (esperado 0)")
+    exemplos = [f"#{s.i} {f}" for s in sessoes for f in s.falhas][:5]
+    if exemplos:
+        print("falhas (amostra):", *exemplos, sep="\n  ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Camada compartilhada entre réplicas do app (opcional), em SQLite.
+
+st.cache_data/st.cache_resource vivem dentro de um processo: com várias
+réplicas, cada uma lê as abas por conta própria e tem a sua própria cota.
+Apontando ROTA_CACHE_COMPARTILHADO para um arquivo num volume comum, as
+réplicas passam a dividir:
+
+- snapshots das leituras (com a versão dos dados em que foram lidos);
+- carimbos de versão por conjunto (uma escrita numa réplica invalida as outras);
+- o orçamento de chamadas por rota (token bucket único, inclusive a pausa após 429);
+- concessões de voo único (só uma réplica lê um conjunto por vez).
+
+Tudo em transações curtas (BEGIN IMMEDIATE) com WAL; valores em JSON.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import NamedTuple, Optional
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS snapshot (
+    chave TEXT PRIMARY KEY, versao INTEGER NOT NULL, salvo_em REAL NOT NULL, valor TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS versao (
+    chave TEXT PRIMARY KEY, n INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cota (
+    rota TEXT PRIMARY KEY, tokens REAL NOT NULL, t_ultimo REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS concessao (
+    chave TEXT PRIMARY KEY, dono TEXT NOT NULL, expira REAL NOT NULL
+);
+"""
+
+
+class Snapshot(NamedTuple):
+    valor: object
+    versao: int
+    salvo_em: float
+
+
+class CamadaCompartilhada:
+    def __init__(self, caminho: str, replica: str = None):
+        self.caminho = caminho
+        self.replica = replica or f"{socket.gethostname()}:{os.getpid()}"
+        self._local = threading.local()
+        self.lock = threading.Lock()
+        self.leituras = 0         # leituras feitas por esta réplica
+        self.aproveitadas = 0     # leituras servidas por snapshot de qualquer réplica
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self._con().executescript(ESQUEMA)
+
+    def _con(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.caminho, timeout=10.0, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def _transacao(self, fn):
+        con = self._con()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            r = fn(con)
+            con.execute("COMMIT")
+            return r
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+
+    # ---------- versões ----------
+    def versao(self, chave: str) -> int:
+        row = self._con().execute("SELECT n FROM versao WHERE chave = ?", (chave,)).fetchone()
+        return row[0] if row else 0
+
+    def invalidar(self, chave: str) -> int:
+        """Nova versão do conjunto: snapshots lidos antes dela deixam de valer."""
+        def fn(con):
+            con.execute("INSERT INTO versao (chave, n) VALUES (?, 1) "
+                        "ON CONFLICT(chave) DO UPDATE SET n = n + 1", (chave,))
+            return con.execute("SELECT n FROM versao WHERE chave = ?", (chave,)).fetchone()[0]
+        return self._transacao(fn)
+
+    # ---------- snapshots ----------
+    def ler(self, chave: str, chave_versao: str = None) -> Optional[Snapshot]:
+        """Snapshot lido na versão atual de chave_versao (padrão: a própria chave), ou None."""
+        row = self._con().execute(
+            "SELECT s.valor, s.versao, s.salvo_em FROM snapshot s "
+            "LEFT JOIN versao v ON v.chave = ? "
+            "WHERE s.chave = ? AND s.versao = COALESCE(v.n, 0)", (chave_versao or chave, chave)
+        ).fetchone()
+        if row is None:
+            return None
+        try:
+            return Snapshot(json.loads(row[0]), row[1], row[2])
+        except ValueError:
+            return None
+
+    def gravar(self, chave: str, valor, versao: int):
+        self._con().execute(
+            "INSERT INTO snapshot (chave, versao, salvo_em, valor) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(chave) DO UPDATE SET versao = excluded.versao, "
+            "salvo_em = excluded.salvo_em, valor = excluded.valor",
+            (chave, versao, time.time(), json.dumps(valor, ensure_ascii=False, separators=(",", ":"))),
+        )
+
+    # ---------- voo único entre réplicas ----------
+    def adquirir(self, chave: str, ttl: float) -> bool:
+        agora = time.time()
+
+        def fn(con):
+            row = con.execute("SELECT dono, expira FROM concessao WHERE chave = ?", (chave,)).fetchone()
+            if row and row[0] != self.replica and row[1] > agora:
+                return False
+            con.execute("INSERT INTO concessao (chave, dono, expira) VALUES (?, ?, ?) "
+                        "ON CONFLICT(chave) DO UPDATE SET dono = excluded.dono, expira = excluded.expira",
+                        (chave, self.replica, agora + ttl))
+            return True
+        return self._transacao(fn)
+
+    def liberar(self, chave: str):
+        self._con().execute("DELETE FROM concessao WHERE chave = ? AND dono = ?", (chave, self.replica))
+
+    def ler_compartilhado(self, chave: str, ler, idade_max: float, chave_versao: str = None,
+                          espera_max: float = 10.0):
+        """
+        Snapshot com até idade_max segundos (de qualquer réplica) ou, com a
+        concessão em mãos, ler() e publicar. Sem a concessão, espera quem a
+        tem publicar; passado espera_max, lê por conta própria.
+        """
+        t0 = time.time()
+        while True:
+            snap = self.ler(chave, chave_versao)
+            if snap is not None and time.time() - snap.salvo_em <= idade_max:
+                with self.lock:
+                    self.aproveitadas += 1
+                return snap.valor
+            if self.adquirir(chave, espera_max):
+                try:
+                    versao = self.versao(chave_versao or chave)
+                    valor = ler()
+                    self.gravar(chave, valor, versao)
+                    with self.lock:
+                        self.leituras += 1
+                    return valor
+                finally:
+                    self.liberar(chave)
+            if time.time() - t0 > espera_max:
+                return ler()
+            time.sleep(0.05)
+
+    # ---------- cota única por rota ----------
+    def tomar_token(self, rota: str, por_minuto: int) -> float:
+        """0.0 se consumiu 1 token; senão, segundos até haver um."""
+        agora = time.time()
+
+        def fn(con):
+            row = con.execute("SELECT tokens, t_ultimo FROM cota WHERE rota = ?", (rota,)).fetchone()
+            tokens, t_ultimo = row if row else (float(por_minuto), agora)
+            tokens = min(float(por_minuto), tokens + max(0.0, agora - t_ultimo) * por_minuto / 60.0)
+            falta = 0.0
+            if tokens >= 1.0:
+                tokens -= 1.0
+            else:
+                falta = (1.0 - tokens) * 60.0 / por_minuto
+            con.execute("INSERT INTO cota (rota, tokens, t_ultimo) VALUES (?, ?, ?) "
+                        "ON CONFLICT(rota) DO UPDATE SET tokens = excluded.tokens, t_ultimo = excluded.t_ultimo",
+                        (rota, tokens, agora))
+            return falta
+        return self._transacao(fn)
+
+    def penalizar(self, rota: str, por_minuto: int, segundos: float):
+        """Após um 429: zera o balde da rota para todas as réplicas por `segundos`."""
+        agora = time.time()
+        tokens = -segundos * por_minuto / 60.0
+        self._transacao(lambda con: con.execute(
+            "INSERT INTO cota (rota, tokens, t_ultimo) VALUES (?, ?, ?) "
+            "ON CONFLICT(rota) DO UPDATE SET tokens = MIN(cota.tokens, excluded.tokens), "
+            "t_ultimo = excluded.t_ultimo", (rota, tokens, agora)))
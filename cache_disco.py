@@ -0,0 +1,142 @@
+"""
+Cache quente em disco: últimos snapshots bons de cada rota.
+
+Depois que o app hiberna, o primeiro acesso esperaria a autorização e a
+leitura de todas as abas. Com este arquivo (JSON compactado com gzip, com
+versão de formato), a primeira execução do processo mostra o último
+snapshot salvo, marcado como possivelmente velho, enquanto a leitura real
+roda em segundo plano.
+
+Gravação atômica: arquivo temporário na mesma pasta + os.replace, com
+permissão 0o600 (só o usuário do processo lê). O documento é montado sob o
+lock; gzip e fsync rodam fora dele, sob um lock só de gravação, e uma
+geração mais antiga nunca sobrescreve uma mais nova. Leitura igual à última
+salva (mesma assinatura) não regrava o arquivo; só renova o carimbo
+salvo_em a cada REGRAVAR_IGUAL_S, para não ser descartado como velho na
+próxima partida a frio. Arquivo ilegível (corrompido, outra versão, outra
+rota) é ignorado e a leitura é feita ao vivo, como antes.
+
+O app só grava aqui o que a primeira tela precisa (nada de Senha, e-mail ou
+telefone); ver os chamadores de guardar().
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+VERSAO_FORMATO = 1
+REGRAVAR_IGUAL_S = 300.0  # conteúdo igual: renova salvo_em no disco no máximo a cada 5 min
+
+
+def _json(valor) -> str:
+    return json.dumps(valor, ensure_ascii=False, separators=(",", ":"))
+
+
+def assinatura(valor) -> str:
+    return hashlib.blake2b(_json(valor).encode("utf-8"), digest_size=16).hexdigest()
+
+
+class CacheDisco:
+    def __init__(self, caminho: str, rota_id: str):
+        self.caminho = caminho
+        self.rota_id = rota_id
+        self.lock = threading.Lock()
+        self.lock_gravacao = threading.Lock()
+        self.entradas = {}            # conjunto -> {"valor": ..., "salvo_em": epoch}
+        self.assinaturas = {}         # conjunto -> assinatura do valor salvo
+        self.nao_revalidados = set()  # vieram do disco e ainda não foram lidos ao vivo
+        self.revalidando = set()
+        self.erro_leitura = None
+        self.geracao = 0              # documentos montados
+        self.geracao_gravada = 0      # último documento que chegou ao disco
+        self.gravacoes = 0            # arquivos regravados
+        self.evitadas = 0             # leituras iguais à salva (sem regravar)
+        self._carregar()
+
+    def _carregar(self):
+        try:
+            with gzip.open(self.caminho, "rt", encoding="utf-8") as f:
+                doc = json.load(f)
+            if doc.get("versao") != VERSAO_FORMATO or doc.get("rota") != self.rota_id:
+                raise ValueError("versão/rota diferente")
+            entradas = {
+                k: {"valor": e["valor"], "salvo_em": float(e["salvo_em"])}
+                for k, e in dict(doc["conjuntos"]).items()
+            }
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            self.erro_leitura = f"{type(e).__name__}: {e}"
+            return
+        self.entradas = entradas
+        self.assinaturas = {k: assinatura(e["valor"]) for k, e in entradas.items()}
+        self.nao_revalidados = set(entradas)
+
+    def obter(self, conjunto: str, valido_desde: float = 0.0):
+        """Valor salvo ainda não revalidado (ou None). Mais antigo que valido_desde é descartado."""
+        with self.lock:
+            if conjunto not in self.nao_revalidados:
+                return None
+            e = self.entradas.get(conjunto)
+            if e is None or e["salvo_em"] < valido_desde:
+                self.nao_revalidados.discard(conjunto)
+                return None
+            return e["valor"]
+
+    def iniciar_revalidacao(self, conjunto: str) -> bool:
+        """True para quem deve disparar a leitura ao vivo (uma por conjunto)."""
+        with self.lock:
+            if conjunto in self.revalidando or conjunto not in self.nao_revalidados:
+                return False
+            self.revalidando.add(conjunto)
+            return True
+
+    def fim_revalidacao(self, conjunto: str):
+        with self.lock:
+            self.revalidando.discard(conjunto)
+
+    def guardar(self, conjunto: str, valor):
+        """Registra uma leitura ao vivo bem-sucedida; regrava o arquivo só se mudou."""
+        ass = assinatura(valor)
+        agora = time.time()
+        with self.lock:
+            self.nao_revalidados.discard(conjunto)
+            e = self.entradas.get(conjunto)
+            if (e is not None and self.assinaturas.get(conjunto) == ass
+                    and agora - e["salvo_em"] < REGRAVAR_IGUAL_S):
+                self.evitadas += 1
+                return
+            self.entradas[conjunto] = {"valor": valor, "salvo_em": agora}
+            self.assinaturas[conjunto] = ass
+            self.geracao += 1
+            geracao = self.geracao
+            doc = {"versao": VERSAO_FORMATO, "rota": self.rota_id, "conjuntos": dict(self.entradas)}
+        with self.lock_gravacao:
+            if geracao <= self.geracao_gravada:
+                return  # outra thread já gravou um documento mais novo
+            if self._gravar(doc):
+                self.geracao_gravada = geracao
+                self.gravacoes += 1
+
+    def _gravar(self, doc) -> bool:
+        pasta = os.path.dirname(self.caminho) or "."
+        tmp = os.path.join(pasta, f".{os.path.basename(self.caminho)}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            os.makedirs(pasta, mode=0o700, exist_ok=True)
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "wb") as bruto:
+                with gzip.GzipFile(fileobj=bruto, mode="wb", compresslevel=6, mtime=0) as f:
+                    f.write(_json(doc).encode("utf-8"))
+                bruto.flush()
+                os.fsync(bruto.fileno())
+            os.replace(tmp, self.caminho)
+            return True
+        except OSError:
+            # disco cheio/somente leitura: o cache quente é só uma otimização
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return False
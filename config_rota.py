@@ -0,0 +1,133 @@
+"""
+Registro tipado da aba Config.
+
+A aba tem o LIMITE em A2 e pares CHAVE | VALOR em C:D (ex.: fecha_tarde |
+17:00, ttl_fechada | 300, vagas | 40). Tudo vem numa leitura só
+(A2:D, até o fim da aba) e é validado contra REGISTRO: cada chave tem
+tipo e padrão. Valor inválido é ignorado (fica o padrão) e aparece em
+`erros` para o ADM.
+
+ConfigRota leva um número de versão que só sobe quando algum valor
+tipado muda. Os dependentes (agenda, lista montada) usam como chave de
+cache apenas os valores das chaves que os afetam, então mudar um TTL não
+remonta a lista e mudar as vagas não recalcula a agenda.
+"""
+import threading
+import time as time_module
+from datetime import time
+from typing import Callable, NamedTuple, Optional
+
+from agenda import TTLS_PADRAO, PICO_MIN_PADRAO
+
+
+def _hhmm(s) -> time:
+    h, m = str(s).strip().split(":")
+    return time(int(h), int(m))
+
+
+def _inteiro_pos(s) -> int:
+    v = int(str(s).strip())
+    if v <= 0:
+        raise ValueError("deve ser maior que zero")
+    return v
+
+
+def _inteiro_nao_neg(s) -> int:
+    v = int(str(s).strip())
+    if v < 0:
+        raise ValueError("não pode ser negativo")
+    return v
+
+
+def _real_pos(s) -> float:
+    v = float(str(s).strip().replace(",", "."))
+    if v <= 0:
+        raise ValueError("deve ser maior que zero")
+    return v
+
+
+class Chave(NamedTuple):
+    converter: Callable
+    padrao: object            # None = padrão da rota (secrets)
+    descricao: str
+
+
+HORARIOS = ("fecha_manha", "reabre_manha", "reset_manha", "embarque_manha",
+            "fecha_tarde", "reabre_tarde", "reset_tarde", "embarque_tarde")
+
+REGISTRO = {
+    "limite": Chave(_inteiro_nao_neg, 100, "máximo de usuários cadastrados (célula A2)"),
+    "vagas": Chave(_inteiro_pos, None, "vagas da lista"),
+    **{h: Chave(_hhmm, None, "horário HH:MM") for h in HORARIOS},
+    **{f"ttl_{fase.lower()}": Chave(_real_pos, float(ttl), f"TTL (s) da presença na fase {fase}")
+       for fase, ttl in TTLS_PADRAO.items()},
+    "pico_min": Chave(_inteiro_nao_neg, PICO_MIN_PADRAO, "minutos de corrida após reabrir"),
+    "refresh_min_s": Chave(_real_pos, 2.0, "intervalo mínimo (s) de leitura da presença"),
+    "refresh_max_s": Chave(_real_pos, 30.0, "intervalo máximo (s) de leitura da presença"),
+    "temp_senha_min": Chave(_inteiro_pos, 10, "validade (min) da senha temporária"),
+    "reter_ciclos": Chave(_inteiro_nao_neg, 14, "abas de presença de ciclos anteriores mantidas"),
+}
+
+# chaves que cada dependente observa
+CHAVES_AGENDA = HORARIOS + tuple(f"ttl_{f.lower()}" for f in TTLS_PADRAO) + ("pico_min",)
+CHAVES_REFRESH = ("refresh_min_s", "refresh_max_s")
+CHAVES_LISTA = ("vagas",)
+
+
+class ConfigRota(NamedTuple):
+    valores: dict             # chave -> valor tipado (padrão do REGISTRO se ausente/inválida)
+    versao: int
+    erros: tuple              # (chave, valor bruto, motivo)
+    desconhecidas: tuple      # chaves da aba fora do REGISTRO
+
+    def get(self, chave: str, padrao=None):
+        v = self.valores.get(chave)
+        return padrao if v is None else v
+
+    def assinatura(self, chaves) -> tuple:
+        """Valores das chaves pedidas: muda só quando uma delas muda."""
+        return tuple((k, self.valores.get(k)) for k in chaves)
+
+
+def converter_config(bruto: dict):
+    """{chave: texto} -> (valores tipados, erros, chaves desconhecidas)."""
+    valores, erros = {}, []
+    for chave, spec in REGISTRO.items():
+        texto = str(bruto.get(chave, "")).strip()
+        if not texto:
+            valores[chave] = spec.padrao
+            continue
+        try:
+            valores[chave] = spec.converter(texto)
+        except (ValueError, TypeError) as e:
+            valores[chave] = spec.padrao
+            erros.append((chave, texto, str(e) or type(e).__name__))
+    desconhecidas = tuple(sorted(k for k in bruto if k not in REGISTRO))
+    return valores, tuple(erros), desconhecidas
+
+
+CONFIG_VAZIA = ConfigRota(converter_config({})[0], 0, (), ())
+
+
+class RegistroConfig:
+    """Estado da Config de uma rota no processo: converte só quando o bruto muda."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bruto = None
+        self.atual = CONFIG_VAZIA
+        self.mudancas = []        # (versao, chaves que mudaram, epoch)
+
+    def atualizar(self, bruto: Optional[dict]) -> ConfigRota:
+        """bruto=None (leitura falhou) mantém a última Config boa."""
+        with self.lock:
+            if bruto is None or bruto == self.bruto:
+                return self.atual
+            valores, erros, desconhecidas = converter_config(bruto)
+            mudaram = tuple(k for k in REGISTRO if valores[k] != self.atual.valores.get(k))
+            versao = self.atual.versao + 1 if mudaram or self.bruto is None else self.atual.versao
+            self.bruto = dict(bruto)
+            self.atual = ConfigRota(valores, versao, erros, desconhecidas)
+            if mudaram:
+                self.mudancas = (self.mudancas + [(versao, mudaram, time_module.time())])[-20:]
+            return self.atual
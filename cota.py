@@ -0,0 +1,107 @@
+"""
+Cota de chamadas à API do Google Sheets, por rota.
+
+A cota do Sheets é do projeto inteiro, com leituras e escritas contadas à
+parte por minuto. Cada rota recebe uma fatia dela em dois token buckets
+(leitura e escrita) e toda chamada espera o seu token antes de ir à API:
+uma rota movimentada fica na própria fila e não gasta a fatia das outras.
+Nenhuma chamada é descartada pelo limitador; no pior caso ela atrasa.
+
+chamar_com_cota junta o balde ao retry com backoff exponencial para 429/5xx.
+"""
+import random
+import threading
+import time
+
+from gspread.exceptions import APIError
+
+COTA_LEITURA = "leitura"
+COTA_ESCRITA = "escrita"
+
+# métodos do gspread que consomem a cota de escrita (o resto é leitura)
+METODOS_ESCRITA = frozenset({
+    "update", "update_cell", "update_cells", "batch_update", "append_row", "append_rows",
+    "insert_row", "delete_rows", "resize", "clear", "batch_clear", "add_worksheet", "del_worksheet",
+})
+
+MAX_TENTATIVAS = 6
+RECUO_BASE_S = 0.6
+RECUO_MAX_S = 6.0
+
+
+def tipo_da_chamada(func) -> str:
+    return COTA_ESCRITA if getattr(func, "__name__", "") in METODOS_ESCRITA else COTA_LEITURA
+
+
+class CotaRota:
+    """Orçamento de requisições/minuto de uma rota: um token bucket para leitura e outro para escrita."""
+
+    def __init__(self, leituras_min: int, escritas_min: int):
+        agora = time.monotonic()
+        self.por_minuto = {COTA_LEITURA: max(1, int(leituras_min)), COTA_ESCRITA: max(1, int(escritas_min))}
+        self.tokens = {t: float(n) for t, n in self.por_minuto.items()}
+        self.t_ultimo = {t: agora for t in self.por_minuto}
+        self.lock = threading.Lock()
+        self.chamadas = 0
+        self.esperas = 0          # chamadas que aguardaram o token
+
+    def _contar(self, esperou: bool):
+        with self.lock:
+            self.chamadas += 1
+            self.esperas += int(esperou)
+
+    def _tomar_token(self, tipo: str) -> float:
+        """0.0 se consumiu 1 token; senão, segundos até haver um."""
+        with self.lock:
+            n = self.por_minuto[tipo]
+            agora = time.monotonic()
+            self.tokens[tipo] = min(n, self.tokens[tipo] + (agora - self.t_ultimo[tipo]) * n / 60.0)
+            self.t_ultimo[tipo] = agora
+            if self.tokens[tipo] >= 1.0:
+                self.tokens[tipo] -= 1.0
+                return 0.0
+            return (1.0 - self.tokens[tipo]) * 60.0 / n
+
+    def tomar(self, tipo: str = COTA_LEITURA) -> bool:
+        """Consome 1 token do tipo, esperando a reposição se preciso. True se esperou."""
+        esperou = False
+        while True:
+            falta = self._tomar_token(tipo)
+            if falta <= 0.0:
+                self._contar(esperou)
+                return esperou
+            esperou = True
+            # jitter: quem está na fila não acorda todo mundo no mesmo instante
+            time.sleep(min(falta, 1.0) + random.uniform(0.0, 0.05))
+
+    def penalizar(self, tipo: str, segundos: float):
+        """Após um 429: ninguém da rota faz chamadas desse tipo nos próximos `segundos`."""
+        with self.lock:
+            self.tokens[tipo] = min(self.tokens[tipo], -segundos * self.por_minuto[tipo] / 60.0)
+
+
+def chamar_com_cota(cota, func, *args, **kwargs):
+    """func(*args, **kwargs) com o token da rota (cota=None: sem balde) e retry para 429/5xx."""
+    tipo = tipo_da_chamada(func)
+    ultimo_erro = None
+    for tentativa in range(MAX_TENTATIVAS):
+        if cota is not None:
+            cota.tomar(tipo)
+        try:
+            return func(*args, **kwargs)
+        except APIError as e:
+            msg = str(e)
+            is_429 = ("429" in msg) or ("Quota exceeded" in msg) or ("RESOURCE_EXHAUSTED" in msg)
+            is_5xx = any(code in msg for code in ["500", "502", "503", "504"])
+            if is_429 or is_5xx:
+                ultimo_erro = e
+                recuo = min(RECUO_BASE_S * (2 ** tentativa) + random.uniform(0.0, 0.35), RECUO_MAX_S)
+                if is_429 and cota is not None:
+                    # a cota do Google é do projeto: o recuo vale para a rota toda
+                    cota.penalizar(tipo, recuo)
+                time.sleep(recuo)
+                continue
+            raise
+    # APIError só pode ser construído a partir de uma resposta HTTP:
+    # propaga a última (429/5xx) depois de esgotar as tentativas
+    raise ultimo_erro
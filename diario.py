@@ -0,0 +1,229 @@
+"""
+Diário de presença: registro local, só de acréscimo, de cada evento.
+
+A aba de presença de cada ciclo guarda só o estado atual, e as abas de
+ciclos antigos são podadas. O diário (um arquivo JSONL por rota) guarda cada evento:
+
+    {"ts": epoch, "tipo": "confirmar" | "remover" | "reset", "ciclo": "AAAAMMDD_HHMM",
+     "email": ..., "linha": [DATA_HORA, ORIGEM, GRAD, NOME, LOTAÇÃO, EMAIL], "origem": ...}
+
+origem = "app" (escrita feita por este app) ou "planilha" (diferença
+encontrada na reconciliação com uma leitura da aba).
+
+O estado do ciclo (e-mail -> linha) é refeito reaplicando o diário a partir
+do último checkpoint, e acompanhado de forma incremental (só os bytes novos
+do arquivo, inclusive os gravados por outros processos no mesmo volume).
+Linhas truncadas/ilegíveis são ignoradas. Diário e checkpoint têm nomes e
+e-mails: são criados com permissão 0o600 (pasta 0o700).
+"""
+import json
+import os
+import threading
+import time
+
+VERSAO_FORMATO = 1
+CHECKPOINT_EVENTOS = 500      # grava um checkpoint a cada N eventos aplicados
+
+EV_CONFIRMAR = "confirmar"
+EV_REMOVER = "remover"
+EV_RESET = "reset"
+
+ORIGEM_APP = "app"
+ORIGEM_PLANILHA = "planilha"
+
+
+def _email_key(email) -> str:
+    return str(email or "").strip().lower()
+
+
+class DiarioPresenca:
+    def __init__(self, caminho: str, rota_id: str):
+        self.caminho = caminho
+        self.caminho_checkpoint = caminho + ".ckpt"
+        self.rota_id = rota_id
+        self.lock = threading.Lock()
+        self.ciclo = ""
+        self.linhas = {}              # email_key -> (linha, ts) do ciclo atual, na ordem de chegada
+        self.removidos = {}           # email_key -> ts da última remoção no ciclo atual
+        self.offset = 0               # bytes do diário já aplicados
+        self.desde_checkpoint = 0
+        self.reconciliado = ""        # ciclo da última reconciliação feita por este processo
+        self.ultima_reconciliacao = None   # (epoch, +da planilha, -da planilha)
+        self._retrato = (None, ())         # (offset, linhas congeladas) do último retrato
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, mode=0o700, exist_ok=True)
+        self._carregar_checkpoint()
+
+    # ---------- replay ----------
+    def _carregar_checkpoint(self):
+        try:
+            with open(self.caminho_checkpoint, encoding="utf-8") as f:
+                ck = json.load(f)
+            if ck.get("versao") != VERSAO_FORMATO or ck.get("rota") != self.rota_id:
+                return
+            if int(ck["offset"]) > os.path.getsize(self.caminho):
+                return                # diário trocado/truncado: refaz do início
+            self.ciclo = ck["ciclo"]
+            self.linhas = {k: (list(linha), float(ts)) for k, linha, ts in ck["linhas"]}
+            self.removidos = {k: float(ts) for k, ts in ck.get("removidos", {}).items()}
+            self.offset = int(ck["offset"])
+        except (OSError, ValueError, KeyError, TypeError):
+            self.ciclo, self.linhas, self.removidos, self.offset = "", {}, {}, 0
+
+    def _gravar_checkpoint(self):
+        ck = {
+            "versao": VERSAO_FORMATO, "rota": self.rota_id, "offset": self.offset, "ciclo": self.ciclo,
+            "linhas": [[k, linha, ts] for k, (linha, ts) in self.linhas.items()],
+            "removidos": self.removidos,
+        }
+        tmp = f"{self.caminho_checkpoint}.{os.getpid()}.tmp"
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(ck, f, ensure_ascii=False)
+            os.replace(tmp, self.caminho_checkpoint)
+            self.desde_checkpoint = 0
+        except OSError:
+            pass
+
+    def _aplicar(self, ev: dict):
+        ciclo = ev.get("ciclo", "")
+        if ciclo < self.ciclo:
+            return                    # evento atrasado de um ciclo já encerrado
+        if ciclo > self.ciclo or ev.get("tipo") == EV_RESET:
+            self.ciclo, self.linhas, self.removidos = ciclo, {}, {}
+        k = _email_key(ev.get("email"))
+        ts = float(ev.get("ts", 0.0))
+        if ev.get("tipo") == EV_CONFIRMAR and k and k not in self.linhas:
+            self.linhas[k] = (list(ev.get("linha") or []), ts)
+            self.removidos.pop(k, None)
+        elif ev.get("tipo") == EV_REMOVER and k:
+            self.linhas.pop(k, None)
+            self.removidos[k] = ts
+
+    def _acompanhar(self):
+        """Aplica o que foi acrescentado ao diário desde o último offset (lock já obtido)."""
+        try:
+            with open(self.caminho, "rb") as f:
+                f.seek(self.offset)
+                novos = f.read()
+        except FileNotFoundError:
+            return
+        fim = novos.rfind(b"\n") + 1          # linha ainda sendo escrita fica para depois
+        for bruta in novos[:fim].splitlines():
+            try:
+                self._aplicar(json.loads(bruta))
+            except (ValueError, TypeError, AttributeError):
+                continue
+            self.desde_checkpoint += 1
+        self.offset += fim
+        if self.desde_checkpoint >= CHECKPOINT_EVENTOS:
+            self._gravar_checkpoint()
+
+    def _registrar(self, ev: dict):
+        ev.setdefault("ts", time.time())
+        linha = (json.dumps(ev, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        # O_APPEND: cada evento é um write() só, mesmo com vários processos
+        fd = os.open(self.caminho, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, linha)
+        finally:
+            os.close(fd)
+        self._acompanhar()
+
+    # ---------- eventos ----------
+    def confirmar(self, ciclo: str, linha, origem: str = ORIGEM_APP):
+        linha = [str(x) for x in linha]
+        with self.lock:
+            self._registrar({"tipo": EV_CONFIRMAR, "ciclo": ciclo, "email": _email_key(linha[5]),
+                             "linha": linha, "origem": origem})
+
+    def remover(self, ciclo: str, email: str, origem: str = ORIGEM_APP):
+        with self.lock:
+            self._registrar({"tipo": EV_REMOVER, "ciclo": ciclo, "email": _email_key(email), "origem": origem})
+
+    def reset(self, ciclo: str) -> bool:
+        """Abre o ciclo. Uma vez só (entre processos também): False se o diário já está nele."""
+        with self.lock:
+            if self.ciclo >= ciclo:
+                return False
+            self._acompanhar()
+            if self.ciclo >= ciclo:
+                return False
+            self._registrar({"tipo": EV_RESET, "ciclo": ciclo, "origem": ORIGEM_APP})
+            self._gravar_checkpoint()
+            return True
+
+    # ---------- leitura ----------
+    def sincronizado(self, ciclo: str) -> bool:
+        """True depois que uma leitura da aba, neste ciclo, foi reconciliada por este processo."""
+        return self.reconciliado == ciclo
+
+    def retrato(self, ciclo: str):
+        """
+        (offset, linhas do ciclo no layout da aba, sem cabeçalho, na ordem em
+        que entraram). As linhas são tuplas, refeitas só quando o diário muda;
+        o offset serve de versão.
+        """
+        with self.lock:
+            self._acompanhar()
+            if self.ciclo != ciclo:
+                return self.offset, ()
+            if self._retrato[0] != self.offset:
+                self._retrato = (self.offset, tuple(tuple(linha) for linha, _ts in self.linhas.values()))
+            return self._retrato
+
+    def reconciliar(self, ciclo: str, linhas_planilha, lido_desde: float):
+        """
+        Leva o diário ao estado da aba (a fonte da verdade). Entradas do
+        diário (confirmações e remoções) mais novas que lido_desde (início
+        da leitura) são mantidas: a leitura pode ter começado antes da
+        escrita chegar à planilha.
+        Retorna (acrescentadas, removidas).
+        """
+        planilha = {}
+        for r in linhas_planilha:
+            r = [str(x) for x in list(r)[:6]]
+            k = _email_key(r[5]) if len(r) >= 6 else ""
+            if k and k not in planilha:
+                planilha[k] = r
+        with self.lock:
+            self._acompanhar()
+            if self.ciclo > ciclo:
+                return 0, 0           # leitura de um ciclo que o diário já encerrou
+            mesmo_ciclo = self.ciclo == ciclo
+            atual = self.linhas if mesmo_ciclo else {}
+            removidos = self.removidos if mesmo_ciclo else {}
+            removidas = [k for k, (linha, ts) in atual.items()
+                         if ts < lido_desde and planilha.get(k) != linha]
+            acrescentadas = [k for k, linha in planilha.items()
+                             if (k not in atual or k in removidas) and removidos.get(k, 0.0) < lido_desde]
+            for k in removidas:
+                self._registrar({"tipo": EV_REMOVER, "ciclo": ciclo, "email": k, "origem": ORIGEM_PLANILHA})
+            for k in acrescentadas:
+                self._registrar({"tipo": EV_CONFIRMAR, "ciclo": ciclo, "email": k,
+                                 "linha": planilha[k], "origem": ORIGEM_PLANILHA})
+            self.reconciliado = ciclo
+            self.ultima_reconciliacao = (time.time(), len(acrescentadas), len(removidas))
+            return len(acrescentadas), len(removidas)
+
+    def eventos(self, ciclo: str = None, email: str = None) -> list:
+        """Auditoria: todos os eventos (do ciclo/e-mail pedidos), na ordem do arquivo."""
+        email = _email_key(email) if email else None
+        out = []
+        try:
+            with open(self.caminho, encoding="utf-8") as f:
+                for bruta in f:
+                    try:
+                        ev = json.loads(bruta)
+                    except ValueError:
+                        continue
+                    if ciclo and ev.get("ciclo") != ciclo:
+                        continue
+                    if email and ev.get("email") != email:
+                        continue
+                    out.append(ev)
+        except FileNotFoundError:
+            pass
+        return out
@@ -0,0 +1,138 @@
+"""
+Checklist de embarque compartilhado entre conferentes.
+
+As marcações ficam num estado único por rota, visível para todos os
+conferentes da instância. A aba "Embarque" é só de acréscimo: cada
+gravação anexa uma linha por marcação pendente (CICLO, EMAIL, EMBARCOU,
+MARCADO_POR, ATUALIZADO_EM) num único append_rows, sem ler nem reescrever
+linhas existentes. Duas instâncias gravando ao mesmo tempo não disputam
+linha nenhuma; na leitura, vale a última marcação de cada (ciclo, e-mail):
+a de ATUALIZADO_EM mais recente e, no empate, a que está mais abaixo.
+
+As gravações acontecem EMBARQUE_DEBOUNCE_S depois da primeira marcação
+pendente (juntando as que chegarem nesse meio-tempo) e a leitura da aba,
+para trazer o que outras instâncias gravaram, no máximo a cada
+EMBARQUE_SYNC_S.
+"""
+import threading
+import time
+from datetime import datetime
+
+EMBARQUE_HEADERS = ["CICLO", "EMAIL", "EMBARCOU", "MARCADO_POR", "ATUALIZADO_EM"]
+EMBARQUE_DEBOUNCE_S = 3.0
+EMBARQUE_SYNC_S = 5.0
+EMBARQUE_REFRESH_S = 5
+
+FMT_ATUALIZADO_EM = "%d/%m/%Y %H:%M:%S"
+
+
+def _chamar_direto(func, *args, **kwargs):
+    return func(*args, **kwargs)
+
+
+def _instante(s: str) -> datetime:
+    try:
+        return datetime.strptime(str(s).strip(), FMT_ATUALIZADO_EM)
+    except ValueError:
+        return datetime.min
+
+
+def ultimas_marcacoes(rows, ciclo: str) -> dict:
+    """{email_key: (embarcou, marcado_por, atualizado_em)}: a última marcação de cada e-mail no ciclo."""
+    melhor = {}
+    for n, r in enumerate(rows[1:]):
+        r = list(r) + [""] * (5 - len(r))
+        if str(r[0]).strip() != ciclo:
+            continue
+        k = str(r[1]).strip().lower()
+        if not k:
+            continue
+        ordem = (_instante(r[4]), n)
+        if k not in melhor or ordem > melhor[k][0]:
+            melhor[k] = (ordem, (str(r[2]).strip().upper() == "SIM", str(r[3]).strip(), str(r[4]).strip()))
+    return {k: v for k, (_ordem, v) in melhor.items()}
+
+
+class ChecklistEmbarque:
+    """
+    Estado das marcações de uma rota. `chamar` envolve cada chamada ao
+    gspread (no app, gs_call: cota da rota + retry).
+    """
+
+    def __init__(self, chamar=_chamar_direto):
+        self.chamar = chamar
+        self.lock = threading.Lock()
+        self.ciclo = ""
+        self.marcas = {}          # email_key -> (embarcou, marcado_por, atualizado_em)
+        self.pendentes = set()
+        self.gravando = set()     # já tiradas de pendentes, append ainda em andamento
+        self.timer = None
+        self.ultimo_sync = 0.0
+        self.gravacoes = 0
+
+    def _trocar_ciclo(self, ciclo: str):
+        if ciclo != self.ciclo:
+            self.ciclo = ciclo
+            self.marcas = {}
+            self.pendentes = set()
+
+    def _agendar(self, sheet_e, atraso: float):
+        if self.timer is None:
+            self.timer = threading.Timer(atraso, self.gravar, args=(sheet_e,))
+            self.timer.daemon = True
+            self.timer.start()
+
+    def estado(self, ciclo: str) -> dict:
+        with self.lock:
+            self._trocar_ciclo(ciclo)
+            return {k: v[0] for k, v in self.marcas.items()}
+
+    def marcar(self, sheet_e, ciclo: str, email_key: str, embarcou: bool, por: str, quando: datetime):
+        with self.lock:
+            self._trocar_ciclo(ciclo)
+            self.marcas[email_key] = (bool(embarcou), por, quando.strftime(FMT_ATUALIZADO_EM))
+            self.pendentes.add(email_key)
+            self._agendar(sheet_e, EMBARQUE_DEBOUNCE_S)
+
+    def gravar(self, sheet_e):
+        """Anexa uma linha por marcação pendente (um append_rows) e limpa as pendências."""
+        with self.lock:
+            self.timer = None
+            ciclo = self.ciclo
+            lote = {k: self.marcas[k] for k in self.pendentes if k in self.marcas}
+            self.pendentes.clear()
+            self.gravando |= set(lote)
+        if not lote:
+            return
+        try:
+            self.chamar(sheet_e.append_rows,
+                        [[ciclo, k, "SIM" if v[0] else "NAO", v[1], v[2]] for k, v in sorted(lote.items())])
+            with self.lock:
+                self.gravacoes += 1
+        except Exception:
+            with self.lock:
+                if ciclo == self.ciclo:
+                    # devolve para a próxima tentativa (vai a marcação mais recente de cada e-mail)
+                    self.pendentes |= set(lote)
+                    self._agendar(sheet_e, EMBARQUE_DEBOUNCE_S * 2)
+        finally:
+            with self.lock:
+                self.gravando -= set(lote)
+
+    def sincronizar(self, sheet_e, ciclo: str):
+        """Traz marcações de outras instâncias (no máximo 1 leitura a cada EMBARQUE_SYNC_S)."""
+        with self.lock:
+            agora = time.monotonic()
+            if agora - self.ultimo_sync < EMBARQUE_SYNC_S:
+                return
+            self.ultimo_sync = agora
+        try:
+            rows = self.chamar(sheet_e.get_all_values)
+        except Exception:
+            return
+        with self.lock:
+            self._trocar_ciclo(ciclo)
+            # a aba decide; só o que esta instância ainda não gravou fica como está
+            for k, v in ultimas_marcacoes(rows, ciclo).items():
+                if k not in self.pendentes and k not in self.gravando:
+                    self.marcas[k] = v
@@ -0,0 +1,79 @@
+"""
+Exclusões de presença em lote, por rota.
+
+O índice da linha vem da coluna EMAIL lida na hora: o snapshot em cache
+pode estar defasado por exclusões de outras sessões, e apagar pelo índice
+dele removeria a linha de outro militar. Quem pede enquanto um lote está
+sendo gravado entra no próximo; cada lote lê a coluna uma vez e apaga as
+linhas de baixo para cima numa única spreadsheets.batchUpdate
+(deleteDimension), então os índices dentro do lote não se deslocam.
+"""
+import threading
+from concurrent.futures import Future
+
+COL_EMAIL_PRESENCA = 6
+
+
+def _chamar_direto(func, *args, **kwargs):
+    return func(*args, **kwargs)
+
+
+def pedidos_exclusao(sheet_id: int, linhas_0) -> list:
+    """deleteDimension de cada linha (índice 0-based), de baixo para cima."""
+    return [
+        {"deleteDimension": {"range": {"sheetId": sheet_id, "dimension": "ROWS",
+                                       "startIndex": i, "endIndex": i + 1}}}
+        for i in sorted(set(linhas_0), reverse=True)
+    ]
+
+
+class ExclusoesPresenca:
+    """
+    Fila de exclusões de uma rota. `chamar` envolve cada chamada ao gspread
+    (no app, gs_call: cota da rota + retry).
+    """
+
+    def __init__(self, chamar=_chamar_direto):
+        self.chamar = chamar
+        self.lock = threading.Lock()
+        self.pendentes = {}       # email_key -> Future (True = linha apagada)
+        self.gravando = False
+        self.lotes = 0
+
+    def excluir(self, sheet_p, email: str, timeout: float = 60.0) -> bool:
+        """Apaga a linha do e-mail; True se ela existia."""
+        email_key = str(email or "").strip().lower()
+        with self.lock:
+            fut = self.pendentes.get(email_key)
+            if fut is None:
+                fut = self.pendentes[email_key] = Future()
+            lider = not self.gravando
+            self.gravando = True
+        if lider:
+            self._gravar_lotes(sheet_p)
+        return fut.result(timeout=timeout)
+
+    def _gravar_lotes(self, sheet_p):
+        while True:
+            with self.lock:
+                lote, self.pendentes = self.pendentes, {}
+                if not lote:
+                    self.gravando = False
+                    return
+            try:
+                emails_p = self.chamar(sheet_p.col_values, COL_EMAIL_PRESENCA)
+                linhas = {}
+                for idx, em in enumerate(emails_p):
+                    k = str(em).strip().lower()
+                    if idx > 0 and k in lote and k not in linhas:
+                        linhas[k] = idx          # 0-based = linha idx + 1
+                if linhas:
+                    self.chamar(sheet_p.spreadsheet.batch_update,
+                                {"requests": pedidos_exclusao(sheet_p.id, linhas.values())})
+                with self.lock:
+                    self.lotes += 1
+                for k, fut in lote.items():
+                    fut.set_result(k in linhas)
+            except Exception as e:
+                for fut in lote.values():
+                    fut.set_exception(e)
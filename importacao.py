@@ -0,0 +1,113 @@
+"""
+Importação em lote de usuários (CSV/XLSX) para o painel do ADM.
+
+O arquivo vira um DataFrame de texto e cada regra (obrigatórios, e-mail,
+telefone com 11 dígitos, graduação/origem válidas, duplicidade no arquivo
+e na planilha, limite de usuários) é uma máscara booleana sobre a coluna
+inteira, sem laço por linha. As linhas aceitas saem já no layout da aba
+Usuarios, prontas para um único append_rows; as recusadas vão para o
+relatório com todos os motivos de cada linha.
+"""
+import io
+import unicodedata
+
+import pandas as pd
+
+from usuarios import GRADUACOES, ORIGENS
+
+# coluna da aba Usuarios -> nomes aceitos no cabeçalho do arquivo (normalizados)
+COLUNAS_ARQUIVO = {
+    "Nome": ("nome", "nome de escala", "nome_de_escala"),
+    "Graduação": ("graduacao", "grad", "posto"),
+    "Lotação": ("lotacao", "unidade"),
+    "Senha": ("senha",),
+    "QG_RMCF_OUTROS": ("qg_rmcf_outros", "origem"),
+    "Email": ("email", "e-mail"),
+    "TELEFONE": ("telefone", "celular", "tel"),
+}
+
+EMAIL_RE = r"^[^@\s]+@[^@\s]+\.[^@\s]+$"
+
+
+def _normalizar(nome) -> str:
+    s = unicodedata.normalize("NFKD", str(nome)).encode("ascii", "ignore").decode()
+    return s.strip().lower()
+
+
+def ler_arquivo(nome: str, dados: bytes) -> pd.DataFrame:
+    """CSV (separador detectado) ou XLSX -> DataFrame só de texto."""
+    if nome.lower().endswith((".xlsx", ".xls")):
+        df = pd.read_excel(io.BytesIO(dados), dtype=str)   # requer openpyxl
+    else:
+        try:
+            texto = dados.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            texto = dados.decode("latin-1")
+        df = pd.read_csv(io.StringIO(texto), sep=None, engine="python", dtype=str, keep_default_na=False)
+    return df.fillna("")
+
+
+def mapear_colunas(df: pd.DataFrame):
+    """Renomeia para os nomes da aba. Retorna (df, colunas obrigatórias ausentes)."""
+    por_nome = {_normalizar(c): c for c in df.columns}
+    renomear, faltando = {}, []
+    for destino, apelidos in COLUNAS_ARQUIVO.items():
+        origem = next((por_nome[a] for a in (_normalizar(destino),) + apelidos if a in por_nome), None)
+        if origem is None:
+            faltando.append(destino)
+        else:
+            renomear[origem] = destino
+    return df.rename(columns=renomear), faltando
+
+
+def validar_importacao(df: pd.DataFrame, emails_existentes, tels_existentes, vagas_restantes: int,
+                       status: str = "PENDENTE"):
+    """
+    Retorna (linhas para append_rows, relatório). O relatório tem uma
+    linha por linha do arquivo: nº da linha no arquivo, e-mail, situação e
+    motivos.
+    """
+    df, faltando = mapear_colunas(df)
+    if faltando:
+        raise ValueError("Colunas ausentes no arquivo: " + ", ".join(faltando))
+
+    t = {c: df[c].astype(str).str.strip() for c in COLUNAS_ARQUIVO}
+    email = t["Email"].str.lower()
+    tel = t["TELEFONE"].str.replace(r"\D+", "", regex=True)
+    grad = t["Graduação"].str.upper()
+    orig = t["QG_RMCF_OUTROS"].str.upper()
+
+    regras = [(t[c] == "", f"{c} vazio") for c in COLUNAS_ARQUIVO]
+    regras += [
+        ((email != "") & ~email.str.match(EMAIL_RE), "e-mail inválido"),
+        (tel.str.len() != 11, "telefone deve ter 11 dígitos (DDD + 9)"),
+        ((grad != "") & ~grad.isin(GRADUACOES), "graduação fora da lista"),
+        ((orig != "") & ~orig.isin(ORIGENS), "origem deve ser QG, RMCF ou OUTROS"),
+        (email.isin(set(emails_existentes)) & (email != ""), "e-mail já cadastrado"),
+        (tel.isin(set(tels_existentes)) & (tel != ""), "telefone já cadastrado"),
+        (email.duplicated(keep="first") & (email != ""), "e-mail repetido no arquivo"),
+        (tel.duplicated(keep="first") & (tel != ""), "telefone repetido no arquivo"),
+    ]
+    motivos = pd.Series("", index=df.index)
+    for mascara, msg in regras:
+        motivos = motivos.mask(mascara, motivos + msg + "; ")
+
+    # limite de usuários: as primeiras linhas válidas entram, o resto é recusado
+    validas = motivos == ""
+    excede = validas & (validas.cumsum() > max(0, vagas_restantes))
+    motivos = motivos.mask(excede, "limite de usuários atingido; ")
+    aceitas = motivos == ""
+
+    tel_fmt = tel.str.replace(r"^(\d{2})(\d{5})(\d{4})$", r"(\1) \2.\3", regex=True)
+    novas = pd.DataFrame({
+        "Nome": t["Nome"], "Graduação": grad, "Lotação": t["Lotação"], "Senha": t["Senha"],
+        "QG_RMCF_OUTROS": orig, "Email": email, "TELEFONE": tel_fmt, "STATUS": status,
+    })[aceitas]
+
+    relatorio = pd.DataFrame({
+        "linha": df.index + 2,                    # linha 1 = cabeçalho do arquivo
+        "email": email,
+        "situacao": aceitas.map({True: "OK", False: "RECUSADA"}),
+        "motivos": motivos.str.rstrip("; "),
+    })
+    return novas.values.tolist(), relatorio
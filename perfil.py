@@ -0,0 +1,83 @@
+"""
+Perfil por execução do script (rerun): quanto tempo cada fase levou.
+
+Desligado, custa uma checagem de booleano por fase. Ligado (?perf=1 ou
+chave no painel ADM), mede as fases principais, mostra o resumo na tela
+e acrescenta uma linha JSON por execução num arquivo local, para somar
+depois (ex.: pandas.read_json(arquivo, lines=True)).
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+ARQUIVO_PADRAO = "perf_execucoes.jsonl"
+
+# fases medidas no app (ordem de exibição)
+FASE_AUTH = "auth"
+FASE_SNAPSHOT = "snapshot"
+FASE_STATUS = "verificar_status"
+FASE_RANKING = "ranking"
+FASE_HTML = "html"
+FASE_PDF = "pdf"
+FASE_WHATSAPP = "whatsapp"
+FASE_ADMIN_LISTA = "admin_lista"
+
+_lock_arquivo = threading.Lock()
+
+
+def arquivo_perfil() -> str:
+    return os.environ.get("ROTA_PERF_ARQUIVO", ARQUIVO_PADRAO)
+
+
+class PerfilExecucao:
+    def __init__(self, ativo: bool, rota_id: str = "", tela: str = ""):
+        self.ativo = ativo
+        self.rota_id = rota_id
+        self.tela = tela
+        self.t0 = time.perf_counter()
+        self.fases = {}           # nome -> ms (acumulado)
+        self.gravado = False
+
+    @contextmanager
+    def fase(self, nome: str):
+        if not self.ativo:
+            yield
+            return
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.fases[nome] = self.fases.get(nome, 0.0) + (time.perf_counter() - t) * 1000.0
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.t0) * 1000.0
+
+    def resumo(self) -> list:
+        """[(fase, ms)] + resto (widgets/Streamlit) + total."""
+        total = self.total_ms()
+        linhas = list(self.fases.items())
+        linhas.append(("outros", max(0.0, total - sum(self.fases.values()))))
+        linhas.append(("total", total))
+        return linhas
+
+    def gravar(self, caminho: str = None, **extra):
+        """Acrescenta 1 linha JSON (uma vez por execução). Falha de disco não derruba a tela."""
+        if not self.ativo or self.gravado:
+            return
+        self.gravado = True
+        registro = {
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "rota": self.rota_id,
+            "tela": self.tela,
+            "total_ms": round(self.total_ms(), 3),
+            "fases_ms": {k: round(v, 3) for k, v in self.fases.items()},
+        }
+        registro.update(extra)
+        try:
+            with _lock_arquivo, open(caminho or arquivo_perfil(), "a", encoding="utf-8") as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
@@ -0,0 +1,266 @@
+"""
+Modelo compacto da lista de presença (sem pandas).
+
+A lista tem 38 vagas + excedentes (normalmente < 100 linhas), então não
+compensa montar DataFrames a cada rerun. Cada linha da planilha vira uma
+PresenceRow (tupla imutável, sem __dict__), com graduação e origem
+internadas e a chave de ordenação já calculada no parse.
+"""
+import html
+import sys
+from datetime import datetime
+from operator import attrgetter
+from typing import NamedTuple, Optional
+
+VAGAS_PADRAO = 38
+
+CABECALHO_PRESENCA = ("DATA_HORA", "QG_RMCF_OUTROS", "GRADUAÇÃO", "NOME", "LOTAÇÃO", "EMAIL")
+
+# Prioridades (mesma regra de sempre)
+P_ORIGEM = {"QG": 1, "RMCF": 2, "OUTROS": 3}
+
+P_GRAD_NORMAL = {
+    "TCEL": 1, "MAJ": 2, "CAP": 3, "1º TEN": 4, "2º TEN": 5, "SUBTEN": 6,
+    "1º SGT": 7, "2º SGT": 8, "3º SGT": 9, "CB": 10, "SD": 11
+}
+
+# Grupo FC: primeiro FC COM (grupo 1), depois FC TER (grupo 2); demais = 0
+GRUPO_FC = {"FC COM": 1, "FC TER": 2}
+
+FMT_DATA_HORA = "%d/%m/%Y %H:%M:%S"
+
+SPAN_EXCEDENTE = "<span style='color:#d32f2f; font-weight:bold;'>{}</span>"
+
+
+class PresenceRow(NamedTuple):
+    """Uma linha válida da aba de presença (layout do append_row)."""
+    data_hora: str
+    origem: str
+    graduacao: str
+    nome: str
+    lotacao: str
+    email: str
+    email_key: str
+    chave: tuple
+
+
+class ListaPresenca(NamedTuple):
+    """Snapshot já ordenado: cabeçalho, ranking [(Nº, linha)] e índice por e-mail."""
+    cabecalho: tuple
+    ranking: tuple
+    posicoes: dict
+    vagas: int
+
+    @property
+    def inscritos(self) -> int:
+        return len(self.ranking)
+
+    def posicao(self, email: str) -> Optional[int]:
+        """Posição 1-based do e-mail no ranking (ou None)."""
+        i = self.posicoes.get(str(email or "").strip().lower())
+        return None if i is None else i + 1
+
+
+LISTA_VAZIA = ListaPresenca((), (), {}, VAGAS_PADRAO)
+
+
+def _txt(x) -> str:
+    return str(x).strip() if x is not None else ""
+
+
+def _parse_data_hora(s: str) -> Optional[datetime]:
+    try:
+        return datetime.strptime(s, FMT_DATA_HORA)
+    except (TypeError, ValueError):
+        return None
+
+
+def chave_ordenacao(origem: str, graduacao: str, dt: Optional[datetime]) -> tuple:
+    """
+    Ordem final: grupo FC -> origem (QG, RMCF, OUTROS) -> graduação -> quem entrou primeiro.
+    Datas ilegíveis vão para o fim do seu grupo (como o NaT do pandas).
+    """
+    g = graduacao.upper()
+    fc = GRUPO_FC.get(g, 0)
+    p_g = 0 if fc else P_GRAD_NORMAL.get(g, 999)
+    p_o = P_ORIGEM.get(origem.upper(), 99)
+    return (fc, p_o, p_g, dt is None, dt or datetime.min)
+
+
+def parse_linha(r) -> PresenceRow:
+    """Linha crua (DATA, QG_RMCF_OUTROS, GRAD, NOME, LOTAÇÃO, EMAIL) -> PresenceRow."""
+    r = list(r) + [""] * (6 - len(r))
+    data_hora = _txt(r[0])
+    origem = sys.intern(_txt(r[1]))
+    graduacao = sys.intern(_txt(r[2]))
+    email = _txt(r[5])
+    return PresenceRow(
+        data_hora,
+        origem,
+        graduacao,
+        _txt(r[3]),
+        _txt(r[4]),
+        email,
+        email.lower(),
+        chave_ordenacao(origem, graduacao, _parse_data_hora(data_hora)),
+    )
+
+
+class SnapshotPresenca(NamedTuple):
+    """
+    Grade filtrada da aba (cabeçalho + linhas válidas) em tuplas de str.
+    Guardada uma vez por processo e entregue por referência a todas as
+    sessões; `versao` identifica o conteúdo (chave da lista montada).
+    """
+    versao: tuple
+    grade: tuple
+
+    def tem_linhas(self) -> bool:
+        return len(self.grade) > 1
+
+
+SNAPSHOT_VAZIO = SnapshotPresenca((), ())
+
+
+def congelar_grade(dados) -> tuple:
+    return tuple(tuple(str(x) for x in r) for r in dados or ())
+
+
+def rotulo_posicao(i: int, vagas: int = VAGAS_PADRAO) -> str:
+    return str(i + 1) if i < vagas else f"Exc-{i - vagas + 1:02d}"
+
+
+def montar_lista(dados_p_show, vagas: int = VAGAS_PADRAO) -> ListaPresenca:
+    """
+    Recebe a saída de filtrar_linhas_presenca (cabeçalho + linhas) e devolve
+    o snapshot ordenado. Chamado uma vez por snapshot, não por rerun.
+    """
+    if not dados_p_show or len(dados_p_show) < 2:
+        return LISTA_VAZIA._replace(vagas=vagas)
+
+    cabecalho = tuple(_txt(h) for h in dados_p_show[0][:6])
+    linhas = sorted((parse_linha(r) for r in dados_p_show[1:]), key=attrgetter("chave"))
+
+    ranking = tuple((rotulo_posicao(i, vagas), r) for i, r in enumerate(linhas))
+    posicoes = {}
+    for i, r in enumerate(linhas):
+        posicoes.setdefault(r.email_key, i)
+    return ListaPresenca(cabecalho, ranking, posicoes, vagas)
+
+
+# ==========================================================
+# PARTIÇÕES POR CICLO (uma aba por zeragem)
+# ==========================================================
+PREFIXO_PARTICAO = "Presenca_"
+FMT_CICLO = "%Y%m%d_%H%M"
+
+
+def nome_particao(ciclo: str) -> str:
+    """Título da aba do ciclo (id do ciclo = AAAAMMDD_HHMM da zeragem)."""
+    return PREFIXO_PARTICAO + ciclo
+
+
+def ciclo_da_particao(titulo: str) -> Optional[str]:
+    """Id do ciclo de uma aba de partição, ou None se não for uma."""
+    titulo = str(titulo)
+    if not titulo.startswith(PREFIXO_PARTICAO):
+        return None
+    ciclo = titulo[len(PREFIXO_PARTICAO):]
+    try:
+        datetime.strptime(ciclo, FMT_CICLO)
+    except ValueError:
+        return None
+    return ciclo
+
+
+def particoes_vencidas(titulos, ciclo_atual: str, reter: int) -> list:
+    """Partições anteriores ao ciclo atual além das `reter` mais recentes (o id ordena como texto)."""
+    antigas = sorted({c for c in map(ciclo_da_particao, titulos) if c and c < ciclo_atual}, reverse=True)
+    return [nome_particao(c) for c in antigas[max(0, reter):]]
+
+
+# ==========================================================
+# DIFERENÇA ENTRE SNAPSHOTS (promoções / excedentes)
+# ==========================================================
+MUDANCA_PROMOVIDO = "PROMOVIDO"       # saiu do excedente para dentro das vagas
+MUDANCA_EXCEDENTE = "EXCEDENTE"       # saiu das vagas para o excedente
+MUDANCA_POSICAO = "POSICAO"           # mudou de posição na mesma zona
+
+
+class MudancaPosicao(NamedTuple):
+    de: str              # rótulo anterior ("37", "Exc-03")
+    para: str
+    tipo: str
+
+
+def _tipo_mudanca(de: str, para: str) -> str:
+    exc_de, exc_para = de.startswith("Exc-"), para.startswith("Exc-")
+    if exc_de and not exc_para:
+        return MUDANCA_PROMOVIDO
+    if exc_para and not exc_de:
+        return MUDANCA_EXCEDENTE
+    return MUDANCA_POSICAO
+
+
+def diff_ranking(antes: ListaPresenca, depois: ListaPresenca) -> dict:
+    """
+    {email_key: MudancaPosicao} de quem estava nas duas listas e mudou de
+    rótulo. Uma passada em `depois` com busca O(1) em antes.posicoes.
+    """
+    mudancas = {}
+    for j, (rotulo, r) in enumerate(depois.ranking):
+        i = antes.posicoes.get(r.email_key)
+        if i is None or depois.posicoes.get(r.email_key) != j:
+            continue              # novo na lista, ou linha repetida do mesmo e-mail
+        de = antes.ranking[i][0]
+        if de != rotulo:
+            mudancas[r.email_key] = MudancaPosicao(de, rotulo, _tipo_mudanca(de, rotulo))
+    return mudancas
+
+
+def juntar_mudancas(primeira: MudancaPosicao, segunda: MudancaPosicao) -> Optional[MudancaPosicao]:
+    """Duas mudanças seguidas da mesma pessoa -> uma (None se voltou ao lugar)."""
+    if primeira.de == segunda.para:
+        return None
+    return MudancaPosicao(primeira.de, segunda.para, _tipo_mudanca(primeira.de, segunda.para))
+
+
+# ==========================================================
+# SAÍDAS (tela, WhatsApp)
+# ==========================================================
+def render_tabela_html(lista: ListaPresenca, classes: str = "presenca-zebra") -> str:
+    """
+    Tabela da tela: Nº + colunas da planilha (menos EMAIL), NOME em negrito,
+    excedentes em vermelho. Mesmo markup que o DataFrame.to_html gerava.
+    """
+    nomes = list(lista.cabecalho[:5]) or ["DATA_HORA", "QG_RMCF_OUTROS", "GRADUAÇÃO", "NOME", "LOTAÇÃO"]
+    nomes += [""] * (5 - len(nomes))
+    esc = html.escape
+
+    partes = [f'<table border="0" class="dataframe {classes}">', '<thead><tr style="text-align: center;">']
+    partes.append("<th>Nº</th>")
+    partes.extend(f"<th>{esc(h)}</th>" for h in nomes)
+    partes.append("</tr></thead><tbody>")
+
+    for rotulo, r in lista.ranking:
+        exc = rotulo.startswith("Exc-")
+        celulas = (rotulo, r.data_hora, r.origem, r.graduacao, r.nome, r.lotacao)
+        partes.append("<tr>")
+        for j, v in enumerate(celulas):
+            v = esc(v)
+            if exc:
+                v = SPAN_EXCEDENTE.format(v)
+            if j == 4:
+                v = f"<b>{v}</b>"
+            partes.append(f"<td>{v}</td>")
+        partes.append("</tr>")
+
+    partes.append("</tbody></table>")
+    return "".join(partes)
+
+
+def texto_whatsapp(lista: ListaPresenca) -> str:
+    linhas = ["*🚌 LISTA DE PRESENÇA*\n\n"]
+    for rotulo, r in lista.ranking:
+        linhas.append(f"{rotulo}. {r.graduacao} {r.nome} - {r.lotacao}\n")
+    return "".join(linhas)
@@ -0,0 +1,651 @@
+"""
+Emulador local (em processo) do Google Sheets para testes de carga/benchmark.
+
+Implementa o subconjunto da API do gspread (Client / Spreadsheet / Worksheet)
+que o app.py usa, com:
+
+- latência configurável por chamada (fixa ou faixa aleatória com semente);
+- cota de leituras/escritas por minuto (janela deslizante) que levanta o
+  mesmo APIError 429 / RESOURCE_EXHAUSTED do Google, e injeção de 5xx;
+- semântica de linhas da planilha real: append após a última linha com
+  dados (crescendo a grade), delete_rows deslocando as linhas abaixo,
+  resize truncando/estendendo a grade;
+- uma política só para os limites da grade, em leituras e escritas: todo
+  intervalo explícito (get/batch_get/acell/cell/row_values, update/
+  batch_update/update_cell) precisa caber na grade, senão levanta o 400
+  "exceeds grid limits". Intervalos abertos ('A2:D', 'A:D') terminam na
+  borda da grade; get_all_values/col_values leem a grade inteira.
+
+Cada método público conta como UMA requisição à API (como no gspread), o
+que permite medir retry, cache e batching de forma reproduzível, offline.
+
+Uso no app: defina ROTA_SHEETS_EMULADOR=1 (ver cliente_do_ambiente).
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter, deque
+
+from gspread.cell import Cell
+from gspread.exceptions import APIError, SpreadsheetNotFound, WorksheetNotFound
+from gspread.utils import a1_to_rowcol, column_letter_to_index, numericise_all, rowcol_to_a1
+
+CABECALHO_PRESENCA = ["DATA_HORA", "QG_RMCF_OUTROS", "GRADUAÇÃO", "NOME", "LOTAÇÃO", "EMAIL"]
+CABECALHO_USUARIOS = ["Nome", "Graduação", "Lotação", "Senha", "QG_RMCF_OUTROS", "Email", "TELEFONE", "STATUS"]
+
+# Métodos que consomem cota de escrita (o resto é leitura)
+METODOS_ESCRITA = {
+    "update", "update_cell", "batch_update", "append_row", "append_rows", "delete_rows",
+    "resize", "clear", "batch_clear", "add_worksheet", "del_worksheet", "create",
+}
+
+
+class _RespostaEmulada:
+    """O suficiente de requests.Response para construir um gspread APIError."""
+
+    def __init__(self, code: int, message: str, status: str):
+        self.status_code = code
+        self._corpo = {"error": {"code": code, "message": message, "status": status}}
+        self.text = json.dumps(self._corpo)
+
+    def json(self):
+        return self._corpo
+
+
+def erro_api(code: int, message: str, status: str) -> APIError:
+    return APIError(_RespostaEmulada(code, message, status))
+
+
+def erro_cota(tipo: str) -> APIError:
+    nome = "Read requests" if tipo == "leitura" else "Write requests"
+    return erro_api(
+        429,
+        f"Quota exceeded for quota metric '{nome}' and limit '{nome} per minute per user' "
+        "of service 'sheets.googleapis.com' for consumer 'project_number:000000000000'.",
+        "RESOURCE_EXHAUSTED",
+    )
+
+
+def erro_5xx(code: int = 503) -> APIError:
+    msgs = {500: ("Internal error encountered.", "INTERNAL"),
+            502: ("Bad Gateway", "UNAVAILABLE"),
+            503: ("The service is currently unavailable.", "UNAVAILABLE"),
+            504: ("The service timed out.", "DEADLINE_EXCEEDED")}
+    msg, status = msgs.get(code, msgs[503])
+    return erro_api(code, msg, status)
+
+
+# ==========================================================
+# BACKEND (estado + cota + latência, compartilhado pelo cliente)
+# ==========================================================
+class _Backend:
+    def __init__(self, latencia=0.0, leituras_por_minuto=None, escritas_por_minuto=None,
+                 taxa_5xx=0.0, semente=None, relogio=time.monotonic, dormir=time.sleep):
+        self.lock = threading.RLock()
+        self.latencia = latencia
+        self.leituras_por_minuto = leituras_por_minuto
+        self.escritas_por_minuto = escritas_por_minuto
+        self.taxa_5xx = float(taxa_5xx or 0.0)
+        self.rnd = random.Random(semente)
+        self.relogio = relogio
+        self.dormir = dormir
+        self.janelas = {"leitura": deque(), "escrita": deque()}
+        self.planilhas = {}
+        self.zerar_estatisticas()
+
+    def zerar_estatisticas(self):
+        with self.lock:
+            self.chamadas = Counter()
+            self.erros_429 = 0
+            self.erros_5xx = 0
+            self.tempo_total = 0.0
+
+    def requisicao(self, metodo: str):
+        """Aplica latência, falhas injetadas e cota a uma requisição."""
+        tipo = "escrita" if metodo in METODOS_ESCRITA else "leitura"
+        with self.lock:
+            lat = self.latencia
+            if isinstance(lat, (tuple, list)):
+                lat = self.rnd.uniform(float(lat[0]), float(lat[1]))
+            falha = self.taxa_5xx > 0 and self.rnd.random() < self.taxa_5xx
+
+        if lat:
+            self.dormir(lat)
+
+        with self.lock:
+            self.tempo_total += lat or 0.0
+            if falha:
+                self.erros_5xx += 1
+                raise erro_5xx(self.rnd.choice([500, 502, 503, 504]))
+
+            limite = self.leituras_por_minuto if tipo == "leitura" else self.escritas_por_minuto
+            janela = self.janelas[tipo]
+            agora = self.relogio()
+            while janela and agora - janela[0] >= 60.0:
+                janela.popleft()
+            if limite is not None and len(janela) >= limite:
+                self.erros_429 += 1
+                raise erro_cota(tipo)
+            janela.append(agora)
+            self.chamadas[metodo] += 1
+
+    def estatisticas(self) -> dict:
+        with self.lock:
+            return {
+                "chamadas": dict(self.chamadas),
+                "total": sum(self.chamadas.values()),
+                "leituras": sum(v for k, v in self.chamadas.items() if k not in METODOS_ESCRITA),
+                "escritas": sum(v for k, v in self.chamadas.items() if k in METODOS_ESCRITA),
+                "erros_429": self.erros_429,
+                "erros_5xx": self.erros_5xx,
+                "latencia_total_s": round(self.tempo_total, 4),
+            }
+
+
+def _sem_aspas(rng: str) -> str:
+    # "'Aba'!A1:B2" -> "A1:B2"
+    return rng.split("!", 1)[1] if "!" in rng else rng
+
+
+def _ponta(ref: str, eh_fim: bool, max_l: int, max_c: int):
+    """Converte 'A1', 'A' ou '2' em (linha, coluna), abrindo o que faltar."""
+    m = re.fullmatch(r"([A-Za-z]*)(\d*)", ref.strip())
+    if not m or (not m.group(1) and not m.group(2)):
+        raise erro_api(400, f"Unable to parse range: {ref}", "INVALID_ARGUMENT")
+    letras, num = m.group(1), m.group(2)
+    col = column_letter_to_index(letras.upper()) if letras else (max_c if eh_fim else 1)
+    lin = int(num) if num else (max_l if eh_fim else 1)
+    return lin, col
+
+
+# ==========================================================
+# WORKSHEET
+# ==========================================================
+class AbaEmulada:
+    def __init__(self, planilha, titulo: str, linhas: int = 1000, colunas: int = 26, aba_id: int = 0):
+        self._planilha = planilha
+        self._b = planilha._b
+        self.title = titulo
+        self.id = aba_id
+        self.spreadsheet_id = planilha.id
+        self.row_count = int(linhas)
+        self.col_count = int(colunas)
+        self._grade = []  # linhas com dados (strings), sem padding
+
+    @property
+    def spreadsheet(self):
+        return self._planilha
+
+    # ---------- grade ----------
+    def _ultima_linha(self) -> int:
+        for i in range(len(self._grade) - 1, -1, -1):
+            if any(str(v) != "" for v in self._grade[i]):
+                return i + 1
+        return 0
+
+    def _na_grade(self, l, c):
+        """Levanta o 400 da API se a célula (l, c) está fora da grade."""
+        if l > self.row_count or c > self.col_count:
+            raise erro_api(
+                400,
+                f"Range ('{self.title}'!{rowcol_to_a1(l, c)}) exceeds grid limits. "
+                f"Max rows: {self.row_count}, max columns: {self.col_count}",
+                "INVALID_ARGUMENT",
+            )
+
+    def _ler(self, l1, c1, l2, c2):
+        """Valores do retângulo, sem linhas/células vazias no fim (como a API)."""
+        l2 = min(l2, self._ultima_linha(), self.row_count)
+        out = []
+        for i in range(l1 - 1, l2):
+            linha = self._grade[i] if i < len(self._grade) else []
+            vals = [str(linha[j]) if j < len(linha) else "" for j in range(c1 - 1, min(c2, self.col_count))]
+            while vals and vals[-1] == "":
+                vals.pop()
+            out.append(vals)
+        while out and not out[-1]:
+            out.pop()
+        return out
+
+    def _escrever(self, l1, c1, valores):
+        altura = len(valores)
+        largura = max((len(v) for v in valores), default=0)
+        self._na_grade(l1 + altura - 1, c1 + largura - 1)
+        while len(self._grade) < l1 + altura - 1:
+            self._grade.append([])
+        for di, linha in enumerate(valores):
+            alvo = self._grade[l1 - 1 + di]
+            for dj, v in enumerate(linha):
+                j = c1 - 1 + dj
+                while len(alvo) <= j:
+                    alvo.append("")
+                alvo[j] = "" if v is None else str(v)
+
+    def _intervalo(self, rng):
+        rng = _sem_aspas(str(rng))
+        if ":" in rng:
+            a, b = rng.split(":", 1)
+            l1, c1 = _ponta(a, False, self.row_count, self.col_count)
+            l2, c2 = _ponta(b, True, self.row_count, self.col_count)
+        else:
+            l1, c1 = a1_to_rowcol(rng.upper())
+            l2, c2 = l1, c1
+        self._na_grade(max(l1, l2), max(c1, c2))
+        return l1, c1, l2, c2
+
+    def _todos(self):
+        vals = self._ler(1, 1, self.row_count, self.col_count)
+        largura = max((len(v) for v in vals), default=0)
+        return [v + [""] * (largura - len(v)) for v in vals]
+
+    # ---------- leituras ----------
+    def get_all_values(self, **_kw):
+        self._b.requisicao("get_all_values")
+        with self._b.lock:
+            return self._todos()
+
+    def get_values(self, range_name=None, **_kw):
+        if range_name:
+            return self.get(range_name)
+        return self.get_all_values()
+
+    def get_all_records(self, head: int = 1, default_blank="", numericise_ignore=(), **_kw):
+        self._b.requisicao("get_all_records")
+        with self._b.lock:
+            dados = self._todos()
+        if not dados or len(dados) < head:
+            return []
+        chaves = dados[head - 1]
+        ignorar = list(numericise_ignore)
+        out = []
+        for linha in dados[head:]:
+            if ignorar == ["all"]:
+                vals = linha
+            else:
+                vals = numericise_all(linha, default_blank=default_blank, ignore=ignorar)
+            out.append(dict(zip(chaves, vals)))
+        return out
+
+    def row_values(self, row: int, **_kw):
+        self._b.requisicao("row_values")
+        with self._b.lock:
+            self._na_grade(row, 1)
+            vals = self._ler(row, 1, row, self.col_count)
+        return vals[0] if vals else []
+
+    def col_values(self, col: int, **_kw):
+        self._b.requisicao("col_values")
+        with self._b.lock:
+            vals = self._ler(1, col, self.row_count, col)
+        return [v[0] if v else "" for v in vals]
+
+    def get(self, range_name=None, **_kw):
+        self._b.requisicao("get")
+        with self._b.lock:
+            if not range_name:
+                return self._todos()
+            return self._ler(*self._intervalo(range_name))
+
+    def batch_get(self, ranges, **_kw):
+        self._b.requisicao("batch_get")
+        with self._b.lock:
+            return [self._ler(*self._intervalo(r)) for r in ranges]
+
+    def acell(self, label: str, **_kw):
+        self._b.requisicao("acell")
+        l, c = a1_to_rowcol(_sem_aspas(label).upper())
+        with self._b.lock:
+            self._na_grade(l, c)
+            vals = self._ler(l, c, l, c)
+        return Cell(l, c, vals[0][0] if vals and vals[0] else "")
+
+    def cell(self, row: int, col: int, **_kw):
+        self._b.requisicao("cell")
+        with self._b.lock:
+            self._na_grade(row, col)
+            vals = self._ler(row, col, row, col)
+        return Cell(row, col, vals[0][0] if vals and vals[0] else "")
+
+    def find(self, query, in_row=None, in_column=None, case_sensitive=True):
+        self._b.requisicao("find")
+        with self._b.lock:
+            dados = self._todos()
+        for i, linha in enumerate(dados):
+            if in_row is not None and i + 1 != in_row:
+                continue
+            for j, v in enumerate(linha):
+                if in_column is not None and j + 1 != in_column:
+                    continue
+                if isinstance(query, re.Pattern):
+                    ok = bool(query.search(v))
+                elif case_sensitive:
+                    ok = v == query
+                else:
+                    ok = v.lower() == str(query).lower()
+                if ok:
+                    return Cell(i + 1, j + 1, v)
+        return None
+
+    # ---------- escritas ----------
+    def update(self, values=None, range_name=None, **kw):
+        # aceita a ordem antiga update("A1", [[...]]) como o gspread
+        if isinstance(values, str) and not isinstance(range_name, str):
+            values, range_name = range_name, values
+        values = kw.get("values", values)
+        range_name = kw.get("range_name", range_name) or "A1"
+        self._b.requisicao("update")
+        with self._b.lock:
+            l1, c1, _l2, _c2 = self._intervalo(range_name)
+            self._escrever(l1, c1, [list(v) for v in values])
+        return {"updatedRange": f"{self.title}!{range_name}"}
+
+    def batch_update(self, data, **_kw):
+        self._b.requisicao("batch_update")
+        with self._b.lock:
+            for item in data:
+                l1, c1, _l2, _c2 = self._intervalo(item["range"])
+                self._escrever(l1, c1, [list(v) for v in item["values"]])
+        return {"totalUpdatedRanges": len(data)}
+
+    def update_cell(self, row: int, col: int, value):
+        self._b.requisicao("update_cell")
+        with self._b.lock:
+            self._escrever(row, col, [[value]])
+
+    def _anexar(self, linhas):
+        inicio = self._ultima_linha() + 1
+        fim = inicio + len(linhas) - 1
+        if fim > self.row_count:
+            self.row_count = fim
+        largura = max((len(v) for v in linhas), default=0)
+        if largura > self.col_count:
+            self.col_count = largura
+        self._escrever(inicio, 1, [list(v) for v in linhas])
+        return {"updates": {"updatedRange": f"{self.title}!A{inicio}:{rowcol_to_a1(fim, largura)}"}}
+
+    def append_row(self, values, **_kw):
+        self._b.requisicao("append_row")
+        with self._b.lock:
+            return self._anexar([values])
+
+    def append_rows(self, values, **_kw):
+        self._b.requisicao("append_rows")
+        with self._b.lock:
+            return self._anexar(list(values))
+
+    def _apagar_linhas(self, start_index: int, end_index: int):
+        """Linhas 1-based [start_index, end_index] (chamar com o lock)."""
+        n = end_index - start_index + 1
+        if start_index < 1 or end_index > self.row_count or n < 1:
+            raise erro_api(400, "Invalid requests[0].deleteDimension: index out of range", "INVALID_ARGUMENT")
+        if n >= self.row_count:
+            raise erro_api(400, "Invalid requests[0].deleteDimension: You can't delete all the rows on the sheet.",
+                           "INVALID_ARGUMENT")
+        del self._grade[start_index - 1:end_index]
+        self.row_count -= n
+
+    def delete_rows(self, start_index: int, end_index=None):
+        self._b.requisicao("delete_rows")
+        with self._b.lock:
+            self._apagar_linhas(start_index, end_index or start_index)
+
+    def resize(self, rows=None, cols=None):
+        self._b.requisicao("resize")
+        with self._b.lock:
+            if rows is not None:
+                self.row_count = int(rows)
+                del self._grade[self.row_count:]
+            if cols is not None:
+                self.col_count = int(cols)
+                for linha in self._grade:
+                    del linha[self.col_count:]
+
+    def clear(self):
+        self._b.requisicao("clear")
+        with self._b.lock:
+            self._grade = []
+
+    def batch_clear(self, ranges):
+        self._b.requisicao("batch_clear")
+        with self._b.lock:
+            for r in ranges:
+                l1, c1, l2, c2 = self._intervalo(r)
+                for i in range(l1 - 1, min(l2, len(self._grade))):
+                    linha = self._grade[i]
+                    for j in range(c1 - 1, min(c2, len(linha))):
+                        linha[j] = ""
+
+
+# ==========================================================
+# SPREADSHEET
+# ==========================================================
+class PlanilhaEmulada:
+    def __init__(self, backend, titulo: str):
+        self._b = backend
+        self.id = uuid.uuid4().hex
+        self.title = titulo
+        self._abas = []
+        self._prox_id = 0
+
+    def _nova_aba(self, titulo, linhas=1000, colunas=26):
+        aba = AbaEmulada(self, titulo, linhas, colunas, aba_id=self._prox_id)
+        self._prox_id += 1
+        self._abas.append(aba)
+        return aba
+
+    @property
+    def sheet1(self):
+        self._b.requisicao("fetch_sheet_metadata")
+        with self._b.lock:
+            return self._abas[0]
+
+    def worksheets(self, **_kw):
+        self._b.requisicao("fetch_sheet_metadata")
+        with self._b.lock:
+            return list(self._abas)
+
+    def worksheet(self, title: str):
+        self._b.requisicao("fetch_sheet_metadata")
+        with self._b.lock:
+            for a in self._abas:
+                if a.title == title:
+                    return a
+        raise WorksheetNotFound(title)
+
+    def get_worksheet(self, index: int):
+        self._b.requisicao("fetch_sheet_metadata")
+        with self._b.lock:
+            return self._abas[index] if 0 <= index < len(self._abas) else None
+
+    def add_worksheet(self, title: str, rows, cols, index=None):
+        self._b.requisicao("add_worksheet")
+        with self._b.lock:
+            if any(a.title == title for a in self._abas):
+                raise erro_api(400, f'Invalid requests[0].addSheet: A sheet with the name "{title}" already exists. '
+                                    "Please enter another name.", "INVALID_ARGUMENT")
+            aba = self._nova_aba(title, int(rows), int(cols))
+            if index is not None:
+                self._abas.remove(aba)
+                self._abas.insert(int(index), aba)
+            return aba
+
+    def del_worksheet(self, worksheet):
+        self._b.requisicao("del_worksheet")
+        with self._b.lock:
+            if len(self._abas) <= 1:
+                raise erro_api(400, "Invalid requests[0].deleteSheet: You can't remove all the sheets in a document.",
+                               "INVALID_ARGUMENT")
+            self._abas = [a for a in self._abas if a.id != worksheet.id]
+
+    def batch_update(self, body):
+        """Suporta addSheet / deleteSheet / deleteDimension (ROWS) do spreadsheets.batchUpdate."""
+        self._b.requisicao("batch_update")
+        respostas = []
+        with self._b.lock:
+            for req in body.get("requests", []):
+                if "deleteSheet" in req:
+                    sid = int(req["deleteSheet"]["sheetId"])
+                    self._abas = [a for a in self._abas if a.id != sid]
+                    respostas.append({})
+                elif "addSheet" in req:
+                    props = req["addSheet"].get("properties", {})
+                    grid = props.get("gridProperties", {})
+                    aba = self._nova_aba(props["title"], grid.get("rowCount", 1000), grid.get("columnCount", 26))
+                    respostas.append({"addSheet": {"properties": {"sheetId": aba.id, "title": aba.title}}})
+                elif "deleteDimension" in req:
+                    rng = req["deleteDimension"]["range"]
+                    if rng.get("dimension", "ROWS") != "ROWS":
+                        raise erro_api(400, "Unsupported deleteDimension: only ROWS", "INVALID_ARGUMENT")
+                    aba = next((a for a in self._abas if a.id == int(rng["sheetId"])), None)
+                    if aba is None:
+                        raise erro_api(400, f"No grid with id: {rng['sheetId']}", "INVALID_ARGUMENT")
+                    # índices da API: 0-based, fim exclusivo
+                    aba._apagar_linhas(int(rng["startIndex"]) + 1, int(rng["endIndex"]))
+                    respostas.append({})
+                else:
+                    raise erro_api(400, f"Unsupported request: {list(req)}", "INVALID_ARGUMENT")
+        return {"spreadsheetId": self.id, "replies": respostas}
+
+
+# ==========================================================
+# CLIENT
+# ==========================================================
+class ClienteEmulado:
+    """
+    Substituto do gspread.Client.
+
+    :param latencia: segundos por chamada, ou (min, max) sorteado com `semente`
+    :param leituras_por_minuto / escritas_por_minuto: cota (None = sem limite)
+    :param taxa_5xx: probabilidade de cada chamada falhar com 500/502/503/504
+    :param criar_ao_abrir: open() de planilha inexistente cria o layout da rota
+    """
+
+    def __init__(self, latencia=0.0, leituras_por_minuto=None, escritas_por_minuto=None,
+                 taxa_5xx=0.0, semente=None, criar_ao_abrir=False, relogio=time.monotonic, dormir=time.sleep):
+        self._b = _Backend(latencia, leituras_por_minuto, escritas_por_minuto, taxa_5xx, semente, relogio, dormir)
+        self.criar_ao_abrir = criar_ao_abrir
+
+    def configurar(self, **kw):
+        with self._b.lock:
+            for k in ("latencia", "leituras_por_minuto", "escritas_por_minuto", "taxa_5xx"):
+                if k in kw:
+                    setattr(self._b, k, kw[k])
+            if "semente" in kw:
+                self._b.rnd = random.Random(kw["semente"])
+            if "criar_ao_abrir" in kw:
+                self.criar_ao_abrir = kw["criar_ao_abrir"]
+
+    def set_timeout(self, timeout=None):
+        pass
+
+    def estatisticas(self) -> dict:
+        return self._b.estatisticas()
+
+    def zerar_estatisticas(self):
+        self._b.zerar_estatisticas()
+        with self._b.lock:
+            for j in self._b.janelas.values():
+                j.clear()
+
+    def create(self, title: str, folder_id=None):
+        self._b.requisicao("create")
+        with self._b.lock:
+            doc = PlanilhaEmulada(self._b, title)
+            doc._nova_aba("Página1")
+            self._b.planilhas[doc.id] = doc
+            return doc
+
+    def open(self, title: str, folder_id=None):
+        self._b.requisicao("open")
+        with self._b.lock:
+            for doc in self._b.planilhas.values():
+                if doc.title == title:
+                    return doc
+            if not self.criar_ao_abrir:
+                raise SpreadsheetNotFound(title)
+        return semear_rota(self, title)
+
+    def open_by_key(self, key: str):
+        self._b.requisicao("open_by_key")
+        with self._b.lock:
+            if key in self._b.planilhas:
+                return self._b.planilhas[key]
+        raise SpreadsheetNotFound(key)
+
+
+def semear_rota(cliente: ClienteEmulado, titulo: str, usuarios=(), presencas=(), limite=100):
+    """
+    Cria (sem consumir cota) uma planilha no layout do app: aba de presença
+    (sheet1), Usuarios e Config. `usuarios` segue CABECALHO_USUARIOS e
+    `presencas` segue CABECALHO_PRESENCA.
+    """
+    b = cliente._b
+    with b.lock:
+        for doc_id, doc in list(b.planilhas.items()):
+            if doc.title == titulo:
+                del b.planilhas[doc_id]
+        doc = PlanilhaEmulada(b, titulo)
+        p = doc._nova_aba("Lista", 100, 26)
+        p._escrever(1, 1, [CABECALHO_PRESENCA] + [list(r) for r in presencas])
+        u = doc._nova_aba("Usuarios", max(1000, len(usuarios) + 1), 26)
+        u._escrever(1, 1, [CABECALHO_USUARIOS] + [list(r) for r in usuarios])
+        c = doc._nova_aba("Config", 10, 5)
+        c._escrever(1, 1, [["LIMITE"], [str(limite)]])
+        b.planilhas[doc.id] = doc
+        return doc
+
+
+# ==========================================================
+# INSTÂNCIA DO PROCESSO
+# ==========================================================
+_CLIENTE = None
+_CLIENTE_LOCK = threading.Lock()
+
+
+def cliente_compartilhado(**config) -> ClienteEmulado:
+    """Um emulador por processo (o app e o harness de carga enxergam o mesmo)."""
+    global _CLIENTE
+    with _CLIENTE_LOCK:
+        if _CLIENTE is None:
+            _CLIENTE = ClienteEmulado(**config)
+        elif config:
+            _CLIENTE.configurar(**config)
+        return _CLIENTE
+
+
+def cliente_do_ambiente() -> ClienteEmulado:
+    """
+    Configuração por variáveis de ambiente:
+      ROTA_EMULADOR_LATENCIA_MS   "80" ou "40-120"
+      ROTA_EMULADOR_LEITURAS_MIN  cota de leitura por minuto (padrão 60, 0 = sem limite)
+      ROTA_EMULADOR_ESCRITAS_MIN  cota de escrita por minuto (padrão 60, 0 = sem limite)
+      ROTA_EMULADOR_TAXA_5XX      ex.: "0.02"
+      ROTA_EMULADOR_SEMENTE       semente do sorteio de latência/falhas
+
+    Se o emulador já foi criado (ex.: pelo harness de carga), é devolvido
+    como está.
+    """
+    with _CLIENTE_LOCK:
+        if _CLIENTE is not None:
+            return _CLIENTE
+    lat = os.environ.get("ROTA_EMULADOR_LATENCIA_MS", "0")
+    if "-" in lat:
+        lo, hi = lat.split("-", 1)
+        latencia = (float(lo) / 1000.0, float(hi) / 1000.0)
+    else:
+        latencia = float(lat or 0) / 1000.0
+    leit = int(os.environ.get("ROTA_EMULADOR_LEITURAS_MIN", "60"))
+    escr = int(os.environ.get("ROTA_EMULADOR_ESCRITAS_MIN", "60"))
+    semente = os.environ.get("ROTA_EMULADOR_SEMENTE")
+    return cliente_compartilhado(
+        latencia=latencia,
+        leituras_por_minuto=leit or None,
+        escritas_por_minuto=escr or None,
+        taxa_5xx=float(os.environ.get("ROTA_EMULADOR_TAXA_5XX", "0") or 0),
+        semente=int(semente) if semente else None,
+        criar_ao_abrir=True,
+    )
@@ -0,0 +1,96 @@
+import gzip
+import os
+import stat
+import threading
+import time
+
+import cache_disco
+from cache_disco import CacheDisco
+
+
+def caminho(tmp_path):
+    return str(tmp_path / "rota" / "principal.json.gz")
+
+
+def test_partida_a_frio_le_o_que_foi_salvo(tmp_path):
+    c = CacheDisco(caminho(tmp_path), "principal")
+    c.guardar("limite", 150)
+    c.guardar("presenca", [["DATA_HORA"], ["19/10/2026 18:00:00"]])
+
+    novo = CacheDisco(caminho(tmp_path), "principal")
+    assert novo.obter("limite") == 150
+    assert novo.obter("presenca", valido_desde=time.time() - 60) == [["DATA_HORA"], ["19/10/2026 18:00:00"]]
+    assert novo.obter("presenca", valido_desde=time.time() + 60) is None
+
+
+def test_arquivo_so_do_dono(tmp_path):
+    c = CacheDisco(caminho(tmp_path), "principal")
+    c.guardar("limite", 150)
+    assert stat.S_IMODE(os.stat(caminho(tmp_path)).st_mode) == 0o600
+
+
+def test_outra_rota_ou_arquivo_corrompido_e_ignorado(tmp_path):
+    CacheDisco(caminho(tmp_path), "principal").guardar("limite", 150)
+    assert CacheDisco(caminho(tmp_path), "outra").obter("limite") is None
+
+    with open(caminho(tmp_path), "wb") as f:
+        f.write(b"lixo")
+    c = CacheDisco(caminho(tmp_path), "principal")
+    assert c.obter("limite") is None
+    assert c.erro_leitura
+
+
+def test_leitura_igual_nao_regrava(tmp_path):
+    c = CacheDisco(caminho(tmp_path), "principal")
+    c.guardar("limite", 150)
+    c.guardar("limite", 150)
+    c.guardar("limite", 151)
+    assert (c.gravacoes, c.evitadas) == (2, 1)
+
+
+def test_gravacao_fora_do_lock_e_geracao_mais_nova_vence(tmp_path, monkeypatch):
+    c = CacheDisco(caminho(tmp_path), "principal")
+    gravar_original = c._gravar
+    dentro = threading.Event()
+    soltar = threading.Event()
+
+    def gravar_lento(doc):
+        if doc["conjuntos"]["limite"]["valor"] == 1:
+            dentro.set()
+            soltar.wait(5)
+        return gravar_original(doc)
+
+    monkeypatch.setattr(c, "_gravar", gravar_lento)
+    lenta = threading.Thread(target=c.guardar, args=("limite", 1))
+    lenta.start()
+    assert dentro.wait(5)
+    # com a primeira gravação parada no disco, o lock dos dados está livre
+    assert c.lock.acquire(timeout=1)
+    c.lock.release()
+    assert c.obter("limite") is None  # já revalidado
+
+    rapida = threading.Thread(target=c.guardar, args=("limite", 2))
+    rapida.start()
+    soltar.set()
+    lenta.join(5)
+    rapida.join(5)
+
+    assert CacheDisco(caminho(tmp_path), "principal").obter("limite") == 2
+
+
+def test_disco_somente_leitura_nao_quebra(tmp_path, monkeypatch):
+    def falhar(*a, **k):
+        raise OSError("somente leitura")
+
+    monkeypatch.setattr(cache_disco.os, "open", falhar)
+    c = CacheDisco(caminho(tmp_path), "principal")
+    c.guardar("limite", 150)
+    assert c.gravacoes == 0
+    assert not os.path.exists(caminho(tmp_path))
+    assert not any(n.endswith(".tmp") for n in os.listdir(os.path.dirname(caminho(tmp_path))))
+
+
+def test_formato_e_gzip(tmp_path):
+    CacheDisco(caminho(tmp_path), "principal").guardar("limite", 150)
+    with gzip.open(caminho(tmp_path), "rt", encoding="utf-8") as f:
+        assert '"versao":1' in f.read()
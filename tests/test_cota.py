@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+from gspread.exceptions import APIError
+
+from cota import COTA_ESCRITA, COTA_LEITURA, CotaRota, chamar_com_cota, tipo_da_chamada
+from sheets_emulador import ClienteEmulado, erro_api, erro_cota, semear_rota
+
+
+def test_tipo_da_chamada():
+    class Aba:
+        def append_row(self):
+            pass
+
+        def get_all_values(self):
+            pass
+
+    assert tipo_da_chamada(Aba().append_row) == COTA_ESCRITA
+    assert tipo_da_chamada(Aba().get_all_values) == COTA_LEITURA
+
+
+def test_balde_vazio_espera_o_token_e_conta_a_chamada():
+    cota = CotaRota(leituras_min=60, escritas_min=60)      # 1 token/s
+    for _ in range(60):
+        assert cota.tomar(COTA_LEITURA) is False
+    t0 = time.monotonic()
+    assert cota.tomar(COTA_LEITURA) is True
+    assert time.monotonic() - t0 >= 0.5
+    assert (cota.chamadas, cota.esperas) == (61, 1)
+    # o balde de escrita é separado
+    assert cota.tomar(COTA_ESCRITA) is False
+
+
+def test_rota_inundada_nao_consome_a_cota_das_outras():
+    # cota do "projeto" (emulador): 10 leituras/min, metade para cada rota
+    cliente = ClienteEmulado(leituras_por_minuto=10)
+    aba_a = semear_rota(cliente, "RotaA")._abas[0]
+    aba_b = semear_rota(cliente, "RotaB")._abas[0]
+    cota_a, cota_b = CotaRota(5, 5), CotaRota(5, 5)
+
+    feitas_a = []
+
+    def inundar():
+        feitas_a.append(chamar_com_cota(cota_a, aba_a.acell, "A1"))
+
+    for _ in range(30):
+        threading.Thread(target=inundar, daemon=True).start()
+    time.sleep(0.5)
+    assert len(feitas_a) == 5               # o resto da rota A está na fila dela
+
+    t0 = time.monotonic()
+    for _ in range(5):
+        assert chamar_com_cota(cota_b, aba_b.acell, "A1").value == "DATA_HORA"
+    assert time.monotonic() - t0 < 1.0      # a rota B não esperou pela A
+    assert cliente.estatisticas()["erros_429"] == 0
+    assert cota_b.esperas == 0
+
+
+def test_429_recua_e_penaliza_so_o_tipo_da_chamada():
+    respostas = [erro_cota("leitura"), "ok"]
+
+    def get_all_values():
+        r = respostas.pop(0)
+        if isinstance(r, Exception):
+            raise r
+        return r
+
+    cota = CotaRota(6000, 6000)
+    t0 = time.monotonic()
+    assert chamar_com_cota(cota, get_all_values) == "ok"
+    assert time.monotonic() - t0 >= 0.6     # recuou antes de repetir
+    assert cota.tokens[COTA_ESCRITA] > 1.0
+    cota.penalizar(COTA_LEITURA, 10.0)
+    assert cota.tokens[COTA_LEITURA] < 0 < cota.tokens[COTA_ESCRITA]
+
+
+def test_erro_que_nao_e_cota_nao_repete():
+    chamadas = []
+
+    def update():
+        chamadas.append(1)
+        raise erro_api(400, "Unable to parse range: X", "INVALID_ARGUMENT")
+
+    with pytest.raises(APIError, match="Unable to parse range"):
+        chamar_com_cota(CotaRota(60, 60), update)
+    assert len(chamadas) == 1
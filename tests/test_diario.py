@@ -0,0 +1,159 @@
+import os
+import stat
+import threading
+import time
+
+import diario
+from diario import ORIGEM_PLANILHA, DiarioPresenca
+
+CICLO = "20261019_1900"
+
+
+def linha(n):
+    return ["19/10/2026 19:00:%02d" % n, "QG", "CB", f"MILITAR {n}", "1BPM", f"m{n}@x.com"]
+
+
+def novo(tmp_path):
+    return DiarioPresenca(str(tmp_path / "diario" / "rota.jsonl"), "rota")
+
+
+def emails(d, ciclo=CICLO):
+    return [r[5] for r in d.retrato(ciclo)[1]]
+
+
+def passar_o_tempo():
+    # os carimbos dos eventos vêm de time.time(): garante um instante novo
+    t = time.time()
+    while time.time() <= t:
+        time.sleep(0.001)
+
+
+def test_replay_refaz_o_ciclo_na_ordem_de_chegada(tmp_path):
+    d = novo(tmp_path)
+    for n in range(4):
+        d.confirmar(CICLO, linha(n))
+    d.remover(CICLO, "M1@X.COM")
+    d.confirmar(CICLO, linha(1))          # voltou: vai para o fim
+    assert emails(novo(tmp_path)) == ["m0@x.com", "m2@x.com", "m3@x.com", "m1@x.com"]
+
+
+def test_checkpoint_e_acompanhamento_de_outro_processo(tmp_path, monkeypatch):
+    monkeypatch.setattr(diario, "CHECKPOINT_EVENTOS", 3)
+    a = novo(tmp_path)
+    for n in range(5):
+        a.confirmar(CICLO, linha(n))
+    assert os.path.exists(a.caminho_checkpoint)
+
+    b = novo(tmp_path)                    # parte do checkpoint e lê só o resto
+    assert b.offset > 0
+    assert emails(b) == [f"m{n}@x.com" for n in range(5)]
+    a.remover(CICLO, "m0@x.com")          # escrito pelo "outro processo"
+    assert emails(b) == [f"m{n}@x.com" for n in range(1, 5)]
+
+
+def test_linha_truncada_e_ignorada(tmp_path):
+    d = novo(tmp_path)
+    d.confirmar(CICLO, linha(0))
+    with open(d.caminho, "ab") as f:
+        f.write(b'{"tipo":"confirmar","ciclo":"2026')   # escrita interrompida
+    d2 = novo(tmp_path)
+    assert emails(d2) == ["m0@x.com"]
+
+
+def test_reset_e_evento_atrasado_de_ciclo_encerrado(tmp_path):
+    d = novo(tmp_path)
+    d.confirmar(CICLO, linha(0))
+    d.reset("20261020_1900")
+    d.confirmar(CICLO, linha(1))          # chegou atrasado
+    assert emails(d, "20261020_1900") == []
+    assert emails(d, CICLO) == []
+
+
+def test_reconciliar_segue_a_planilha_para_o_que_e_anterior_a_leitura(tmp_path):
+    d = novo(tmp_path)
+    d.confirmar(CICLO, linha(0))
+    d.confirmar(CICLO, linha(1))
+    d.remover(CICLO, "m2@x.com")
+    passar_o_tempo()
+    lido_desde = time.time()
+    # a aba não tem m1 (apagado por fora) e tem m2 e m3 (escritos por fora)
+    assert d.reconciliar(CICLO, [linha(0), linha(2), linha(3)], lido_desde) == (2, 1)
+    assert emails(d) == ["m0@x.com", "m2@x.com", "m3@x.com"]
+    assert d.sincronizado(CICLO)
+    origens = {ev["email"]: ev["origem"] for ev in d.eventos(CICLO) if ev["tipo"] == "confirmar"}
+    assert origens["m3@x.com"] == ORIGEM_PLANILHA
+
+
+def test_reconciliar_mantem_escritas_que_cruzaram_a_leitura(tmp_path):
+    d = novo(tmp_path)
+    d.confirmar(CICLO, linha(0))
+    passar_o_tempo()
+    lido_desde = time.time()              # a leitura da aba começa aqui...
+    d.confirmar(CICLO, linha(1))          # ...uma confirmação chega durante ela
+    d.remover(CICLO, "m0@x.com")          # ...e uma exclusão também
+    # a aba lida ainda tem m0 e ainda não tem m1
+    assert d.reconciliar(CICLO, [linha(0)], lido_desde) == (0, 0)
+    assert emails(d) == ["m1@x.com"]
+
+
+def test_reconciliar_com_confirmacoes_e_exclusoes_concorrentes(tmp_path):
+    a = novo(tmp_path)
+    b = novo(tmp_path)                    # outro processo no mesmo volume
+    planilha = [linha(n) for n in range(10)]
+    for r in planilha:
+        a.confirmar(CICLO, r)
+    passar_o_tempo()
+    lido_desde = time.time()
+    retrato = [list(r) for r in planilha]  # o que a leitura da aba devolveu
+
+    largada = threading.Barrier(3)
+
+    def confirmar():
+        largada.wait()
+        for n in range(10, 15):
+            b.confirmar(CICLO, linha(n))
+
+    def remover():
+        largada.wait()
+        for n in range(0, 10, 2):
+            b.remover(CICLO, f"m{n}@x.com")
+
+    def reconciliar():
+        largada.wait()
+        a.reconciliar(CICLO, retrato, lido_desde)
+
+    threads = [threading.Thread(target=f) for f in (confirmar, remover, reconciliar)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+
+    esperado = {f"m{n}@x.com" for n in range(1, 10, 2)} | {f"m{n}@x.com" for n in range(10, 15)}
+    assert set(emails(a)) == esperado
+    assert set(emails(novo(tmp_path))) == esperado
+
+
+def test_leitura_de_ciclo_ja_encerrado_nao_mexe_no_diario(tmp_path):
+    d = novo(tmp_path)
+    d.reset("20261020_1900")
+    assert d.reconciliar(CICLO, [linha(0)], time.time()) == (0, 0)
+    assert emails(d, "20261020_1900") == []
+
+
+def test_arquivos_so_do_dono(tmp_path, monkeypatch):
+    monkeypatch.setattr(diario, "CHECKPOINT_EVENTOS", 1)
+    d = novo(tmp_path)
+    d.confirmar(CICLO, linha(0))
+    for caminho in (d.caminho, d.caminho_checkpoint):
+        assert stat.S_IMODE(os.stat(caminho).st_mode) == 0o600
+
+
+def test_retrato_e_o_mesmo_objeto_enquanto_o_diario_nao_muda(tmp_path):
+    d = novo(tmp_path)
+    d.confirmar(CICLO, linha(0))
+    primeiro = d.retrato(CICLO)
+    assert d.retrato(CICLO) is primeiro
+    d.confirmar(CICLO, linha(1))
+    segundo = d.retrato(CICLO)
+    assert segundo[0] > primeiro[0]
+    assert [r[5] for r in segundo[1]] == ["m0@x.com", "m1@x.com"]
@@ -0,0 +1,96 @@
+import threading
+from datetime import datetime, timedelta
+
+from embarque import EMBARQUE_HEADERS, ChecklistEmbarque, ultimas_marcacoes
+from sheets_emulador import ClienteEmulado, semear_rota
+
+CICLO = "20261019_1850"
+T0 = datetime(2026, 10, 19, 18, 40, 0)
+
+
+def aba_embarque():
+    doc = semear_rota(ClienteEmulado(), "ListaPresenca")
+    aba = doc.add_worksheet(title="Embarque", rows=3, cols=5)
+    aba.update(values=[EMBARQUE_HEADERS], range_name="A1")
+    return aba
+
+
+def marcar_sem_timer(checklist, aba, email, embarcou, por, quando):
+    checklist.marcar(aba, CICLO, email, embarcou, por, quando)
+    checklist.timer.cancel()
+    checklist.timer = None
+
+
+def test_duas_instancias_gravando_juntas_nao_perdem_marcacao():
+    aba = aba_embarque()
+    a, b = ChecklistEmbarque(), ChecklistEmbarque()
+    for i in range(5):
+        marcar_sem_timer(a, aba, f"a{i}@x.com", True, "CONF A", T0)
+        marcar_sem_timer(b, aba, f"b{i}@x.com", True, "CONF B", T0)
+    # a mesma pessoa marcada nas duas instâncias: vale a mais recente (B)
+    marcar_sem_timer(a, aba, "a0@x.com", True, "CONF A", T0 + timedelta(seconds=1))
+    marcar_sem_timer(b, aba, "a0@x.com", False, "CONF B", T0 + timedelta(seconds=2))
+
+    largada = threading.Barrier(2)
+
+    def gravar(checklist):
+        largada.wait()
+        checklist.gravar(aba)
+
+    threads = [threading.Thread(target=gravar, args=(c,)) for c in (a, b)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    linhas = aba.get_all_values()
+    assert len(linhas) == 1 + 11                # só acréscimos: nenhuma linha sobrescrita
+    c = ChecklistEmbarque()
+    c.sincronizar(aba, CICLO)
+    esperado = {f"a{i}@x.com": True for i in range(1, 5)}
+    esperado.update({f"b{i}@x.com": True for i in range(5)})
+    esperado["a0@x.com"] = False
+    assert c.estado(CICLO) == esperado
+    a.ultimo_sync = 0.0
+    a.sincronizar(aba, CICLO)
+    assert a.estado(CICLO) == esperado
+
+
+def test_empate_de_horario_vence_a_linha_de_baixo_e_ignora_outros_ciclos():
+    quando = T0.strftime("%d/%m/%Y %H:%M:%S")
+    rows = [EMBARQUE_HEADERS,
+            [CICLO, "X@x.com", "SIM", "A", quando],
+            ["20261019_0650", "x@x.com", "SIM", "A", "19/10/2026 23:00:00"],
+            [CICLO, "x@x.com", "NAO", "B", quando],
+            [CICLO, "", "SIM", "B", quando]]
+    assert ultimas_marcacoes(rows, CICLO) == {"x@x.com": (False, "B", quando)}
+
+
+def test_falha_na_gravacao_devolve_as_pendencias():
+    aba = aba_embarque()
+    falhas = []
+
+    def chamar(func, *args, **kwargs):
+        if not falhas:
+            falhas.append(func.__name__)
+            raise RuntimeError("sem rede")
+        return func(*args, **kwargs)
+
+    checklist = ChecklistEmbarque(chamar)
+    marcar_sem_timer(checklist, aba, "x@x.com", True, "A", T0)
+    checklist.gravar(aba)
+    assert falhas == ["append_rows"]
+    assert checklist.pendentes == {"x@x.com"}
+    checklist.timer.cancel()
+    checklist.gravar(aba)
+    assert checklist.pendentes == set()
+    assert aba.get_all_values()[1:] == [[CICLO, "x@x.com", "SIM", "A", T0.strftime("%d/%m/%Y %H:%M:%S")]]
+
+
+def test_sincronizar_nao_desfaz_marcacao_pendente():
+    aba = aba_embarque()
+    aba.append_rows([[CICLO, "x@x.com", "SIM", "B", "19/10/2026 18:59:00"]])
+    checklist = ChecklistEmbarque()
+    marcar_sem_timer(checklist, aba, "x@x.com", False, "A", T0)
+    checklist.sincronizar(aba, CICLO)
+    assert checklist.estado(CICLO) == {"x@x.com": False}
@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+from gspread.exceptions import APIError
+
+from exclusoes import ExclusoesPresenca, pedidos_exclusao
+from sheets_emulador import ClienteEmulado, erro_api, semear_rota
+
+
+def linha(n):
+    return ["19/10/2026 19:00:%02d" % n, "QG", "CB", f"MILITAR {n}", "1BPM", f"m{n}@x.com"]
+
+
+def aba_presenca(n_linhas, latencia=0.0):
+    doc = semear_rota(ClienteEmulado(latencia=latencia), "ListaPresenca",
+                      presencas=[linha(n) for n in range(n_linhas)])
+    return doc.sheet1
+
+
+def emails(aba):
+    return [r[5] for r in aba.get_all_values()[1:]]
+
+
+def test_exclusoes_simultaneas_apagam_so_as_linhas_pedidas():
+    aba = aba_presenca(30, latencia=0.02)
+    exclusoes = ExclusoesPresenca()
+    saem = [f"m{n}@x.com" for n in range(0, 30, 3)]
+    largada = threading.Barrier(len(saem))
+    resultados = {}
+
+    def excluir(email):
+        largada.wait()
+        resultados[email] = exclusoes.excluir(aba, email.upper())
+
+    threads = [threading.Thread(target=excluir, args=(e,)) for e in saem]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+
+    assert resultados == {e: True for e in saem}
+    assert emails(aba) == [f"m{n}@x.com" for n in range(30) if n % 3]
+    # as exclusões que chegaram durante um lote foram juntas no seguinte
+    assert exclusoes.lotes < len(saem)
+
+
+def test_indice_vem_da_planilha_e_nao_de_um_snapshot_velho():
+    aba = aba_presenca(5)
+    aba.delete_rows(2)          # outra sessão apagou m0: todo mundo subiu uma linha
+    assert ExclusoesPresenca().excluir(aba, "m3@x.com") is True
+    assert emails(aba) == ["m1@x.com", "m2@x.com", "m4@x.com"]
+
+
+def test_email_fora_da_lista_nao_apaga_nada():
+    aba = aba_presenca(3)
+    assert ExclusoesPresenca().excluir(aba, "ninguem@x.com") is False
+    assert emails(aba) == ["m0@x.com", "m1@x.com", "m2@x.com"]
+
+
+def test_falha_do_lote_chega_a_quem_pediu_e_libera_a_fila():
+    aba = aba_presenca(3)
+    falhar = [True]
+
+    def chamar(func, *args, **kwargs):
+        if falhar and func.__name__ == "batch_update":
+            falhar.clear()
+            raise erro_api(503, "The service is currently unavailable.", "UNAVAILABLE")
+        return func(*args, **kwargs)
+
+    exclusoes = ExclusoesPresenca(chamar)
+    with pytest.raises(APIError):
+        exclusoes.excluir(aba, "m1@x.com")
+    assert exclusoes.excluir(aba, "m1@x.com") is True
+    assert emails(aba) == ["m0@x.com", "m2@x.com"]
+
+
+def test_pedidos_de_baixo_para_cima_sem_repetir():
+    pedidos = pedidos_exclusao(7, [2, 9, 2, 5])
+    assert [p["deleteDimension"]["range"]["startIndex"] for p in pedidos] == [9, 5, 2]
+    assert all(p["deleteDimension"]["range"]["sheetId"] == 7 for p in pedidos)
@@ -0,0 +1,95 @@
+import pandas as pd
+import pytest
+
+from importacao import ler_arquivo, validar_importacao
+
+CABECALHO = "nome;graduacao;lotacao;senha;origem;e-mail;celular"
+
+
+def csv(*linhas) -> bytes:
+    return "\n".join((CABECALHO,) + linhas).encode("utf-8")
+
+
+def pessoa(n, **campos):
+    p = {"nome": f"MILITAR {n}", "grad": "cb", "lot": "1BPM", "senha": "123", "orig": "qg",
+         "email": f"M{n}@X.com", "tel": f"(21) 9{n:04d}.0000"}
+    p.update(campos)
+    return ";".join((p["nome"], p["grad"], p["lot"], p["senha"], p["orig"], p["email"], p["tel"]))
+
+
+def importar(dados: bytes, emails=(), tels=(), vagas=100):
+    return validar_importacao(ler_arquivo("lote.csv", dados), emails, tels, vagas)
+
+
+def motivos(relatorio):
+    return dict(zip(relatorio["linha"], relatorio["motivos"]))
+
+
+def test_linhas_validas_saem_no_layout_da_aba():
+    novas, relatorio = importar(csv(pessoa(1)))
+    assert novas == [["MILITAR 1", "CB", "1BPM", "123", "QG", "m1@x.com", "(21) 90001.0000", "PENDENTE"]]
+    assert relatorio["situacao"].tolist() == ["OK"]
+
+
+def test_motivos_de_recusa_por_linha():
+    dados = csv(
+        pessoa(1, email="sem-arroba"),
+        pessoa(2, tel="2199"),
+        pessoa(3, grad="AL"),
+        pessoa(4, orig="ESCOLA"),
+        pessoa(5, nome="", senha=""),
+        pessoa(6),
+        pessoa(7, email="m6@x.com"),               # repete o e-mail da linha anterior
+        pessoa(8),
+        pessoa(9, email="", tel="1"),
+    )
+    novas, relatorio = importar(dados, emails={"m8@x.com"})
+    m = motivos(relatorio)
+    assert m[2] == "e-mail inválido"
+    assert m[3] == "telefone deve ter 11 dígitos (DDD + 9)"
+    assert m[4] == "graduação fora da lista"
+    assert m[5] == "origem deve ser QG, RMCF ou OUTROS"
+    assert m[6] == "Nome vazio; Senha vazio"
+    assert m[7] == ""
+    assert m[8] == "e-mail repetido no arquivo"
+    assert m[9] == "e-mail já cadastrado"
+    assert m[10] == "Email vazio; telefone deve ter 11 dígitos (DDD + 9)"
+    assert [r[5] for r in novas] == ["m6@x.com"]
+
+
+def test_telefone_ja_cadastrado_ou_repetido():
+    dados = csv(pessoa(1), pessoa(2, tel="21 90001 0000"), pessoa(3))
+    _, relatorio = importar(dados, tels={"21900030000"})
+    m = motivos(relatorio)
+    assert m[2] == ""
+    assert m[3] == "telefone repetido no arquivo"
+    assert m[4] == "telefone já cadastrado"
+
+
+def test_limite_aceita_as_primeiras_validas_e_recusa_o_resto():
+    dados = csv(pessoa(1), pessoa(2, email="x"), pessoa(3), pessoa(4), pessoa(5))
+    novas, relatorio = importar(dados, vagas=2)
+    assert [r[5] for r in novas] == ["m1@x.com", "m3@x.com"]
+    m = motivos(relatorio)
+    assert m[3] == "e-mail inválido"             # inválida não gasta vaga
+    assert m[5] == m[6] == "limite de usuários atingido"
+
+
+@pytest.mark.parametrize("vagas", [0, -3])
+def test_sem_vagas_nada_entra(vagas):
+    novas, relatorio = importar(csv(pessoa(1), pessoa(2)), vagas=vagas)
+    assert novas == []
+    assert set(relatorio["situacao"]) == {"RECUSADA"}
+
+
+def test_coluna_obrigatoria_ausente():
+    df = pd.DataFrame({"nome": ["A"], "email": ["a@x.com"]})
+    with pytest.raises(ValueError, match="Colunas ausentes"):
+        validar_importacao(df, (), (), 10)
+
+
+def test_csv_em_latin1_com_virgula():
+    dados = "Nome,Graduação,Lotação,Senha,Origem,Email,Telefone\nJOÃO,SD,2BPM,x,RMCF,j@x.com,21912345678"
+    novas, _ = importar(dados.encode("latin-1"))
+    assert novas[0][:2] == ["JOÃO", "SD"]
+    assert novas[0][6] == "(21) 91234.5678"
@@ -0,0 +1,103 @@
+import random
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from presenca import VAGAS_PADRAO, chave_ordenacao, montar_lista, render_tabela_html, texto_whatsapp
+
+GRADS = ["TCEL", "MAJ", "CAP", "1º TEN", "2º TEN", "SUBTEN", "1º SGT", "2º SGT", "3º SGT", "CB", "SD",
+         "FC COM", "FC TER", "AL", ""]
+ORIGENS = ["QG", "RMCF", "OUTROS", "", "ESCOLA"]
+CABECALHO = ["DATA_HORA", "QG_RMCF_OUTROS", "GRADUAÇÃO", "NOME", "LOTAÇÃO", "EMAIL"]
+
+
+def ordenacao_dataframe(dados):
+    """Caminho antigo (aplicar_ordenacao com pandas), como referência."""
+    df = pd.DataFrame(dados[1:], columns=dados[0])
+    p_orig = {"QG": 1, "RMCF": 2, "OUTROS": 3}
+    p_grad_normal = {
+        "TCEL": 1, "MAJ": 2, "CAP": 3, "1º TEN": 4, "2º TEN": 5, "SUBTEN": 6,
+        "1º SGT": 7, "2º SGT": 8, "3º SGT": 9, "CB": 10, "SD": 11
+    }
+
+    def grupo_fc(grad):
+        g = str(grad or "").strip().upper()
+        return {"FC COM": 1, "FC TER": 2}.get(g, 0)
+
+    df["grupo_fc"] = df["GRADUAÇÃO"].apply(grupo_fc)
+    df["p_o"] = df["QG_RMCF_OUTROS"].map(p_orig).fillna(99)
+    df["p_g"] = df.apply(lambda row: p_grad_normal.get(str(row["GRADUAÇÃO"]).strip().upper(), 999)
+                         if row["grupo_fc"] == 0 else 0, axis=1)
+    df["dt"] = pd.to_datetime(df["DATA_HORA"], format="%d/%m/%Y %H:%M:%S", errors="coerce")
+    df = df.sort_values(by=["grupo_fc", "p_o", "p_g", "dt"]).reset_index(drop=True)
+    df.insert(0, "Nº", [str(i + 1) if i < 38 else f"Exc-{i - 37:02d}" for i in range(len(df))])
+    return df
+
+
+def gerar_dados(n: int, seed: int):
+    rnd = random.Random(seed)
+    t0 = datetime(2026, 10, 19, 19, 0, 0)
+    linhas = []
+    for i in range(n):
+        # segundos repetidos de propósito: o desempate tem de seguir a ordem da aba
+        dt = (t0 + timedelta(seconds=rnd.randint(0, n // 2))).strftime("%d/%m/%Y %H:%M:%S")
+        if rnd.random() < 0.05:
+            dt = "data ruim"
+        linhas.append([dt, rnd.choice(ORIGENS), rnd.choice(GRADS), f"MILITAR {i:03d}",
+                       f"UNIDADE {rnd.randint(1, 9)}", f"militar{i:03d}@exemplo.com"])
+    return [list(CABECALHO)] + linhas
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_mesma_ordem_e_rotulos_do_dataframe(seed):
+    dados = gerar_dados(random.Random(seed).randint(1, 90), seed)
+    df = ordenacao_dataframe(dados)
+    lista = montar_lista(dados)
+    assert [r.email for _, r in lista.ranking] == list(df["EMAIL"])
+    assert [n for n, _ in lista.ranking] == list(df["Nº"])
+
+
+def test_whatsapp_igual_ao_dataframe():
+    dados = gerar_dados(50, 3)
+    df = ordenacao_dataframe(dados)
+    esperado = "*🚌 LISTA DE PRESENÇA*\n\n" + "".join(
+        f"{r['Nº']}. {r['GRADUAÇÃO']} {r['NOME']} - {r['LOTAÇÃO']}\n" for _, r in df.iterrows())
+    assert texto_whatsapp(montar_lista(dados)) == esperado
+
+
+def test_chave_ordenacao_fc_origem_graduacao_data():
+    cedo, tarde = datetime(2026, 1, 1, 19), datetime(2026, 1, 1, 20)
+    assert chave_ordenacao("OUTROS", "SD", cedo) < chave_ordenacao("QG", "FC COM", cedo)
+    assert chave_ordenacao("QG", "FC COM", tarde) < chave_ordenacao("QG", "FC TER", cedo)
+    assert chave_ordenacao("QG", "SD", cedo) < chave_ordenacao("RMCF", "TCEL", cedo)
+    assert chave_ordenacao("QG", "MAJ", tarde) < chave_ordenacao("QG", "CB", cedo)
+    assert chave_ordenacao("QG", "SD", tarde) < chave_ordenacao("QG", "SD", None)
+
+
+def test_excedentes_e_posicao():
+    dados = gerar_dados(VAGAS_PADRAO + 3, 1)
+    lista = montar_lista(dados, vagas=VAGAS_PADRAO)
+    rotulos = [n for n, _ in lista.ranking]
+    assert rotulos[VAGAS_PADRAO - 1] == str(VAGAS_PADRAO)
+    assert rotulos[VAGAS_PADRAO:] == ["Exc-01", "Exc-02", "Exc-03"]
+    _, ultimo = lista.ranking[-1]
+    assert lista.posicao(ultimo.email.upper()) == lista.inscritos
+    assert lista.posicao("ninguem@exemplo.com") is None
+    html = render_tabela_html(lista)
+    assert html.count("#d32f2f") == 3 * 6
+    assert "@exemplo.com" not in html
+
+
+def test_email_repetido_fica_na_primeira_posicao():
+    dados = [list(CABECALHO),
+             ["19/10/2026 19:00:05", "QG", "SD", "A", "X", "a@x.com"],
+             ["19/10/2026 19:00:01", "QG", "SD", "A", "X", "A@x.com"]]
+    lista = montar_lista(dados)
+    assert lista.inscritos == 2
+    assert lista.posicao("a@x.com") == 1
+
+
+def test_lista_vazia():
+    assert montar_lista([list(CABECALHO)], vagas=10).inscritos == 0
+    assert montar_lista([], vagas=10).vagas == 10
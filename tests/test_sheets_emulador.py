@@ -0,0 +1,65 @@
+import pytest
+from gspread.exceptions import APIError
+
+from sheets_emulador import ClienteEmulado, semear_rota
+
+
+@pytest.fixture
+def config():
+    cliente = ClienteEmulado()
+    doc = semear_rota(cliente, "ListaPresenca", limite=40)
+    return doc.worksheet("Config")      # 10 linhas x 5 colunas
+
+
+def test_leitura_e_escrita_fora_da_grade_levantam_o_mesmo_erro(config):
+    chamadas = [
+        lambda: config.get("A2:D60"),
+        lambda: config.batch_get(["A2:A3", "C2:F2"]),
+        lambda: config.acell("A11"),
+        lambda: config.cell(1, 6),
+        lambda: config.row_values(11),
+        lambda: config.update(values=[["x"], ["y"]], range_name="A10"),
+        lambda: config.batch_update([{"range": "F1", "values": [["x"]]}]),
+        lambda: config.update_cell(11, 1, "x"),
+    ]
+    for chamar in chamadas:
+        with pytest.raises(APIError, match="exceeds grid limits"):
+            chamar()
+
+
+def test_intervalo_aberto_termina_na_borda_da_grade(config):
+    assert config.get("A2:D") == [["40"]]
+    assert config.get("A:A") == [["LIMITE"], ["40"]]
+    assert config.get("A2:E10") == [["40"]]
+
+
+def test_append_cresce_a_grade(config):
+    config.append_rows([[str(i)] for i in range(20)])
+    assert config.row_count == 22
+    assert config.get("A22") == [["19"]]
+
+
+def test_cota_por_minuto_levanta_429():
+    cliente = ClienteEmulado(leituras_por_minuto=2)
+    doc = semear_rota(cliente, "ListaPresenca")
+    aba = doc.worksheet("Config")       # consome 1 leitura (metadados)
+    aba.acell("A1")
+    with pytest.raises(APIError, match="429"):
+        aba.acell("A2")
+    assert cliente.estatisticas()["erros_429"] == 1
+
+
+def test_delete_dimension_usa_indices_0_based_com_fim_exclusivo():
+    doc = semear_rota(ClienteEmulado(), "ListaPresenca",
+                      presencas=[["d", "QG", "CB", f"N{n}", "L", f"e{n}"] for n in range(4)])
+    aba = doc.sheet1
+    doc.batch_update({"requests": [
+        {"deleteDimension": {"range": {"sheetId": aba.id, "dimension": "ROWS", "startIndex": 3, "endIndex": 4}}},
+        {"deleteDimension": {"range": {"sheetId": aba.id, "dimension": "ROWS", "startIndex": 1, "endIndex": 2}}},
+    ]})
+    assert [r[3] for r in aba.get_all_values()[1:]] == ["N1", "N3"]
+    assert aba.row_count == 98
+    with pytest.raises(APIError, match="index out of range"):
+        doc.batch_update({"requests": [
+            {"deleteDimension": {"range": {"sheetId": aba.id, "dimension": "ROWS", "startIndex": 98, "endIndex": 99}}},
+        ]})
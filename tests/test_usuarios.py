@@ -0,0 +1,102 @@
+import pytest
+
+from sheets_emulador import ClienteEmulado, semear_rota
+from usuarios import (
+    COL_EMAIL_KEY, COL_TEL_KEY, COLS_LOGIN, celulas_da_linha, chaves_para_migrar, com_chaves, linha_no_cabecalho,
+    montar_colunas, registro_da_linha,
+)
+
+CABECALHO = ["Nome", "Graduação", "Lotação", "Senha", "QG_RMCF_OUTROS", "Email", "TELEFONE", "STATUS",
+             "TEMP_SENHA", "TEMP_EXPIRA", "TEMP_USADA", "EMAIL_KEY", "TEL_KEY"]
+
+
+def indice(*linhas):
+    nomes = ("Email", "TELEFONE", "STATUS")
+    return montar_colunas(nomes, [[[r[j]] for r in linhas] for j in range(len(nomes))], versao=3)
+
+
+def test_com_campos_escreve_so_o_que_foi_dado():
+    base = indice(("a@x.com", "(21) 90000.0000", "PENDENTE"), ("b@x.com", "(21) 91111.1111", "ATIVO"))
+    novo = base.com_campos(0, {"STATUS": "ATIVO", "Senha": "fora da projeção"})
+    assert novo.registro(0) == {"Email": "a@x.com", "TELEFONE": "(21) 90000.0000", "STATUS": "ATIVO"}
+    assert novo.registro(1) == base.registro(1)
+    assert base.registro(0)["STATUS"] == "PENDENTE"      # o índice original não muda
+    assert novo.versao == base.versao
+
+
+def test_com_campos_alem_do_fim_cria_a_linha():
+    base = indice(("a@x.com", "(21) 90000.0000", "ATIVO"))
+    novo = base.com_campos(2, {"Email": "c@x.com", "TELEFONE": "(21) 92222.2222"})
+    assert novo.total == 3
+    assert novo.registro(1) == {"Email": "", "TELEFONE": "", "STATUS": ""}
+    assert novo.indice_por_email_tel("C@X.COM", "21922222222") == 2
+
+
+def test_celulas_da_linha_segue_o_cabecalho():
+    data = celulas_da_linha(CABECALHO, 7, {"Senha": "nova", "TELEFONE": "(21) 93333.3333", "TEMP_USADA": "SIM"})
+    assert data == [
+        {"range": "D7", "values": [["nova"]]},
+        {"range": "G7", "values": [["(21) 93333.3333"]]},
+        {"range": "K7", "values": [["SIM"]]},
+    ]
+
+
+def test_celulas_da_linha_sem_a_coluna_nao_grava_nada():
+    with pytest.raises(ValueError, match="TEMP_USADA"):
+        celulas_da_linha(CABECALHO[:8], 2, {"Senha": "x", "TEMP_USADA": "SIM"})
+
+
+def test_atualizacao_de_cadastro_numa_so_chamada():
+    usuarios = [["A", "SD", "1BPM", "s", "QG", "a@x.com", "(21) 90000.0000", "ATIVO"],
+                ["B", "CB", "2BPM", "p", "RMCF", "b@x.com", "(21) 91111.1111", "ATIVO"]]
+    cli = ClienteEmulado()
+    aba = semear_rota(cli, "ListaPresenca", usuarios=usuarios).worksheet("Usuarios")
+    aba.update("I1:M1", [CABECALHO[8:]])
+    aba.update("I3:M3", [["tmp", "19/10/2026 19:10:00", "NAO", "b@x.com", "21911111111"]])
+    cli.zerar_estatisticas()
+
+    aba.batch_update(celulas_da_linha(CABECALHO, 3, {
+        "Nome": "BETO", "Senha": "nova", "TELEFONE": "(21) 94444.4444",
+        "TEMP_SENHA": "", "TEMP_EXPIRA": "", "TEMP_USADA": "SIM", "TEL_KEY": "21944444444",
+    }))
+
+    assert cli.estatisticas()["chamadas"] == {"batch_update": 1}
+    r = registro_da_linha(CABECALHO, aba.row_values(3))
+    assert {k: r[k] for k in COLS_LOGIN} == {
+        "Email": "b@x.com", "TELEFONE": "(21) 94444.4444", "Nome": "BETO", "Graduação": "CB",
+        "Lotação": "2BPM", "Senha": "nova", "QG_RMCF_OUTROS": "RMCF", "STATUS": "ATIVO",
+        "TEMP_SENHA": "", "TEMP_EXPIRA": "", "TEMP_USADA": "SIM", "EMAIL_KEY": "b@x.com", "TEL_KEY": "21944444444",
+    }
+
+
+def test_chaves_da_aba_valem_e_faltando_sao_derivadas():
+    nomes = ("Email", "TELEFONE", COL_EMAIL_KEY, COL_TEL_KEY)
+    linhas = [(" A@X.com ", "(21) 90000.0000", "a@x.com", "21900000000"),
+              ("B@X.COM", "(21) 91111.1111", "", "")]          # incluída à mão, ainda sem chaves
+    cols = montar_colunas(nomes, [[[r[j]] for r in linhas] for j in range(len(nomes))])
+    assert cols.email_keys == ("a@x.com", "b@x.com")
+    assert cols.tel_keys == ("21900000000", "21911111111")
+    assert cols.indice_por_email_tel("b@x.com ", "21911111111") == 1
+    assert cols.tem_telefone("21911111111")
+    assert not cols.tem_telefone("21911111111", exceto_email="B@x.com")
+
+
+def test_escrita_leva_as_chaves_na_ordem_do_cabecalho():
+    campos = com_chaves({"Email": " Novo@X.com", "TELEFONE": "(21) 95555.5555", "STATUS": "PENDENTE"})
+    assert campos[COL_EMAIL_KEY] == "novo@x.com" and campos[COL_TEL_KEY] == "21955555555"
+    cab = ["Email", "", "TELEFONE", "STATUS", COL_TEL_KEY, COL_EMAIL_KEY]
+    assert linha_no_cabecalho(cab, campos) == [" Novo@X.com", "", "(21) 95555.5555", "PENDENTE",
+                                                "21955555555", "novo@x.com"]
+    assert com_chaves({"STATUS": "ATIVO"}) == {"STATUS": "ATIVO"}
+
+
+def test_chaves_para_migrar_conta_so_as_linhas_que_mudam():
+    nomes = ("Email", "TELEFONE", COL_EMAIL_KEY, COL_TEL_KEY)
+    linhas = [("a@x.com", "(21) 90000.0000", "a@x.com", "21900000000"),
+              ("B@x.com", "(21) 91111.1111", "", ""),
+              ("c@x.com", "(21) 92222.2222", "c@x.com", "21900000000")]   # telefone editado à mão
+    cols = montar_colunas(nomes, [[[r[j]] for r in linhas] for j in range(len(nomes))])
+    email_keys, tel_keys, mudam = chaves_para_migrar(cols)
+    assert email_keys == ("a@x.com", "b@x.com", "c@x.com")
+    assert tel_keys == ("21900000000", "21911111111", "21922222222")
+    assert mudam == 2
@@ -0,0 +1,134 @@
+"""
+Transporte HTTP do gspread: pool de conexões keep-alive, timeouts, gzip e
+renovação do token em segundo plano.
+
+gspread.authorize(creds) cria uma AuthorizedSession com o pool padrão do
+requests (10 conexões por host): com dezenas de sessões do Streamlit ao
+mesmo tempo, conexões excedentes são abertas e descartadas a cada
+chamada. E o token da service account é renovado dentro da requisição de
+quem chegar depois do vencimento.
+
+Aqui a sessão tem um pool dimensionado (pool_maxsize), timeouts de
+conexão/leitura, respostas compactadas (a API do Google só usa gzip se o
+User-Agent contiver "gzip") e uma thread que renova o token antes de
+vencer. O adaptador conta requisições e conexões novas por host, para o
+ADM ver a taxa de reaproveitamento.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import requests
+from google.auth.transport.requests import AuthorizedSession, Request
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+POOL_CONEXOES = 4             # hosts distintos mantidos no PoolManager
+POOL_MAXSIZE = 32             # conexões keep-alive por host
+TIMEOUT_CONEXAO_S = 5.0
+TIMEOUT_LEITURA_S = 30.0
+RENOVAR_ANTES_S = 300.0       # 5 min antes de vencer (o google-auth renova inline a 3m45s)
+RENOVAR_FALHA_S = 30.0        # nova tentativa após falha na renovação
+USER_AGENT = "rota-presenca (gzip)"
+
+
+class _Contadores:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.por_host = {}        # host -> {"requisicoes": n, "conexoes": n}
+
+    def somar(self, host: str, campo: str):
+        with self.lock:
+            est = self.por_host.setdefault(host, {"requisicoes": 0, "conexoes": 0})
+            est[campo] += 1
+
+    def copia(self) -> dict:
+        with self.lock:
+            return {h: dict(e) for h, e in self.por_host.items()}
+
+
+def _pool_contado(base, contadores: _Contadores):
+    class PoolContado(base):
+        def _new_conn(self):
+            contadores.somar(self.host, "conexoes")
+            return super()._new_conn()
+    return PoolContado
+
+
+class AdaptadorContado(HTTPAdapter):
+    """HTTPAdapter que conta requisições e conexões abertas por host."""
+
+    def __init__(self, contadores: _Contadores, **kw):
+        self.contadores = contadores
+        super().__init__(**kw)
+
+    def init_poolmanager(self, *args, **kw):
+        super().init_poolmanager(*args, **kw)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _pool_contado(HTTPConnectionPool, self.contadores),
+            "https": _pool_contado(HTTPSConnectionPool, self.contadores),
+        }
+
+    def send(self, request, **kw):
+        self.contadores.somar(urlsplit(request.url).hostname or "", "requisicoes")
+        return super().send(request, **kw)
+
+
+class TransporteSheets:
+    def __init__(self, creds, pool_maxsize: int = POOL_MAXSIZE, timeout_conexao: float = TIMEOUT_CONEXAO_S,
+                 timeout_leitura: float = TIMEOUT_LEITURA_S, gzip: bool = True, renovar: bool = True):
+        self.creds = creds
+        self.timeout = (float(timeout_conexao), float(timeout_leitura))
+        self.contadores = _Contadores()
+        self.lock = threading.Lock()
+        self.renovacoes = 0
+        self.ultima_renovacao = None
+        self.erro_renovacao = None
+
+        self.sessao = AuthorizedSession(creds)
+        adaptador = AdaptadorContado(self.contadores, pool_connections=POOL_CONEXOES,
+                                     pool_maxsize=int(pool_maxsize), pool_block=False)
+        self.sessao.mount("https://", adaptador)
+        self.sessao.mount("http://", adaptador)
+        if gzip:
+            self.sessao.headers.update({"Accept-Encoding": "gzip", "User-Agent": USER_AGENT})
+
+        # o token endpoint vai por uma sessão própria (fora do pool das planilhas)
+        self._requisicao_token = Request(requests.Session())
+        if renovar:
+            self.renovar()
+            t = threading.Thread(target=self._renovar_sempre, name="renova-token-sheets", daemon=True)
+            t.start()
+
+    # ---------- token ----------
+    def renovar(self):
+        with self.lock:
+            try:
+                self.creds.refresh(self._requisicao_token)
+                self.renovacoes += 1
+                self.ultima_renovacao = time.time()
+                self.erro_renovacao = None
+            except Exception as e:
+                self.erro_renovacao = f"{type(e).__name__}: {e}"
+
+    def segundos_ate_renovar(self) -> float:
+        expira = getattr(self.creds, "expiry", None)
+        if self.erro_renovacao or expira is None:
+            return RENOVAR_FALHA_S
+        # google-auth guarda expiry como datetime UTC sem fuso
+        return max(1.0, (expira - datetime.now(timezone.utc).replace(tzinfo=None)).total_seconds() - RENOVAR_ANTES_S)
+
+    def _renovar_sempre(self):
+        while True:
+            time.sleep(self.segundos_ate_renovar())
+            self.renovar()
+
+    # ---------- estatísticas ----------
+    def estatisticas(self) -> dict:
+        """host -> requisições, conexões abertas e fração de requisições em conexão reaproveitada."""
+        out = {}
+        for host, est in self.contadores.copia().items():
+            req = est["requisicoes"]
+            out[host] = dict(est, reaproveitamento=(1.0 - est["conexoes"] / req) if req else 0.0)
+        return out
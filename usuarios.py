@@ -0,0 +1,206 @@
+"""
+Leitura da aba Usuarios por colunas (projeção).
+
+Em vez de get_all_records (todas as colunas de todos os usuários, com
+Senha e TEMP_*), cada tela pede só as colunas que usa num único
+batch_get. O resultado fica como arrays por coluna (tuplas de str), que
+ocupam bem menos memória no cache que uma lista de dicts. É imutável (as
+colunas ficam atrás de um MappingProxyType): o app guarda um único objeto
+por versão e todas as sessões leem o mesmo, sem cópia.
+
+E-mail e telefone são comparados pelas chaves canônicas EMAIL_KEY/TEL_KEY
+(colunas da aba, mantidas pelo app), resolvidas uma vez por snapshot.
+"""
+import re
+from types import MappingProxyType
+from typing import NamedTuple, Optional
+
+from gspread.utils import rowcol_to_a1
+
+# Valores aceitos no cadastro (formulários e importação em lote)
+GRADUACOES = ("TCEL", "MAJ", "CAP", "1º TEN", "2º TEN", "SUBTEN", "1º SGT",
+              "2º SGT", "3º SGT", "CB", "SD", "FC COM", "FC TER")
+ORIGENS = ("QG", "RMCF", "OUTROS")
+
+# Layout das linhas gravadas com append_row (cadastro e importação)
+COLUNAS_LINHA_USUARIO = ("Nome", "Graduação", "Lotação", "Senha", "QG_RMCF_OUTROS", "Email", "TELEFONE", "STATUS")
+
+# Chaves canônicas, gravadas na aba por todas as escritas do app:
+# EMAIL_KEY = e-mail sem espaços e em minúsculas; TEL_KEY = só os dígitos.
+COL_EMAIL_KEY = "EMAIL_KEY"
+COL_TEL_KEY = "TEL_KEY"
+COLS_CHAVES_CANONICAS = (COL_EMAIL_KEY, COL_TEL_KEY)
+
+# Projeções usadas pelo app
+COLS_CHAVE = ("Email", "TELEFONE") + COLS_CHAVES_CANONICAS                      # login, duplicidade, limite
+COLS_ADMIN = ("Nome", "Graduação", "Email", "TELEFONE", "STATUS") + COLS_CHAVES_CANONICAS   # lista do ADM
+# login/recuperação: tudo o que a sessão do usuário usa (fica só em memória)
+COLS_LOGIN = COLS_CHAVE + ("Nome", "Graduação", "Lotação", "Senha", "QG_RMCF_OUTROS", "STATUS",
+                           "TEMP_SENHA", "TEMP_EXPIRA", "TEMP_USADA")
+
+
+def _so_digitos(s) -> str:
+    return re.sub(r"\D+", "", str(s or ""))
+
+
+def chave_email(s) -> str:
+    return str(s or "").strip().lower()
+
+
+def chave_tel(s) -> str:
+    return _so_digitos(s)
+
+
+def letra_coluna(col: int) -> str:
+    return rowcol_to_a1(1, col)[:-1]
+
+
+_VAZIO = MappingProxyType({})
+
+
+class ColunasUsuarios(NamedTuple):
+    """
+    Colunas projetadas da aba Usuarios; o índice i corresponde à linha i + 2.
+    email_keys/tel_keys e os mapas por chave são calculados uma vez, em
+    colunas_usuarios(): as buscas não normalizam nada por registro.
+    """
+    colunas: MappingProxyType   # nome -> tuple[str] (somente leitura)
+    total: int
+    versao: int = 0             # versão dos dados em que foi lida
+    email_keys: tuple = ()
+    tel_keys: tuple = ()
+    por_email: MappingProxyType = _VAZIO   # EMAIL_KEY -> índices
+    por_tel: MappingProxyType = _VAZIO     # TEL_KEY -> índices
+
+    def coluna(self, nome: str) -> tuple:
+        return self.colunas.get(nome) or ("",) * self.total
+
+    def registro(self, i: int) -> dict:
+        return {nome: vals[i] for nome, vals in self.colunas.items()}
+
+    def registros(self):
+        for i in range(self.total):
+            yield self.registro(i)
+
+    def indice_por_email_tel(self, email: str, tel_digits: str) -> Optional[int]:
+        tel_key = chave_tel(tel_digits)
+        for i in self.por_email.get(chave_email(email), ()):
+            if self.tel_keys[i] == tel_key:
+                return i
+        return None
+
+    def com_campos(self, i: int, campos: dict) -> "ColunasUsuarios":
+        """
+        Cópia com os campos dados escritos na linha i (linha nova se i >=
+        total). Campos fora da projeção são ignorados; os demais ficam.
+        """
+        total = max(self.total, i + 1)
+        colunas = {}
+        for nome in self.colunas or COLS_CHAVE:
+            vals = list(self.coluna(nome)) + [""] * (total - self.total)
+            if nome in campos:
+                vals[i] = str(campos[nome]).strip()
+            colunas[nome] = tuple(vals)
+        return colunas_usuarios(colunas, total, self.versao)
+
+    def tem_email(self, email: str) -> bool:
+        return chave_email(email) in self.por_email
+
+    def tem_telefone(self, tel_digits: str, exceto_email: str = "") -> bool:
+        exceto = chave_email(exceto_email)
+        return any(not (exceto and self.email_keys[i] == exceto)
+                   for i in self.por_tel.get(chave_tel(tel_digits), ()))
+
+
+def colunas_usuarios(colunas: dict, total: int, versao: int = 0) -> ColunasUsuarios:
+    """
+    Congela as colunas e deriva as chaves: EMAIL_KEY/TEL_KEY da aba quando
+    preenchidas; calculadas de Email/TELEFONE só nas linhas sem elas (ex.:
+    incluídas à mão antes da próxima migração).
+    """
+    vazio = ("",) * total
+    email_keys = tuple(k or chave_email(e) for k, e in zip(colunas.get(COL_EMAIL_KEY, vazio),
+                                                            colunas.get("Email", vazio)))
+    tel_keys = tuple(k or chave_tel(t) for k, t in zip(colunas.get(COL_TEL_KEY, vazio),
+                                                        colunas.get("TELEFONE", vazio)))
+    por_email, por_tel = {}, {}
+    for i, (ek, tk) in enumerate(zip(email_keys, tel_keys)):
+        if ek:
+            por_email.setdefault(ek, []).append(i)
+        if tk:
+            por_tel.setdefault(tk, []).append(i)
+    return ColunasUsuarios(
+        MappingProxyType(dict(colunas)), total, versao, email_keys, tel_keys,
+        MappingProxyType({k: tuple(v) for k, v in por_email.items()}),
+        MappingProxyType({k: tuple(v) for k, v in por_tel.items()}),
+    )
+
+
+COLUNAS_VAZIAS = colunas_usuarios({}, 0)
+
+
+def com_chaves(campos: dict) -> dict:
+    """Campos de uma escrita + EMAIL_KEY/TEL_KEY de Email/TELEFONE (quando presentes)."""
+    out = dict(campos)
+    if "Email" in campos:
+        out[COL_EMAIL_KEY] = chave_email(campos["Email"])
+    if "TELEFONE" in campos:
+        out[COL_TEL_KEY] = chave_tel(campos["TELEFONE"])
+    return out
+
+
+def linha_no_cabecalho(cabecalho, campos: dict) -> list:
+    """Campos -> linha na ordem do cabeçalho da aba (sem cabeçalho: layout do append_row)."""
+    cab = [str(h).strip() for h in cabecalho] or list(COLUNAS_LINHA_USUARIO)
+    return [str(campos.get(h, "")) if h else "" for h in cab]
+
+
+def chaves_para_migrar(cols: ColunasUsuarios) -> tuple:
+    """
+    Colunas EMAIL_KEY/TEL_KEY corretas para todas as linhas (de Email/
+    TELEFONE) e quantas linhas mudam. Uma passada por coluna.
+    """
+    email_keys = tuple(map(chave_email, cols.coluna("Email")))
+    tel_keys = tuple(map(chave_tel, cols.coluna("TELEFONE")))
+    mudam = sum(1 for a, b, c, d in zip(email_keys, cols.coluna(COL_EMAIL_KEY), tel_keys, cols.coluna(COL_TEL_KEY))
+                if a != b or c != d)
+    return email_keys, tel_keys, mudam
+
+
+def intervalos_projecao(cabecalho, nomes) -> dict:
+    """{nome: 'X2:X'} das colunas pedidas que existem no cabeçalho."""
+    cab = [str(h).strip() for h in cabecalho]
+    out = {}
+    for nome in nomes:
+        if nome in cab:
+            letra = letra_coluna(cab.index(nome) + 1)
+            out[nome] = f"{letra}2:{letra}"
+    return out
+
+
+def montar_colunas(nomes, respostas, versao: int = 0) -> ColunasUsuarios:
+    """Respostas do batch_get (uma por coluna) -> ColunasUsuarios com alturas iguais."""
+    brutas = [[str(r[0]).strip() if r else "" for r in (resp or [])] for resp in respostas]
+    total = max((len(c) for c in brutas), default=0)
+    colunas = {nome: tuple(c + [""] * (total - len(c))) for nome, c in zip(nomes, brutas)}
+    return colunas_usuarios(colunas, total, versao)
+
+
+def celulas_da_linha(cabecalho, linha: int, campos: dict) -> list:
+    """
+    Campos de uma linha -> `data` de um único Worksheet.batch_update, pelo
+    cabeçalho. Coluna fora do cabeçalho é erro: nada é gravado pela metade.
+    """
+    cab = [str(h).strip() for h in cabecalho]
+    faltando = [nome for nome in campos if nome not in cab]
+    if faltando:
+        raise ValueError("Colunas ausentes na aba Usuarios: " + ", ".join(faltando))
+    return [{"range": f"{letra_coluna(cab.index(nome) + 1)}{linha}", "values": [[valor]]}
+            for nome, valor in campos.items()]
+
+
+def registro_da_linha(cabecalho, valores) -> dict:
+    """Uma linha crua (row_values) -> dict no formato do get_all_records (texto)."""
+    cab = [str(h).strip() for h in cabecalho]
+    valores = list(valores) + [""] * (len(cab) - len(valores))
+    return {h: valores[j] for j, h in enumerate(cab) if h}